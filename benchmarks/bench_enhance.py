@@ -0,0 +1,90 @@
+"""
+Benchmark de l'amélioration de frame : implémentation historique de
+ScanScreen._enhance_frame (convertScaleAbs + medianBlur) contre FrameEnhancer.
+
+Usage : python -m benchmarks.bench_enhance [--iterations 200]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from modules.frame_enhancer import FrameEnhancer
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Frame BGR synthétique : dégradé + bruit + rectangle clair (document)"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(30, 200, width, dtype=np.float32)[None, :, None]
+    frame = np.broadcast_to(gradient, (height, width, 3)).copy()
+    frame += rng.normal(0, 12, frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    cv2.rectangle(frame, (width // 4, height // 4), (3 * width // 4, 3 * height // 4), (230, 230, 225), -1)
+    return frame
+
+
+def legacy_enhance(frame: np.ndarray) -> np.ndarray:
+    """Copie de l'ancienne implémentation de ScanScreen._enhance_frame"""
+    frame = cv2.convertScaleAbs(frame, alpha=1.2, beta=10)
+    return cv2.medianBlur(frame, 3)
+
+
+def measure(func, iterations: int) -> dict:
+    for _ in range(5):
+        func()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {"mean_ms": float(timings.mean()), "p95_ms": float(np.percentile(timings, 95))}
+
+
+def run(iterations: int) -> list:
+    results = []
+    for name, (width, height) in RESOLUTIONS.items():
+        frame = synthetic_frame(width, height)
+        lut_enhancer = FrameEnhancer(alpha=1.2, beta=10, method="lut")
+        enhancer = FrameEnhancer(alpha=1.2, beta=10)
+
+        diff = max(
+            np.abs(e.enhance(frame).astype(np.int16) - legacy_enhance(frame)).max()
+            for e in (lut_enhancer, enhancer)
+        )
+        preview_size = (340, int(340 * height / width))
+        roi = (width // 4, height // 4, width // 2, height // 2)
+
+        cases = {
+            "legacy": lambda: legacy_enhance(frame),
+            "lut": lambda: lut_enhancer.enhance(frame),
+            "auto": lambda: enhancer.enhance(frame),
+            "legacy_preview": lambda: legacy_enhance(
+                cv2.resize(frame, preview_size, interpolation=cv2.INTER_AREA)),
+            "auto_preview_size": lambda: enhancer.enhance(frame, size=preview_size),
+            "auto_roi": lambda: enhancer.enhance(frame, roi=roi),
+        }
+        for case, func in cases.items():
+            stats = measure(func, iterations)
+            results.append({"resolution": name, "case": case, "max_abs_diff": int(diff), **stats})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print(f"{'résolution':<10} {'cas':<18} {'moyenne (ms)':>13} {'p95 (ms)':>10}")
+    for row in results:
+        print(f"{row['resolution']:<10} {row['case']:<18} {row['mean_ms']:>13.2f} {row['p95_ms']:>10.2f}")
+    print("Écart max LUT / ancienne implémentation : "
+          f"{max(r['max_abs_diff'] for r in results)} niveau(x) de gris")
+
+
+if __name__ == "__main__":
+    main()
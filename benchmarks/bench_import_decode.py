@@ -0,0 +1,140 @@
+"""
+Benchmark du prétraitement des imports (ScanScreen._preprocess_image) sur
+des photos JPEG de 12, 24 et 48 Mpx : décodage pleine taille puis
+thumbnail LANCZOS, ancienne implémentation telle quelle, et décodage
+réduit par la DCT (`decode_reduced`) suivi du redimensionnement final.
+
+Chaque mesure tourne dans un processus neuf : le pic de mémoire rapporté
+est l'augmentation du pic de RSS pendant le prétraitement.
+
+Usage : python -m benchmarks.bench_import_decode [--iterations 5] [--output resultats.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from modules.image_encoder import JpegEncoder, decode_reduced
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Tailles typiques de capteurs de téléphone (4:3)
+PHOTO_SIZES = {"12MP": (4000, 3000), "24MP": (5664, 4248), "48MP": (8000, 6000)}
+UPLOAD_MAX_SIZE = (1200, 1600)
+UPLOAD_JPEG_QUALITY = 85
+
+
+def synthetic_photo(width: int, height: int, seed: int = 0) -> bytes:
+    """Photo JPEG synthétique (dégradé, bruit et aplats) à qualité d'appareil photo"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[..., 0] = ((x + y) / 2).astype(np.uint8)
+    rgb[..., 1] = np.broadcast_to(x, (height, width)).astype(np.uint8)
+    rgb[..., 2] = np.broadcast_to(y, (height, width)).astype(np.uint8)
+    noise = rng.integers(-12, 12, size=(height, width, 1), dtype=np.int16)
+    rgb = np.clip(rgb.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    rgb[height // 4:3 * height // 4, width // 4:3 * width // 4] = (235, 235, 230)
+    buffer = BytesIO()
+    Image.fromarray(rgb).save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def full_preprocess(image_data: bytes, encoder: JpegEncoder) -> bytes:
+    """Image décodée en pleine taille avant la réduction"""
+    image = Image.open(BytesIO(image_data))
+    image.load()
+    image.thumbnail(UPLOAD_MAX_SIZE, Image.Resampling.LANCZOS)
+    return encoder.encode_pil(image, quality=UPLOAD_JPEG_QUALITY, optimize=True)
+
+
+def legacy_preprocess(image_data: bytes, encoder: JpegEncoder) -> bytes:
+    """Ancienne implémentation (selon la version de Pillow, thumbnail réduit déjà un peu au décodage)"""
+    image = Image.open(BytesIO(image_data))
+    image.thumbnail(UPLOAD_MAX_SIZE, Image.Resampling.LANCZOS)
+    return encoder.encode_pil(image, quality=UPLOAD_JPEG_QUALITY, optimize=True)
+
+
+def reduced_preprocess(image_data: bytes, encoder: JpegEncoder) -> bytes:
+    image = decode_reduced(image_data, UPLOAD_MAX_SIZE)
+    return encoder.encode_pil(image, quality=UPLOAD_JPEG_QUALITY, optimize=True)
+
+
+METHODS = {"pleine taille": full_preprocess, "thumbnail": legacy_preprocess, "DCT réduite": reduced_preprocess}
+
+
+def rss_peak_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(path: str, method: str, iterations: int) -> dict:
+    """Une méthode sur une photo (processus neuf)"""
+    with open(path, "rb") as f:
+        image_data = f.read()
+    encoder = JpegEncoder()
+    func = METHODS[method]
+    before = rss_peak_mb()
+    timings = []
+    output = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        output = func(image_data, encoder)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    result_size = Image.open(BytesIO(output)).size
+    return {
+        "method": method,
+        "input_bytes": len(image_data),
+        "output_bytes": len(output),
+        "output_size": list(result_size),
+        "mean_ms": float(timings.mean()),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "peak_rss_delta_mb": rss_peak_mb() - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (width, height) in PHOTO_SIZES.items():
+            path = os.path.join(tmp, f"{name}.jpg")
+            with open(path, "wb") as f:
+                f.write(synthetic_photo(width, height))
+            for method in METHODS:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    row = executor.submit(run_case, path, method, args.iterations).result()
+                row["photo"] = name
+                results.append(row)
+
+    print(f"{'photo':<6} {'méthode':<14} {'moyenne (ms)':>13} {'p95 (ms)':>10} {'pic RSS (Mio)':>14} {'sortie':>10}")
+    for row in results:
+        print(f"{row['photo']:<6} {row['method']:<14} {row['mean_ms']:>13.1f} {row['p95_ms']:>10.1f} "
+              f"{row['peak_rss_delta_mb']:>14.1f} {'x'.join(map(str, row['output_size'])):>10}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
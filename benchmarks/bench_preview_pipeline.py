@@ -0,0 +1,309 @@
+"""
+Benchmark du pipeline de prévisualisation de ScanScreen (réduction,
+qualité, détection, amélioration, encodage, capture) sans caméra ni
+interface, sur frames synthétiques ou enregistrées, en 480p, 720p et 1080p.
+
+Pour chaque cas (type de scan x résolution x source), dans un processus
+neuf : FPS en série et avec le graphe à étages, centiles de latence par
+étage, allocations par frame (tracemalloc) et pic de RSS. Résultats en
+JSON (`--output`) ; avec `--baseline`, comparaison à un résultat stocké et
+code de sortie 1 en cas de régression au-delà de `--tolerance`.
+
+Usage :
+  python -m benchmarks.bench_preview_pipeline [--frames 300] [--recorded chemin]
+      [--output resultats.json] [--baseline reference.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from modules.camera_module import FileCameraSource, SyntheticCameraSource
+from modules.scan_pipeline import PipelineOptions, ScanPipeline
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCHEMA_VERSION = 1
+RESOLUTIONS = {"480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+SCAN_TYPES = ("document", "selfie")
+STAGES = ("prepare", "analyze", "encode")
+# Une capture « meilleure de N » toutes les N frames
+CAPTURE_EVERY = 30
+# Métriques comparées à la référence : (chemin, sens) ; +1 : plus grand est meilleur
+COMPARED_METRICS = [
+    ("fps_serial", +1),
+    ("fps_pipelined", +1),
+    ("stages.prepare.p95_ms", -1),
+    ("stages.analyze.p95_ms", -1),
+    ("stages.encode.p95_ms", -1),
+    ("stages.capture.p95_ms", -1),
+    ("alloc_kb_per_frame", -1),
+    ("peak_rss_mb", -1),
+]
+
+
+def load_frames(source: str, width: int, height: int, count: int) -> List[np.ndarray]:
+    """Frames décodées à l'avance (le coût de la source n'entre pas dans la mesure)"""
+    if source == "synthetic":
+        camera = SyntheticCameraSource(width, height, fps=0)
+    else:
+        # Source enregistrée rejouée sans cadence, redimensionnée à la résolution du cas
+        camera = FileCameraSource(source, fps=10000)
+    frames = []
+    seq = -1
+    with camera:
+        while len(frames) < count:
+            seq, frame = camera.read(timeout=5.0, after=seq)
+            if frame is None:
+                break
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            frames.append(frame)
+    if not frames:
+        raise RuntimeError(f"Aucune frame lue depuis {source}")
+    return frames
+
+
+def summarize(timings_ms: List[float]) -> dict:
+    if not timings_ms:
+        return {"count": 0}
+    values = np.asarray(timings_ms)
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def run_frame(pipeline: ScanPipeline, frame: np.ndarray, timings: Optional[Dict[str, list]] = None):
+    """Une frame à travers les étages de ScanScreen, en série, avec mesure par étage"""
+    job = pipeline.acquire_job(frame)
+    try:
+        for stage in STAGES:
+            start = time.perf_counter()
+            job = getattr(pipeline, stage)(job)
+            if timings is not None:
+                timings[stage].append((time.perf_counter() - start) * 1000)
+    finally:
+        pipeline.release_job(job)
+
+
+def measure_serial(pipeline: ScanPipeline, frames: List[np.ndarray], count: int) -> dict:
+    timings = {stage: [] for stage in STAGES + ("capture",)}
+    start = time.perf_counter()
+    for index in range(count):
+        run_frame(pipeline, frames[index % len(frames)], timings)
+        if (index + 1) % CAPTURE_EVERY == 0:
+            capture_start = time.perf_counter()
+            pipeline.capture_jpeg()
+            timings["capture"].append((time.perf_counter() - capture_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "fps_serial": count / elapsed,
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+    }
+
+
+def measure_pipelined(pipeline: ScanPipeline, frames: List[np.ndarray], count: int) -> dict:
+    """Graphe à étages threadé, alimenté dès que le premier étage a de la place (aucun abandon)"""
+    pipeline.reset()
+    graph = pipeline.build_stage_graph(lambda job: job, threaded=True, name="bench")
+    first = graph.stages[0]
+    graph.start()
+    start = time.perf_counter()
+    try:
+        for index in range(count):
+            while first.depth >= first.queue_size:
+                time.sleep(0.0002)
+            graph.submit(pipeline.acquire_job(frames[index % len(frames)]))
+        deadline = time.perf_counter() + 10.0
+        while graph.completed + graph.dropped < graph.submitted and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+    finally:
+        graph.stop()
+    stats = graph.stats()
+    return {
+        "fps_pipelined": graph.completed / elapsed,
+        "pipelined_dropped": graph.dropped,
+        "bottleneck": stats["bottleneck"],
+        "pipelined_end_to_end": stats["end_to_end"],
+        "pipelined_stages": {
+            name: {key: stage[key] for key in ("avg_ms", "max_depth", "latency", "queue_wait")}
+            for name, stage in stats["stages"].items()
+        },
+    }
+
+
+def measure_allocations(pipeline: ScanPipeline, frames: List[np.ndarray], count: int) -> dict:
+    """Pic d'allocation transitoire par frame et mémoire retenue (tracemalloc, numpy compris)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for index in range(count):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run_frame(pipeline, frames[index % len(frames)])
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_kb_per_frame": float(np.mean(peaks)) / 1024,
+        "alloc_kb_max": float(np.max(peaks)) / 1024,
+        "retained_kb": (retained - baseline) / 1024,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kio sous Linux, octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case: dict) -> dict:
+    """Un cas complet (exécuté dans un processus neuf pour isoler le pic de RSS)"""
+    width, height = RESOLUTIONS[case["resolution"]]
+    frames = load_frames(case["source"], width, height, min(case["frames"], 120))
+    # Pas de cadence : on mesure le débit maximal
+    pipeline = ScanPipeline(PipelineOptions(scan_type=case["scan_type"], target_fps=None))
+    pipeline.reset()
+    for index in range(case["warmup"]):
+        run_frame(pipeline, frames[index % len(frames)])
+
+    result = dict(case)
+    result.update(measure_serial(pipeline, frames, case["frames"]))
+    result.update(measure_pipelined(pipeline, frames, case["frames"]))
+    result.update(measure_allocations(pipeline, frames, min(case["frames"], 60)))
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["jpeg_backend"] = pipeline.preview_encoder.backend_name
+    return result
+
+
+def run_isolated(case: dict) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, case).result()
+
+
+def metric(result: dict, path: str) -> Optional[float]:
+    value = result
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Régressions par rapport à la référence (au-delà de `tolerance`, en relatif)"""
+    reference = {row["case"]: row for row in baseline.get("results", [])}
+    regressions = []
+    for row in results:
+        base = reference.get(row["case"])
+        if base is None:
+            continue
+        for path, direction in COMPARED_METRICS:
+            current, previous = metric(row, path), metric(base, path)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            if -direction * change > tolerance:
+                regressions.append({
+                    "case": row["case"], "metric": path,
+                    "baseline": previous, "current": current, "change": change,
+                })
+    return regressions
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument("--scan-types", default=",".join(SCAN_TYPES))
+    parser.add_argument("--recorded", action="append", default=[],
+                        help="Vidéo, image, dossier ou motif glob d'images enregistrées (répétable)")
+    parser.add_argument("--no-synthetic", action="store_true")
+    parser.add_argument("--no-isolate", action="store_true", help="Tous les cas dans ce processus")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", help="Résultats JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    # Noms de cas stables d'une exécution à l'autre (comparaison à la référence) :
+    # les sources enregistrées sont numérotées entre elles, avec ou sans --no-synthetic
+    sources = ([] if args.no_synthetic else [("synthetic", "synthetic")])
+    sources += [(f"recorded{index}", source) for index, source in enumerate(args.recorded)]
+    cases = [
+        {
+            "case": f"{scan_type}-{resolution}-{label}",
+            "scan_type": scan_type, "resolution": resolution, "source": source,
+            "frames": args.frames, "warmup": args.warmup,
+        }
+        for label, source in sources
+        for resolution in args.resolutions.split(",")
+        for scan_type in args.scan_types.split(",")
+    ]
+
+    results = []
+    for case in cases:
+        results.append(run_case(case) if args.no_isolate else run_isolated(case))
+        row = results[-1]
+        stages = row["stages"]
+        print(f"{row['case']:<28} série {row['fps_serial']:>6.1f} FPS  étages {row['fps_pipelined']:>6.1f} FPS  "
+              + "  ".join(f"{s} p95 {stages[s].get('p95_ms', 0):.2f} ms" for s in STAGES)
+              + f"  alloc {row['alloc_kb_per_frame']:.0f} Kio/frame  RSS {row['peak_rss_mb'] or 0:.0f} Mio",
+              flush=True)
+
+    report = {"schema": SCHEMA_VERSION, "created": time.time(), "environment": environment(), "results": results}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = args.baseline
+        report["regressions"] = compare(results, baseline, args.tolerance)
+        for reg in report["regressions"]:
+            print(f"RÉGRESSION {reg['case']} {reg['metric']}: {reg['baseline']:.2f} -> "
+                  f"{reg['current']:.2f} ({reg['change'] * 100:+.0f} %)")
+        if report["regressions"]:
+            exit_code = 1
+        else:
+            print(f"Aucune régression au-delà de {args.tolerance * 100:.0f} % par rapport à {args.baseline}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark de la latence des événements de l'interface pendant la
+prévisualisation : pipeline dans un thread du processus de l'interface
+contre pipeline dans un processus de capture (mémoire partagée).
+
+Une boucle asyncio joue le rôle de la boucle d'événements Flet : un
+événement est programmé toutes les `--tick-ms` millisecondes et on mesure
+son retard ; la prévisualisation (base64 de la dernière frame) est affichée
+à 30 FPS dans la même boucle.
+
+Usage : python -m benchmarks.bench_ui_latency [--duration 10] [--source synthetic:1280x720]
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from modules.capture_process import CaptureProcess
+from modules.frame_buffer import FrameRingBuffer
+from modules.preview_session import PreviewSession
+from modules.scan_pipeline import PipelineOptions, ScanPipeline
+
+
+async def ui_loop(buffer: FrameRingBuffer, duration: float, tick_ms: float) -> dict:
+    """Simule la boucle d'événements de l'interface ; retourne les retards mesurés"""
+    lags = []
+    shown = 0
+    last_seq = -1
+    tick = tick_ms / 1000
+    next_display = time.perf_counter()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        expected = time.perf_counter() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - expected))
+        if time.perf_counter() >= next_display:
+            next_display += 1 / 30
+            if buffer.latest_seq != last_seq:
+                last_seq = buffer.latest_seq
+                if buffer.latest_base64() is not None:
+                    shown += 1
+    lags = np.array(lags) * 1000
+    return {
+        "events": len(lags),
+        "p50_ms": float(np.percentile(lags, 50)),
+        "p95_ms": float(np.percentile(lags, 95)),
+        "p99_ms": float(np.percentile(lags, 99)),
+        "max_ms": float(lags.max()),
+        "preview_fps": shown / duration,
+    }
+
+
+def run_thread(source: str, duration: float, tick_ms: float) -> dict:
+    pipeline = ScanPipeline(PipelineOptions())
+    pipeline.reset()
+    graph = pipeline.build_stage_graph(lambda job: job, threaded=True)
+    graph.start()
+    session = PreviewSession(
+        source, lambda frame: graph.submit(pipeline.acquire_job(frame)),
+        scheduler=pipeline.scheduler, cost_probe=graph.bottleneck_seconds,
+    )
+    session.start()
+    try:
+        return asyncio.run(ui_loop(pipeline.frame_buffer, duration, tick_ms))
+    finally:
+        session.stop(timeout=2.0)
+        graph.stop()
+
+
+def run_process(source: str, duration: float, tick_ms: float) -> dict:
+    buffer = FrameRingBuffer(capacity=3)
+    process = CaptureProcess(
+        source, PipelineOptions(),
+        on_frame=lambda frame: buffer.write_jpeg(frame.data, timestamp=frame.timestamp),
+    )
+    process.start()
+    try:
+        return asyncio.run(ui_loop(buffer, duration, tick_ms))
+    finally:
+        process.stop(timeout=2.0)
+
+
+def run_idle(duration: float, tick_ms: float) -> dict:
+    return asyncio.run(ui_loop(FrameRingBuffer(capacity=3), duration, tick_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--source", default="synthetic:1280x720")
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = {
+        "sans caméra": run_idle(args.duration, args.tick_ms),
+        "thread": run_thread(args.source, args.duration, args.tick_ms),
+        "processus": run_process(args.source, args.duration, args.tick_ms),
+    }
+    print(f"{'mode':<12} {'événements':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'max (ms)':>9} {'aperçu FPS':>11}")
+    for mode, row in results.items():
+        print(f"{mode:<12} {row['events']:>10} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['max_ms']:>9.2f} {row['preview_fps']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
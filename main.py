@@ -3,6 +3,9 @@ from screens.home_screen import HomeScreen
 from screens.scan_screen import ScanScreen
 from screens.result_screen import ResultScreen
 from screens.history_screen import HistoryScreen
+from modules.utils import close_image_store, get_image_store
+from modules.worker_pool import shutdown_worker_pool
+import atexit
 import logging
 
 # Configuration du logging
@@ -18,10 +21,12 @@ class IdentityVerificationApp:
         self.page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
         self.page.padding = 20
         
-        # États de l'application
-        self.scanned_document_data = None
-        self.scanned_selfie_data = None
+        # États de l'application : les images circulent par clé du magasin partagé
+        self.images = get_image_store()
+        self.scanned_document_key = None
+        self.scanned_selfie_key = None
         self.verification_result = None
+        self._closed = False
         
         # Initialisation des écrans
         self.home_screen = HomeScreen(self)
@@ -59,15 +64,39 @@ class IdentityVerificationApp:
 
     def set_scanned_data(self, document_data: bytes, selfie_data: bytes):
         """Stocke les données scannées"""
-        self.scanned_document_data = document_data
-        self.scanned_selfie_data = selfie_data
+        self.scanned_document_key = self.images.put(document_data) if document_data else None
+        self.scanned_selfie_key = self.images.put(selfie_data) if selfie_data else None
 
     def get_scanned_data(self):
         """Récupère les données scannées"""
-        return self.scanned_document_data, self.scanned_selfie_data
+        return self.images.get(self.scanned_document_key), self.images.get(self.scanned_selfie_key)
+
+    def has_scanned_data(self):
+        """Document et selfie prêts (clés présentes)"""
+        return bool(self.scanned_document_key), bool(self.scanned_selfie_key)
+
+    def clear_scanned_data(self):
+        """Oublie les clés des scans en cours (les images restent dans le magasin)"""
+        self.scanned_document_key = None
+        self.scanned_selfie_key = None
+
+    def close(self):
+        """
+        Fermeture de la page : libère la caméra et annule le travail de cette
+        session. Le pool partagé sert aussi aux autres sessions : il n'est
+        arrêté qu'à la fin du processus.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.scan_screen.close()
+        except Exception as e:
+            logger.error(f"Erreur fermeture écran de scan: {e}")
 
 def main(page: ft.Page):
     app = IdentityVerificationApp(page)
+    page.on_close = lambda e: app.close()
     # install safe call_from_async helper so code can schedule UI updates from threads
     try:
         from modules.ui_utils import install_call_from_async
@@ -77,4 +106,8 @@ def main(page: ft.Page):
     page.update()
 
 if __name__ == "__main__":
+    # Arrêt du processus sans fermeture de page (Ctrl+C du serveur)
+    atexit.register(shutdown_worker_pool)
+    # Images d'identité effacées du disque en fin d'exécution (magasin partagé par les sessions)
+    atexit.register(close_image_store)
     ft.app(target=main, view=ft.AppView.WEB_BROWSER)
\ No newline at end of file
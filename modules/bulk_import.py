@@ -0,0 +1,397 @@
+import os
+import re
+import queue
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.image_encoder import ByteBudgetEncoder, JpegEncoder, preprocess_upload
+from modules.utils import ImageStore
+from modules.worker_pool import PRIORITY_NORMAL, WorkerPool
+
+logger = logging.getLogger(__name__)
+
+ROLE_DOCUMENT = "document"
+ROLE_SELFIE = "selfie"
+_SEPARATORS = re.compile(r"[\s._\-]+")
+
+
+def preprocess_file(path: str, max_size: Tuple[int, int], quality: int = 85,
+                    encoder: Optional[JpegEncoder] = None, max_bytes: Optional[int] = None,
+                    byte_budget: Optional[int] = None, budget_key: str = "default",
+                    budget_encoder: Optional[ByteBudgetEncoder] = None) -> bytes:
+    """
+    Lit un fichier image et le prétraite pour l'envoi (mêmes paramètres, dans
+    le même ordre, que preprocess_upload). Fonction de module (picklable) :
+    la lecture se fait dans le worker, pas dans le thread de l'interface.
+    """
+    with open(path, "rb") as f:
+        image_data = f.read()
+    return preprocess_upload(
+        image_data, max_size, quality=quality, encoder=encoder, max_bytes=max_bytes,
+        byte_budget=byte_budget, budget_key=budget_key, budget_encoder=budget_encoder)
+
+
+@dataclass(frozen=True)
+class PairingRules:
+    """
+    Règles d'appariement par nom de fichier : un mot du nom (ou du dossier
+    parent) désigne le rôle, le reste du nom identifie la personne.
+    Exemple : `dupont_jean_cni.jpg` et `dupont-jean-selfie.png` forment une paire.
+    """
+    document_words: Tuple[str, ...] = ("document", "doc", "cni", "id", "passport", "passeport", "carte", "card",
+                                       "recto")
+    selfie_words: Tuple[str, ...] = ("selfie", "face", "visage", "portrait", "photo")
+
+    def classify(self, path: str) -> Tuple[Optional[str], str]:
+        """(rôle ou None, identifiant de la personne) d'un chemin"""
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        words = [w for w in _SEPARATORS.split(stem) if w]
+        role = None
+        remaining = []
+        for word in words:
+            if role is None and word in self.document_words:
+                role = ROLE_DOCUMENT
+            elif role is None and word in self.selfie_words:
+                role = ROLE_SELFIE
+            else:
+                remaining.append(word)
+        if role is None:
+            # Rangement par dossiers : documents/dupont.jpg, selfies/dupont.jpg
+            parent = os.path.basename(os.path.dirname(path)).lower()
+            parent_words = set(_SEPARATORS.split(parent)) | {parent.rstrip("s")}
+            if parent_words & set(self.document_words):
+                role = ROLE_DOCUMENT
+            elif parent_words & set(self.selfie_words):
+                role = ROLE_SELFIE
+        return role, "_".join(remaining)
+
+
+@dataclass
+class ImportItem:
+    path: str
+    role: str
+    subject: str
+    key: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ImportPair:
+    """Document et selfie d'une même personne"""
+    subject: str
+    document: ImportItem
+    selfie: ImportItem
+
+    @property
+    def ready(self) -> bool:
+        return self.document.key is not None and self.selfie.key is not None
+
+    @property
+    def keys(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.document.key, self.selfie.key
+
+
+def pair_files(paths: Iterable[str], rules: Optional[PairingRules] = None) -> Tuple[List[ImportPair], List[str]]:
+    """Apparie documents et selfies ; retourne (paires, fichiers sans partenaire ni rôle)"""
+    rules = rules or PairingRules()
+    by_subject: Dict[str, Dict[str, List[str]]] = {}
+    unmatched = []
+    for path in paths:
+        role, subject = rules.classify(path)
+        if role is None or not subject:
+            unmatched.append(path)
+            continue
+        by_subject.setdefault(subject, {}).setdefault(role, []).append(path)
+
+    pairs = []
+    for subject, roles in sorted(by_subject.items()):
+        documents = sorted(roles.get(ROLE_DOCUMENT, []))
+        selfies = sorted(roles.get(ROLE_SELFIE, []))
+        # Un seul couple par personne ; les fichiers en trop sont signalés
+        if documents and selfies:
+            pairs.append(ImportPair(
+                subject,
+                ImportItem(documents[0], ROLE_DOCUMENT, subject),
+                ImportItem(selfies[0], ROLE_SELFIE, subject),
+            ))
+            unmatched.extend(documents[1:] + selfies[1:])
+        else:
+            unmatched.extend(documents + selfies)
+    return pairs, unmatched
+
+
+class BulkImporter:
+    """
+    Import de nombreux fichiers : appariement par nom, prétraitement en
+    parallèle dans un WorkerPool, images rangées dans le magasin partagé.
+
+    Au plus `max_in_flight` fichiers sont soumis au pool à la fois (les
+    suivants partent à chaque fin de tâche) : la mémoire reste bornée quel
+    que soit le nombre de fichiers, et le pool n'est jamais saturé. Les
+    deux fichiers d'une paire sont soumis l'un après l'autre pour que les
+    paires complètes arrivent au fil de l'eau (`on_pair`).
+    """
+
+    def __init__(self, store: ImageStore, pool: WorkerPool, max_size: Tuple[int, int],
+                 quality: int = 85, max_bytes: Optional[int] = None,
+                 byte_budgets: Optional[Dict[str, int]] = None, rules: Optional[PairingRules] = None,
+                 max_in_flight: Optional[int] = None,
+                 on_progress: Optional[Callable[["BulkImporter"], None]] = None,
+                 on_pair: Optional[Callable[[ImportPair], None]] = None,
+                 on_done: Optional[Callable[["BulkImporter"], None]] = None):
+        self.store = store
+        self.pool = pool
+        self.max_size = max_size
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.byte_budgets = byte_budgets or {}
+        self.rules = rules or PairingRules()
+        self.max_in_flight = max_in_flight or min(pool.config.workers * 2, pool.config.max_pending)
+        self.on_progress = on_progress
+        self.on_pair = on_pair
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[ImportItem, ImportPair]] = []
+        self._in_flight = 0
+        self._cancelled = False
+        self.pairs: List[ImportPair] = []
+        self.unmatched: List[str] = []
+
+        # Statistiques
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.pairs_ready = 0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.started_at > 0 and not self.finished_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def start(self, paths: Iterable[str]) -> Tuple[List[ImportPair], List[str]]:
+        """Apparie les fichiers et lance leur prétraitement ; retourne (paires, non appariés)"""
+        self.pairs, self.unmatched = pair_files(paths, self.rules)
+        with self._lock:
+            self._pending = [(item, pair) for pair in self.pairs for item in (pair.document, pair.selfie)]
+            self._pending.reverse()  # pop() depuis la fin : ordre des paires conservé
+            self.total = len(self._pending)
+            self.completed = self.failed = self.pairs_ready = 0
+            self.started_at = time.perf_counter()
+            self.finished_at = 0.0
+            self._cancelled = False
+        if not self.total:
+            self._finish()
+        else:
+            self._pump()
+        return self.pairs, self.unmatched
+
+    def cancel(self):
+        """Arrête de soumettre des fichiers et annule ceux qui attendent dans le pool"""
+        with self._lock:
+            self._cancelled = True
+            skipped = len(self._pending)
+            self._pending = []
+            self.total -= skipped
+        self.pool.cancel_group(self)
+
+    def _pump(self):
+        """Soumet des fichiers tant que la fenêtre le permet"""
+        submitted = []
+        with self._lock:
+            while not self._cancelled and self._pending and self._in_flight < self.max_in_flight:
+                item, pair = self._pending.pop()
+                future = self.pool.submit(
+                    preprocess_file, item.path, self.max_size, quality=self.quality,
+                    max_bytes=self.max_bytes, byte_budget=self.byte_budgets.get(item.role),
+                    budget_key=item.role, priority=PRIORITY_NORMAL, group=self,
+                )
+                self._in_flight += 1
+                submitted.append((future, item, pair))
+        # Rappels ajoutés hors du verrou : un Future déjà terminé rappelle immédiatement
+        for future, item, pair in submitted:
+            future.add_done_callback(lambda f, item=item, pair=pair: self._on_file_done(f, item, pair))
+
+    def _on_file_done(self, future, item: ImportItem, pair: ImportPair):
+        key = None
+        if future.cancelled():
+            item.error = "annulé"
+        elif future.exception() is not None:
+            item.error = str(future.exception())
+            logger.error(f"Import {item.path} impossible: {item.error}")
+        else:
+            key = self.store.put(future.result())
+
+        with self._lock:
+            # Clé publiée sous le verrou : si les deux fichiers d'une paire finissent en même
+            # temps, un seul des deux rappels voit la paire complète et l'envoie
+            item.key = key
+            self._in_flight -= 1
+            if future.cancelled():
+                self.total -= 1
+            else:
+                self.completed += 1
+                if item.error is not None:
+                    self.failed += 1
+            # Après annulation, les fichiers déjà en cours sont rangés mais plus envoyés à la vérification
+            pair_ready = item.key is not None and pair.ready and not self._cancelled
+            if pair_ready:
+                self.pairs_ready += 1
+            finished = not self._pending and self._in_flight == 0
+
+        if pair_ready and self.on_pair is not None:
+            try:
+                self.on_pair(pair)
+            except Exception:
+                logger.exception("Erreur dans le rappel on_pair")
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self)
+            except Exception:
+                logger.exception("Erreur dans le rappel on_progress")
+        if finished:
+            self._finish()
+        else:
+            self._pump()
+
+    def _finish(self):
+        with self._lock:
+            if self.finished_at:
+                return
+            self.finished_at = time.perf_counter()
+        logger.info(f"Import groupé terminé : {self.completed}/{self.total} fichiers, "
+                    f"{self.pairs_ready} paires, {self.failed} échecs")
+        if self.on_done is not None:
+            try:
+                self.on_done(self)
+            except Exception:
+                logger.exception("Erreur dans le rappel on_done")
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.total if self.total else 1.0
+
+    def stats(self) -> dict:
+        """Avancement et débit (fichiers par seconde)"""
+        with self._lock:
+            end = self.finished_at or time.perf_counter()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self._in_flight,
+                "pairs": len(self.pairs),
+                "pairs_ready": self.pairs_ready,
+                "unmatched": len(self.unmatched),
+                "elapsed_s": elapsed,
+                "files_per_second": self.completed / elapsed if elapsed > 0 else 0.0,
+                "workers": self.pool.config.workers,
+                "pool_kind": self.pool.kind,
+            }
+
+
+class VerificationQueue:
+    """
+    File de vérification des paires importées : `workers` threads envoient
+    les paires à l'API une à une (images relues dans le magasin par clé).
+    `on_result(paire, résultat)` reçoit le résultat (None en cas d'échec).
+    """
+
+    def __init__(self, api_client, store: ImageStore,
+                 on_result: Optional[Callable[[ImportPair, Optional[dict]], None]] = None, workers: int = 1):
+        self.api_client = api_client
+        self.store = store
+        self.on_result = on_result
+        self.workers = workers
+        self._queue: "queue.Queue[Optional[ImportPair]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.results: List[Tuple[ImportPair, Optional[dict]]] = []
+
+        # Statistiques
+        self.submitted = 0
+        self.verified = 0
+        self.failed = 0
+
+    def submit(self, pair: ImportPair):
+        """Ajoute une paire prête à la file (démarre les threads au premier appel ; ignorée après stop)"""
+        with self._lock:
+            if self._stopped:
+                return
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._worker_loop, name=f"verify-{index}", daemon=True)
+                    self._threads.append(thread)
+                    thread.start()
+            self.submitted += 1
+        self._queue.put(pair)
+
+    def clear(self) -> int:
+        """Retire les paires qui attendent encore ; retourne leur nombre"""
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            dropped += 1
+
+    def stop(self, timeout: float = 2.0, discard_pending: bool = False):
+        """Arrête les threads après les paires déjà en file (ou sans elles, avec `discard_pending`)"""
+        if discard_pending:
+            self.clear()
+        with self._lock:
+            self._stopped = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _worker_loop(self):
+        while True:
+            pair = self._queue.get()
+            if pair is None:
+                return
+            result = None
+            try:
+                document_key, selfie_key = pair.keys
+                document, selfie = self.store.get(document_key), self.store.get(selfie_key)
+                if document is None or selfie is None:
+                    raise RuntimeError(f"Images de {pair.subject} absentes du magasin")
+                result = self.api_client.verify_identity(document, selfie)
+            except Exception as e:
+                logger.error(f"Vérification {pair.subject} impossible: {e}")
+            with self._lock:
+                if result:
+                    self.verified += 1
+                else:
+                    self.failed += 1
+                self.results.append((pair, result))
+            if self.on_result is not None:
+                try:
+                    self.on_result(pair, result)
+                except Exception:
+                    logger.exception("Erreur dans le rappel on_result")
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "pending": self.pending,
+                "verified": self.verified,
+                "failed": self.failed,
+            }
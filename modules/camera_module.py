@@ -0,0 +1,674 @@
+import glob
+import os
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from modules.native_frame import NativeFrameConverter
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class CameraSource:
+    """
+    Source de frames avec thread d'acquisition dédié.
+
+    Le thread appelle `_grab` en continu pour vider le tampon du pilote et ne
+    décode (`_retrieve`) une frame que lorsque le lecteur a consommé la
+    précédente : les frames que personne ne lira ne sont jamais décodées, et
+    `read` retourne une frame déjà décodée sans bloquer sur le décodage.
+
+    Les sous-classes implémentent `_open`, `_grab`, `_retrieve` et `_release`.
+    """
+
+    # Les sources non temps réel (fichiers, synthétique) sont cadencées par `fps`
+    live = True
+
+    def __init__(self, name: str, fps: Optional[float] = None):
+        self.name = name
+        self.fps = fps
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._opened = False
+        self._frame: Optional[np.ndarray] = None
+        self._seq = -1
+        self._timestamp = 0.0
+        self._wanted = True
+        self._error: Optional[Exception] = None
+
+        # Compteurs
+        self.grabbed = 0
+        self.retrieved = 0
+        self.skipped = 0
+        self.errors = 0
+
+    # --- À implémenter par les sous-classes ---
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _grab(self) -> bool:
+        raise NotImplementedError
+
+    def _retrieve(self) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def _release(self):
+        pass
+
+    # --- Cycle de vie ---
+
+    @property
+    def is_opened(self) -> bool:
+        return self._opened
+
+    def open(self):
+        """Ouvre la source et démarre le thread d'acquisition"""
+        if self._opened:
+            return
+        self._open()
+        self._opened = True
+        self._running = True
+        self._seq = -1
+        self._frame = None
+        self._wanted = True
+        self._error = None
+        self._thread = threading.Thread(target=self._grab_loop, name=f"camera-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Source caméra ouverte: {self.name}")
+
+    def close(self, timeout: float = 2.0) -> bool:
+        """Arrête le thread d'acquisition et libère la source ; retourne False si le thread ne s'est pas arrêté"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        stopped = True
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            stopped = not thread.is_alive()
+            if not stopped:
+                logger.warning(f"Thread d'acquisition {self.name} toujours actif après {timeout}s")
+        if self._opened:
+            try:
+                self._release()
+            finally:
+                self._opened = False
+                logger.info(f"Source caméra libérée: {self.name}")
+        return stopped
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Lecture ---
+
+    def read(self, timeout: float = 1.0, after: int = -1) -> Tuple[int, Optional[np.ndarray]]:
+        """
+        Retourne (séquence, frame) pour la première frame plus récente que `after`.
+
+        Retourne (after, None) si aucune nouvelle frame n'arrive dans le délai.
+        Lève l'erreur du thread d'acquisition si la source est tombée en panne.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq <= after:
+                if self._error is not None:
+                    raise self._error
+                if not self._running:
+                    return after, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return after, None
+                self._cond.wait(remaining)
+            frame, self._frame = self._frame, None
+            self._wanted = True
+            return self._seq, frame
+
+    @property
+    def latest_timestamp(self) -> float:
+        return self._timestamp
+
+    def _grab_loop(self):
+        period = 1.0 / self.fps if (self.fps and not self.live) else 0.0
+        next_deadline = time.monotonic()
+        try:
+            while self._running:
+                if period:
+                    next_deadline += period
+                    delay = next_deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_deadline = time.monotonic()
+
+                if not self._grab():
+                    self.errors += 1
+                    if not self._running:
+                        break
+                    time.sleep(0.01)
+                    continue
+                self.grabbed += 1
+
+                with self._cond:
+                    wanted = self._wanted
+                if not wanted:
+                    # Personne n'attend : on vide le pilote sans décoder
+                    self.skipped += 1
+                    continue
+
+                frame = self._retrieve()
+                if frame is None:
+                    self.errors += 1
+                    continue
+                self.retrieved += 1
+
+                with self._cond:
+                    self._frame = frame
+                    self._seq += 1
+                    self._timestamp = time.monotonic()
+                    self._wanted = False
+                    self._cond.notify_all()
+        except Exception as e:
+            logger.error(f"Erreur acquisition {self.name}: {e}")
+            with self._cond:
+                self._error = e
+                self._running = False
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Retourne les compteurs d'acquisition"""
+        return {
+            "source": self.name,
+            "grabbed": self.grabbed,
+            "retrieved": self.retrieved,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+@dataclass(frozen=True)
+class CameraMode:
+    """Mode de capture demandé au pilote (ou obtenu après négociation)"""
+    width: int = 1280
+    height: int = 720
+    fps: float = 30.0
+    fourcc: str = "MJPG"
+
+
+DEFAULT_CAMERA_MODE = CameraMode()
+
+# Modes négociés par (périphérique, backend, mode demandé) : les ouvertures suivantes sont directes
+_mode_cache: Dict[Tuple[int, int, CameraMode], CameraMode] = {}
+_mode_lock = threading.Lock()
+
+
+def _fourcc_str(value: float) -> str:
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def _apply_mode(cap, mode: CameraMode) -> CameraMode:
+    """Applique un mode (FOURCC d'abord : certains pilotes n'exposent les hautes résolutions qu'en MJPG)"""
+    if mode.fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode.fourcc))
+    if mode.width and mode.height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode.height)
+    if mode.fps:
+        cap.set(cv2.CAP_PROP_FPS, mode.fps)
+    return CameraMode(
+        width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        fps=float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+        fourcc=_fourcc_str(cap.get(cv2.CAP_PROP_FOURCC)),
+    )
+
+
+def negotiate_camera_mode(cap, index: int, requested: CameraMode,
+                          api_preference: int = cv2.CAP_ANY, force: bool = False) -> CameraMode:
+    """
+    Demande `requested` au pilote et retourne le mode réellement obtenu.
+
+    La première négociation vérifie qu'une frame arrive ; si le FOURCC
+    demandé l'empêche, on retombe sur le format par défaut du pilote à la
+    même résolution. Le résultat est mis en cache par périphérique : les
+    ouvertures suivantes appliquent directement le mode retenu.
+    """
+    key = (index, api_preference, requested)
+    with _mode_lock:
+        cached = None if force else _mode_cache.get(key)
+    if cached is not None:
+        _apply_mode(cap, cached)
+        return cached
+
+    start = time.perf_counter()
+    actual = _apply_mode(cap, requested)
+    if not cap.grab() and requested.fourcc:
+        logger.info(f"Caméra {index}: pas de frame en {requested.fourcc}, format par défaut du pilote")
+        actual = _apply_mode(cap, CameraMode(requested.width, requested.height, requested.fps, fourcc=""))
+    with _mode_lock:
+        _mode_cache[key] = actual
+    logger.info(
+        f"Caméra {index}: mode {actual.width}x{actual.height} @ {actual.fps:.0f} FPS {actual.fourcc or '?'} "
+        f"(demandé {requested.width}x{requested.height} {requested.fourcc}) "
+        f"négocié en {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return actual
+
+
+def is_encoded_frame(frame: np.ndarray) -> bool:
+    """Vrai si la frame est un flux compressé (JPEG) brut plutôt qu'une image décodée"""
+    # OpenCV retourne les données MJPEG non converties sous forme d'une ligne d'octets
+    return frame.ndim == 2 and frame.shape[0] == 1 and frame.dtype == np.uint8
+
+
+class OpenCVCameraSource(CameraSource):
+    """
+    Périphérique caméra via cv2.VideoCapture.
+
+    Avec `mode`, la résolution, la cadence et le FOURCC sont négociés à
+    l'ouverture. Avec `passthrough` et un mode MJPG obtenu, les frames JPEG
+    de la caméra sont livrées telles quelles (voir `is_encoded_frame`), sans
+    décodage.
+    """
+
+    def __init__(self, index: int = 0, api_preference: int = cv2.CAP_ANY,
+                 mode: Optional[CameraMode] = None, passthrough: bool = False):
+        super().__init__(f"device:{index}")
+        self.index = index
+        self.api_preference = api_preference
+        self.requested_mode = mode
+        self.passthrough = passthrough
+        self.mode: Optional[CameraMode] = None
+        self.passthrough_active = False
+        self._cap = None
+
+    def _open(self):
+        self._cap = cv2.VideoCapture(self.index, self.api_preference)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            raise RuntimeError("Caméra non disponible")
+        if self.requested_mode is not None:
+            self.mode = negotiate_camera_mode(self._cap, self.index, self.requested_mode, self.api_preference)
+        self.passthrough_active = False
+        if self.passthrough and self.mode is not None and self.mode.fourcc == "MJPG":
+            # JPEG de la caméra livré sans conversion en BGR
+            self.passthrough_active = bool(self._cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+
+    def _grab(self) -> bool:
+        return self._cap.grab()
+
+    def _retrieve(self) -> Optional[np.ndarray]:
+        ret, frame = self._cap.retrieve()
+        return frame if ret else None
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        if self.mode is not None:
+            stats["mode"] = f"{self.mode.width}x{self.mode.height}@{self.mode.fps:.0f} {self.mode.fourcc}"
+        stats["passthrough"] = self.passthrough_active
+        return stats
+
+
+class FileCameraSource(CameraSource):
+    """Fichier vidéo ou séquence d'images (dossier ou motif glob), rejoué en boucle"""
+
+    live = False
+
+    def __init__(self, path: str, fps: Optional[float] = None, loop: bool = True, preload: bool = True):
+        super().__init__(f"file:{path}", fps=fps)
+        self.path = path
+        self.loop = loop
+        self.preload = preload
+        self._cap = None
+        self._files: List[str] = []
+        self._images: List[np.ndarray] = []
+        self._index = -1
+
+    def _open(self):
+        self._files = self._list_images(self.path)
+        if self._files:
+            if self.preload:
+                self._images = [img for img in (cv2.imread(f) for f in self._files) if img is not None]
+                if not self._images:
+                    raise RuntimeError(f"Aucune image lisible: {self.path}")
+            self.fps = self.fps or 30.0
+        else:
+            self._cap = cv2.VideoCapture(self.path)
+            if not self._cap.isOpened():
+                raise RuntimeError(f"Fichier vidéo illisible: {self.path}")
+            self.fps = self.fps or self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._index = -1
+
+    @staticmethod
+    def _list_images(path: str) -> List[str]:
+        if os.path.isdir(path):
+            candidates = [os.path.join(path, name) for name in os.listdir(path)]
+        elif any(ch in path for ch in "*?["):
+            candidates = glob.glob(path)
+        else:
+            candidates = [path] if path.lower().endswith(IMAGE_EXTENSIONS) else []
+        return sorted(f for f in candidates if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    def _grab(self) -> bool:
+        if self._cap is not None:
+            if self._cap.grab():
+                return True
+            if not self.loop:
+                self._running = False
+                return False
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return self._cap.grab()
+
+        count = len(self._images) if self.preload else len(self._files)
+        if self._index + 1 >= count and not self.loop:
+            self._running = False
+            return False
+        self._index = (self._index + 1) % count
+        return True
+
+    def _retrieve(self) -> Optional[np.ndarray]:
+        if self._cap is not None:
+            ret, frame = self._cap.retrieve()
+            return frame if ret else None
+        if self.preload:
+            return self._images[self._index].copy()
+        return cv2.imread(self._files[self._index])
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self._images = []
+
+
+class SyntheticCameraSource(CameraSource):
+    """Générateur de frames synthétiques : document clair qui bouge légèrement sur fond texturé"""
+
+    live = False
+
+    def __init__(self, width: int = 1280, height: int = 720, fps: float = 30.0, seed: int = 0):
+        super().__init__(f"synthetic:{width}x{height}", fps=fps)
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self._background = None
+        self._document = None
+        self._tick = 0
+
+    def _open(self):
+        rng = np.random.default_rng(self.seed)
+        gradient = np.linspace(40, 160, self.width, dtype=np.float32)[None, :, None]
+        background = np.broadcast_to(gradient, (self.height, self.width, 3)).copy()
+        background += rng.normal(0, 10, background.shape).astype(np.float32)
+        self._background = np.clip(background, 0, 255).astype(np.uint8)
+
+        doc_w, doc_h = self.width // 2, int(self.width // 2 * 0.63)  # format carte ID-1
+        document = np.full((doc_h, doc_w, 3), (235, 235, 230), dtype=np.uint8)
+        for line in range(6):
+            y = int(doc_h * (0.2 + line * 0.12))
+            cv2.line(document, (doc_w // 3, y), (doc_w - 20, y), (40, 40, 40), 3)
+        cv2.rectangle(document, (15, doc_h // 5), (doc_w // 3 - 15, doc_h - 20), (90, 110, 140), -1)
+        self._document = document
+        self._tick = 0
+
+    def _grab(self) -> bool:
+        self._tick += 1
+        return True
+
+    def _retrieve(self) -> Optional[np.ndarray]:
+        frame = self._background.copy()
+        doc_h, doc_w = self._document.shape[:2]
+        # Léger mouvement de main pour exercer stabilité / suivi
+        dx = int(6 * np.sin(self._tick / 7.0))
+        dy = int(4 * np.cos(self._tick / 11.0))
+        x = (self.width - doc_w) // 2 + dx
+        y = (self.height - doc_h) // 2 + dy
+        frame[y:y + doc_h, x:x + doc_w] = self._document
+        return frame
+
+
+class NativeCameraSource(CameraSource):
+    """
+    Frames poussées par la caméra native (Android) au lieu d'être lues par OpenCV.
+
+    `push` ne fait que retenir une référence au tampon : la conversion en BGR
+    (une seule copie) a lieu dans le thread d'acquisition, et seulement si la
+    boucle de capture attend une frame. Une frame poussée avant que la
+    précédente ait été prise la remplace. Le tampon ne doit pas être réutilisé
+    par l'appelant après `push` (bytes, ou tampon natif non recyclé).
+    """
+
+    def __init__(self, name: str = "native", buffers: int = 8):
+        super().__init__(name)
+        # Tampons de sortie en rotation : plus que de frames en vol dans le graphe à étages
+        self._converter = NativeFrameConverter(buffers=buffers)
+        self._pending = None
+        self._current = None
+
+        # Compteurs
+        self.pushed = 0
+        self.replaced = 0
+
+    def push(self, data, fmt: str = "jpeg", width: int = 0, height: int = 0, stride: int = 0):
+        """Publie une frame native (JPEG, NV21/NV12/YUV420, RGBA...) avec ses dimensions"""
+        with self._cond:
+            if not self._running:
+                return
+            if self._pending is not None:
+                self.replaced += 1
+            self._pending = (data, fmt, width, height, stride)
+            self.pushed += 1
+            self._cond.notify_all()
+
+    def _open(self):
+        self._pending = None
+        self._current = None
+
+    def _grab(self) -> bool:
+        with self._cond:
+            while self._pending is None and self._running:
+                self._cond.wait()
+            self._current, self._pending = self._pending, None
+        return self._current is not None
+
+    def _retrieve(self) -> Optional[np.ndarray]:
+        current, self._current = self._current, None
+        if current is None:
+            return None
+        try:
+            return self._converter.convert(*current)
+        except ValueError as e:
+            logger.error(f"Frame native rejetée: {e}")
+            return None
+
+    def _release(self):
+        self._pending = None
+        self._current = None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({"pushed": self.pushed, "replaced": self.replaced})
+        stats.update(self._converter.stats())
+        return stats
+
+
+def create_camera_source(spec: Union[int, str, CameraSource], mode: Optional[CameraMode] = None,
+                         passthrough: bool = False) -> CameraSource:
+    """
+    Crée une source à partir d'une description :
+    - entier (ou chaîne numérique) : index de périphérique OpenCV (mode et
+      pass-through JPEG éventuels)
+    - "synthetic" ou "synthetic:1280x720" : générateur synthétique
+    - chemin : fichier vidéo, image, dossier ou motif glob d'images
+    """
+    if isinstance(spec, CameraSource):
+        return spec
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return OpenCVCameraSource(int(spec), mode=mode, passthrough=passthrough)
+    if spec.startswith("synthetic"):
+        _, _, size = spec.partition(":")
+        if size:
+            width, height = (int(v) for v in size.lower().split("x"))
+            return SyntheticCameraSource(width, height)
+        return SyntheticCameraSource()
+    return FileCameraSource(spec)
+
+
+@dataclass
+class CameraInfo:
+    """Capacités d'un périphérique relevées au sondage"""
+    index: int
+    label: str
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+
+
+DEFAULT_CAMERA_LABELS = {0: "📷 Caméra arrière", 1: "🤳 Caméra avant"}
+
+# Résultat du sondage partagé par tout le processus (le sondage est lent)
+_probe_cache: Optional[Dict[int, CameraInfo]] = None
+_probe_lock = threading.Lock()
+
+
+def probe_cameras(max_devices: int = 4, force: bool = False) -> Dict[int, CameraInfo]:
+    """Sonde une seule fois les périphériques disponibles et met leurs capacités en cache"""
+    global _probe_cache
+    with _probe_lock:
+        if _probe_cache is not None and not force:
+            return _probe_cache
+        start = time.perf_counter()
+        found = {}
+        for index in range(max_devices):
+            cap = cv2.VideoCapture(index)
+            try:
+                if not cap.isOpened():
+                    continue
+                found[index] = CameraInfo(
+                    index=index,
+                    label=DEFAULT_CAMERA_LABELS.get(index, f"🎥 Caméra {index}"),
+                    width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    fps=float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+                )
+            finally:
+                cap.release()
+        _probe_cache = found
+        logger.info(f"Sondage caméras: {len(found)} périphérique(s) en {(time.perf_counter() - start) * 1000:.0f} ms")
+        return found
+
+
+class CameraSessionManager:
+    """
+    Gère la source active de la boucle de capture.
+
+    Un changement de caméra est seulement demandé depuis l'UI (`request_switch`)
+    et appliqué par la boucle de capture elle-même (`apply_pending_switch`) :
+    pas de nouveau thread, pas de pause. L'ancienne source est fermée (thread
+    joint, périphérique libéré) avant l'ouverture de la nouvelle ; la latence
+    jusqu'à la première frame de la nouvelle source est mesurée et journalisée.
+    `mode` et `passthrough` sont transmis aux périphériques ouverts par la
+    fabrique par défaut.
+    """
+
+    def __init__(self, source_factory: Callable[[Union[int, str]], CameraSource] = None,
+                 mode: Optional[CameraMode] = None, passthrough: bool = False):
+        self.mode = mode
+        self.passthrough = passthrough
+        self._factory = source_factory or (
+            lambda spec: create_camera_source(spec, mode=self.mode, passthrough=self.passthrough))
+        self._lock = threading.Lock()
+        self._pending = None
+        self._has_pending = False
+        self._switch_requested_at: Optional[float] = None
+        self._switch_opened_ms = 0.0
+        self.current: Optional[CameraSource] = None
+        self.current_spec = None
+
+        # Statistiques
+        self.switch_count = 0
+        self.last_switch_ms: Optional[float] = None
+
+    def available_cameras(self, max_devices: int = 4) -> Dict[int, str]:
+        """Retourne {index: libellé} des périphériques détectés"""
+        return {index: info.label for index, info in probe_cameras(max_devices).items()}
+
+    def open(self, spec: Union[int, str]) -> CameraSource:
+        """Ouvre la source initiale (appelé par la boucle de capture)"""
+        self.close()
+        source = self._factory(spec)
+        source.open()
+        self.current = source
+        self.current_spec = spec
+        return source
+
+    def request_switch(self, spec: Union[int, str]):
+        """Demande un changement de source ; appliqué à la prochaine itération de la boucle"""
+        with self._lock:
+            self._pending = spec
+            self._has_pending = True
+            self._switch_requested_at = time.perf_counter()
+
+    def apply_pending_switch(self) -> Optional[CameraSource]:
+        """Applique un changement en attente ; retourne la nouvelle source ou None"""
+        with self._lock:
+            if not self._has_pending:
+                return None
+            spec, self._pending, self._has_pending = self._pending, None, False
+        if spec == self.current_spec and self.current is not None:
+            self._switch_requested_at = None
+            return None
+
+        previous_spec = self.current_spec
+        start = time.perf_counter()
+        self.close()
+        try:
+            source = self.open(spec)
+        except Exception as e:
+            logger.error(f"Ouverture de la caméra {spec} impossible ({e}), retour à {previous_spec}")
+            self._switch_requested_at = None
+            if previous_spec is None:
+                raise
+            return self.open(previous_spec)
+        self._switch_opened_ms = (time.perf_counter() - start) * 1000
+        self.switch_count += 1
+        return source
+
+    def note_frame(self):
+        """Signale une frame reçue : clôt la mesure de latence d'un changement en cours"""
+        requested_at = self._switch_requested_at
+        if requested_at is None:
+            return
+        self._switch_requested_at = None
+        self.last_switch_ms = (time.perf_counter() - requested_at) * 1000
+        logger.info(
+            f"Changement de caméra vers {self.current_spec}: première frame après "
+            f"{self.last_switch_ms:.0f} ms (fermeture + ouverture {self._switch_opened_ms:.0f} ms)"
+        )
+
+    def close(self) -> bool:
+        """Ferme la source active de façon déterministe"""
+        source, self.current = self.current, None
+        self.current_spec = None
+        if source is None:
+            return True
+        return source.close()
@@ -0,0 +1,474 @@
+import json
+import math
+import struct
+import threading
+import time
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple, Union
+
+from modules.frame_quality import QualityScores
+
+logger = logging.getLogger(__name__)
+
+# En-tête global : dernière séquence publiée, nombre d'emplacements, taille utile d'un emplacement
+_RING_HEADER = struct.Struct("<qqq")
+_RING_HEADER_SIZE = 64
+# En-tête d'emplacement : séquence (-1 pendant l'écriture), longueur, horodatage, métadonnées
+META_FIELDS = 6
+_SLOT_HEADER = struct.Struct(f"<qqd{META_FIELDS}d")
+_SLOT_HEADER_SIZE = 128
+_SEQ = struct.Struct("<q")
+
+# Messages binaires (pas de pickle) : 1 octet de type + charge utile
+MSG_READY = b"R"
+MSG_FRAME = b"F"
+MSG_CAPTURED = b"C"
+MSG_ERROR = b"E"
+MSG_STATS = b"T"
+CMD_CAPTURE = b"c"
+CMD_SWITCH = b"s"
+CMD_STATS = b"t"
+CMD_STOP = b"q"
+_CAPTURED = struct.Struct("<qB")
+
+
+class SharedFrame(NamedTuple):
+    """Frame encodée lue dans un anneau partagé"""
+    seq: int
+    timestamp: float
+    data: bytes
+    meta: Tuple[float, ...]
+
+
+class SharedFrameRing:
+    """
+    Anneau d'emplacements en mémoire partagée entre le processus de capture
+    et le processus de l'interface.
+
+    Un seul écrivain. Chaque emplacement porte un numéro de séquence mis à -1
+    pendant l'écriture puis republié : le lecteur relit la séquence après la
+    copie et rejette une frame écrasée entre-temps. Les octets passent
+    directement par la mémoire partagée, sans sérialisation.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._buf = shm.buf
+        self._owner = owner
+        _, self.slots, self.slot_size = _RING_HEADER.unpack_from(self._buf, 0)
+        self._next_seq = self.latest_seq + 1
+
+        # Compteurs
+        self.writes = 0
+        self.torn_reads = 0
+
+    @classmethod
+    def create(cls, slots: int = 3, slot_size: int = 1 << 20) -> "SharedFrameRing":
+        """Alloue un nouvel anneau (processus propriétaire, responsable de unlink)"""
+        if slots < 2:
+            raise ValueError("L'anneau doit avoir au moins 2 emplacements")
+        size = _RING_HEADER_SIZE + slots * (_SLOT_HEADER_SIZE + slot_size)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        _RING_HEADER.pack_into(shm.buf, 0, -1, slots, slot_size)
+        for index in range(slots):
+            _SEQ.pack_into(shm.buf, _RING_HEADER_SIZE + index * (_SLOT_HEADER_SIZE + slot_size), -1)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameRing":
+        """Ouvre un anneau existant par son nom"""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def latest_seq(self) -> int:
+        """Séquence de la dernière frame publiée (-1 si vide)"""
+        return _SEQ.unpack_from(self._buf, 0)[0]
+
+    def _offset(self, seq: int) -> int:
+        return _RING_HEADER_SIZE + (seq % self.slots) * (_SLOT_HEADER_SIZE + self.slot_size)
+
+    def write(self, data: Union[bytes, memoryview], meta: Sequence[float] = (),
+              timestamp: Optional[float] = None) -> int:
+        """Publie une frame encodée ; retourne son numéro de séquence"""
+        length = len(data)
+        if length > self.slot_size:
+            raise ValueError(f"Frame de {length} octets trop grande pour l'anneau ({self.slot_size})")
+        meta = tuple(meta)[:META_FIELDS] + (0.0,) * max(0, META_FIELDS - len(meta))
+        seq = self._next_seq
+        offset = self._offset(seq)
+        _SEQ.pack_into(self._buf, offset, -1)
+        start = offset + _SLOT_HEADER_SIZE
+        self._buf[start:start + length] = data
+        _SLOT_HEADER.pack_into(
+            self._buf, offset, -1, length,
+            timestamp if timestamp is not None else time.monotonic(), *meta,
+        )
+        _SEQ.pack_into(self._buf, offset, seq)
+        _SEQ.pack_into(self._buf, 0, seq)
+        self._next_seq = seq + 1
+        self.writes += 1
+        return seq
+
+    def read(self, seq: Optional[int] = None) -> Optional[SharedFrame]:
+        """Copie la frame `seq` (la dernière par défaut) ; None si absente ou écrasée"""
+        if seq is None:
+            seq = self.latest_seq
+        if seq < 0:
+            return None
+        offset = self._offset(seq)
+        header = _SLOT_HEADER.unpack_from(self._buf, offset)
+        if header[0] != seq:
+            return None
+        length, timestamp, meta = header[1], header[2], header[3:]
+        start = offset + _SLOT_HEADER_SIZE
+        data = bytes(self._buf[start:start + length])
+        if _SEQ.unpack_from(self._buf, offset)[0] != seq:
+            self.torn_reads += 1
+            return None
+        return SharedFrame(seq, timestamp, data, meta)
+
+    def close(self):
+        """Détache l'anneau ; le propriétaire libère aussi le segment"""
+        self._buf = None
+        try:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def scores_to_meta(scores: Optional[QualityScores], auto_progress: float = 0.0) -> Tuple[float, ...]:
+    """Scores de qualité vers les métadonnées d'un emplacement (NaN : frame non évaluée)"""
+    if scores is None:
+        return (float("nan"),) + (0.0,) * (META_FIELDS - 1)
+    flags = (scores.sharp_ok << 0) | (scores.exposure_ok << 1) | (scores.glare_ok << 2) | (scores.stable_ok << 3)
+    return (scores.sharpness, scores.brightness, scores.glare, scores.motion, float(flags), auto_progress)
+
+
+def scores_from_meta(meta: Sequence[float]) -> Tuple[Optional[QualityScores], float]:
+    """Métadonnées d'un emplacement vers scores de qualité et progression de la capture automatique"""
+    if math.isnan(meta[0]):
+        return None, 0.0
+    flags = int(meta[4])
+    scores = QualityScores(
+        sharpness=meta[0],
+        brightness=meta[1],
+        glare=meta[2],
+        motion=meta[3],
+        sharp_ok=bool(flags & 1),
+        exposure_ok=bool(flags & 2),
+        glare_ok=bool(flags & 4),
+        stable_ok=bool(flags & 8),
+    )
+    return scores, meta[5]
+
+
+def _capture_main(source_spec, options, camera_mode, passthrough: bool,
+                  preview_name: str, capture_name: str, conn):
+    """Point d'entrée du processus de capture"""
+    # Pipeline et session construits dans le processus enfant uniquement
+    from modules.camera_module import CameraSessionManager
+    from modules.preview_session import PreviewSession
+    from modules.scan_pipeline import ScanPipeline
+
+    preview_ring = SharedFrameRing.attach(preview_name)
+    capture_ring = SharedFrameRing.attach(capture_name)
+    pipeline = ScanPipeline(options)
+    pipeline.reset()
+    send_lock = threading.Lock()
+    capture_lock = threading.Lock()
+
+    def send(message: bytes):
+        with send_lock:
+            try:
+                conn.send_bytes(message)
+            except (BrokenPipeError, OSError):
+                pass
+
+    def capture(auto: bool):
+        with capture_lock:
+            jpeg = pipeline.capture_jpeg()
+            seq = -1
+            if jpeg:
+                try:
+                    seq = capture_ring.write(jpeg)
+                except ValueError as e:
+                    logger.error(f"Capture non transmise: {e}")
+            send(MSG_CAPTURED + _CAPTURED.pack(seq, auto))
+
+    def publish(job):
+        # Seul le JPEG final de prévisualisation traverse la frontière du processus
+        jpeg = pipeline.frame_buffer.latest_jpeg()
+        if jpeg:
+            seq = preview_ring.write(jpeg, meta=scores_to_meta(job.scores, pipeline.auto_capture.progress))
+            send(MSG_FRAME + _SEQ.pack(seq))
+        return job
+
+    # Étages exécutés en ligne dans la boucle de capture : le processus entier leur est dédié
+    graph = pipeline.build_stage_graph(publish, threaded=False, name="capture-process", base64=False)
+    pipeline.on_auto_capture = lambda: threading.Thread(target=capture, args=(True,), daemon=True).start()
+
+    def process_frame(frame):
+        graph.submit(pipeline.acquire_job(frame))
+
+    def send_stats():
+        stats = pipeline.stats()
+        stats["pipeline"] = graph.stats()
+        stats["session"] = session.stats()
+        send(MSG_STATS + json.dumps(stats, default=str).encode("utf-8"))
+
+    session = PreviewSession(
+        source_spec, process_frame,
+        camera_sessions=CameraSessionManager(mode=camera_mode, passthrough=passthrough),
+        scheduler=pipeline.scheduler,
+        on_error=lambda e: send(MSG_ERROR + str(e).encode("utf-8")),
+        name="capture-process",
+    )
+    try:
+        graph.start()
+        session.start()
+        send(MSG_READY)
+        while True:
+            # Statistiques poussées environ une fois par seconde
+            if not conn.poll(1.0):
+                send_stats()
+                continue
+            message = conn.recv_bytes()
+            kind, payload = message[:1], message[1:]
+            if kind == CMD_STOP:
+                break
+            if kind == CMD_CAPTURE:
+                capture(False)
+            elif kind == CMD_SWITCH:
+                spec = payload.decode("utf-8")
+                session.request_switch(int(spec) if spec.isdigit() else spec)
+            elif kind == CMD_STATS:
+                send_stats()
+    except (EOFError, OSError):
+        # Processus de l'interface disparu : on s'arrête
+        pass
+    finally:
+        session.stop(timeout=2.0)
+        graph.stop()
+        preview_ring.close()
+        capture_ring.close()
+
+
+class CaptureProcess:
+    """
+    Capture, amélioration et encodage dans un processus enfant.
+
+    Le processus enfant exécute un ScanPipeline sur sa propre PreviewSession ;
+    seuls les JPEG finaux (prévisualisation et capture) reviennent, par deux
+    anneaux en mémoire partagée. Les commandes et notifications sont de
+    courts messages binaires sur un Pipe. Le processus de l'interface ne fait
+    plus de travail lié au GIL pendant que la caméra est ouverte.
+    """
+
+    def __init__(self, source_spec: Union[int, str], options, camera_mode=None, passthrough: bool = False,
+                 on_frame: Optional[Callable[[SharedFrame], None]] = None,
+                 on_capture: Optional[Callable[[Optional[bytes], bool], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None,
+                 preview_slot_size: int = 1 << 20, capture_slot_size: int = 8 << 20,
+                 name: str = "capture"):
+        self.source_spec = source_spec
+        self.options = options
+        self.camera_mode = camera_mode
+        self.passthrough = passthrough
+        self._on_frame = on_frame
+        self._on_capture = on_capture
+        self._on_error = on_error
+        self._preview_slot_size = preview_slot_size
+        self._capture_slot_size = capture_slot_size
+        self.name = name
+
+        self._process = None
+        self._conn = None
+        self._listener: Optional[threading.Thread] = None
+        self._preview_ring: Optional[SharedFrameRing] = None
+        self._capture_ring: Optional[SharedFrameRing] = None
+        self._send_lock = threading.Lock()
+        self._capture_cond = threading.Condition()
+        self._capture_result: Optional[Tuple[int, Optional[bytes]]] = None
+        self._ready = threading.Event()
+        self._last_delivered = -1
+        self._child_stats: dict = {}
+
+        # Compteurs
+        self.frames_received = 0
+        self.frames_skipped = 0
+        self.captures = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    # --- Cycle de vie ---
+
+    def start(self, ready_timeout: float = 10.0) -> bool:
+        """Démarre le processus de capture ; retourne False s'il n'est pas prêt dans le délai"""
+        if self._process is not None:
+            raise RuntimeError("Processus de capture déjà démarré")
+        # "spawn" : un fork du processus de l'interface dupliquerait ses threads et verrous
+        ctx = multiprocessing.get_context("spawn")
+        self._preview_ring = SharedFrameRing.create(slots=3, slot_size=self._preview_slot_size)
+        self._capture_ring = SharedFrameRing.create(slots=2, slot_size=self._capture_slot_size)
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_capture_main,
+            args=(self.source_spec, self.options, self.camera_mode, self.passthrough,
+                  self._preview_ring.name, self._capture_ring.name, child_conn),
+            name=f"{self.name}-process",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._listener = threading.Thread(target=self._listen, name=f"{self.name}-listener", daemon=True)
+        self._listener.start()
+        return self._ready.wait(ready_timeout)
+
+    def stop(self, timeout: float = 2.0) -> bool:
+        """Arrête le processus ; retourne False s'il a fallu le tuer"""
+        process, self._process = self._process, None
+        if process is None:
+            return True
+        self._send(CMD_STOP)
+        process.join(timeout)
+        clean = not process.is_alive()
+        if not clean:
+            logger.warning(f"Processus {self.name} toujours actif après {timeout}s : arrêt forcé")
+            process.terminate()
+            process.join(1.0)
+        # Le processus terminé ferme son extrémité du Pipe : l'écoute se termine sur EOF
+        if self._listener is not None and self._listener is not threading.current_thread():
+            self._listener.join(1.0)
+        if self._conn is not None:
+            self._conn.close()
+        with self._capture_cond:
+            self._capture_cond.notify_all()
+        for ring in (self._preview_ring, self._capture_ring):
+            if ring is not None:
+                ring.close()
+        self._preview_ring = self._capture_ring = None
+        return clean
+
+    # --- Commandes ---
+
+    def _send(self, message: bytes) -> bool:
+        with self._send_lock:
+            try:
+                self._conn.send_bytes(message)
+                return True
+            except (AttributeError, BrokenPipeError, OSError):
+                return False
+
+    def request_switch(self, spec: Union[int, str]):
+        """Change de source dans le processus de capture"""
+        self.source_spec = spec
+        self._send(CMD_SWITCH + str(spec).encode("utf-8"))
+
+    def capture(self, timeout: float = 3.0) -> Optional[bytes]:
+        """Demande la meilleure frame récente encodée pour l'envoi et l'attend"""
+        with self._capture_cond:
+            self._capture_result = None
+            if not self._send(CMD_CAPTURE):
+                return None
+            deadline = time.monotonic() + timeout
+            while self._capture_result is None and self.is_alive:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Capture sans réponse du processus {self.name} après {timeout}s")
+                    return None
+                self._capture_cond.wait(remaining)
+            return self._capture_result[1] if self._capture_result else None
+
+    def latest_preview(self) -> Optional[SharedFrame]:
+        """Dernière frame de prévisualisation encodée"""
+        ring = self._preview_ring
+        return ring.read() if ring is not None else None
+
+    # --- Réception ---
+
+    def _listen(self):
+        conn = self._conn
+        while True:
+            try:
+                message = conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            kind, payload = message[:1], message[1:]
+            try:
+                if kind == MSG_FRAME:
+                    self._handle_frame(_SEQ.unpack(payload)[0])
+                elif kind == MSG_CAPTURED:
+                    self._handle_capture(*_CAPTURED.unpack(payload))
+                elif kind == MSG_STATS:
+                    self._child_stats = json.loads(payload.decode("utf-8"))
+                elif kind == MSG_READY:
+                    self._ready.set()
+                elif kind == MSG_ERROR:
+                    self.errors += 1
+                    self.last_error = payload.decode("utf-8", "replace")
+                    logger.error(f"Erreur processus de capture: {self.last_error}")
+                    if self._on_error is not None:
+                        self._on_error(self.last_error)
+            except Exception as e:
+                logger.error(f"Erreur réception {kind!r} du processus de capture: {e}")
+        self._ready.set()
+
+    def _handle_frame(self, seq: int):
+        ring = self._preview_ring
+        if ring is None:
+            return
+        # Notifications en retard : on ne livre que la frame la plus récente
+        if ring.latest_seq > seq or seq <= self._last_delivered:
+            self.frames_skipped += 1
+            return
+        frame = ring.read(seq)
+        if frame is None:
+            self.frames_skipped += 1
+            return
+        self._last_delivered = seq
+        self.frames_received += 1
+        if self._on_frame is not None:
+            self._on_frame(frame)
+
+    def _handle_capture(self, seq: int, auto: int):
+        ring = self._capture_ring
+        frame = ring.read(seq) if ring is not None and seq >= 0 else None
+        jpeg = frame.data if frame is not None else None
+        if jpeg is not None:
+            self.captures += 1
+        if auto:
+            if self._on_capture is not None:
+                self._on_capture(jpeg, True)
+            return
+        with self._capture_cond:
+            self._capture_result = (seq, jpeg)
+            self._capture_cond.notify_all()
+
+    def stats(self) -> dict:
+        """Compteurs côté interface et dernières statistiques remontées par le processus"""
+        stats = {
+            "name": self.name,
+            "alive": self.is_alive,
+            "pid": self._process.pid if self._process is not None else None,
+            "frames_received": self.frames_received,
+            "frames_skipped": self.frames_skipped,
+            "captures": self.captures,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+        if self._preview_ring is not None:
+            stats["torn_reads"] = self._preview_ring.torn_reads
+        stats["child"] = self._child_stats
+        return stats
@@ -0,0 +1,368 @@
+import time
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from modules.worker_pool import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Rapport largeur / hauteur : carte ID-1 (1.586), page de passeport (~1.42)
+DOCUMENT_ASPECT_RANGE = (1.2, 1.9)
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """Ordonne 4 points en haut-gauche, haut-droit, bas-droit, bas-gauche"""
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)],
+    ], dtype=np.float32)
+
+
+def quad_size(quad: np.ndarray) -> Tuple[int, int]:
+    """Largeur et hauteur du rectangle redressé correspondant au quadrilatère ordonné"""
+    tl, tr, br, bl = quad
+    width = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+    height = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+    return int(round(width)), int(round(height))
+
+
+class DocumentScanner:
+    """
+    Détection en temps réel du contour d'une carte ou d'un passeport.
+
+    La détection (contours de Canny, approximation polygonale) travaille sur
+    un niveau réduit de la frame (`detect_width` pixels de large) ; le
+    quadrilatère est conservé en coordonnées normalisées (0..1) pour pouvoir
+    redresser ensuite la frame pleine résolution. Une instance par thread.
+    """
+
+    def __init__(self, detect_width: int = 320, min_area_ratio: float = 0.12,
+                 aspect_range: Tuple[float, float] = DOCUMENT_ASPECT_RANGE, max_missed: int = 5):
+        self.detect_width = detect_width
+        self.min_area_ratio = min_area_ratio
+        self.aspect_range = aspect_range
+        self.max_missed = max_missed
+        self._gray: Optional[np.ndarray] = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._missed = 0
+
+        # Dernier quadrilatère en coordonnées normalisées (x / largeur, y / hauteur)
+        self.quad: Optional[np.ndarray] = None
+
+        # Statistiques
+        self.detections = 0
+        self.found = 0
+        self.last_detect_ms = 0.0
+        self.avg_detect_ms = 0.0
+
+    def reset(self):
+        """Oublie le dernier document détecté"""
+        self.quad = None
+        self._missed = 0
+
+    def __getstate__(self):
+        # Envoyé à un worker (pool de processus) : le tampon de travail reste ici
+        state = self.__dict__.copy()
+        state["_gray"] = None
+        return state
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """Copie réduite en niveaux de gris (tampons réutilisés)"""
+        src = frame
+        while src.shape[1] // 2 >= self.detect_width:
+            src = cv2.pyrDown(src)
+        # Proche de la largeur visée : on détecte à cette résolution plutôt que de rééchantillonner
+        if src.shape[1] > self.detect_width * 1.25:
+            size = (self.detect_width, max(1, int(src.shape[0] * self.detect_width / src.shape[1])))
+            src = cv2.resize(src, size, interpolation=cv2.INTER_LINEAR)
+        if src.ndim == 2:
+            return src
+        if self._gray is None or self._gray.shape != src.shape[:2]:
+            self._gray = np.empty(src.shape[:2], dtype=np.uint8)
+        cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def detect(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Cherche le document dans la frame ; retourne le quadrilatère normalisé
+        (4x2, ordonné) ou le dernier connu si la détection échoue brièvement.
+        """
+        start = time.perf_counter()
+        quad = self._detect_quad(self._prepare(frame))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.detections += 1
+        self.last_detect_ms = elapsed
+        self.avg_detect_ms += (elapsed - self.avg_detect_ms) / min(self.detections, 30)
+        if quad is not None:
+            self.found += 1
+        return self._update_quad(quad)
+
+    def _update_quad(self, quad: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Retient le nouveau quadrilatère, ou garde l'ancien pendant quelques échecs"""
+        if quad is not None:
+            self._missed = 0
+            self.quad = quad
+        else:
+            self._missed += 1
+            if self._missed > self.max_missed:
+                self.quad = None
+        return self.quad
+
+    def _is_plausible(self, quad: np.ndarray, width: int, height: int) -> bool:
+        """Vérifie qu'un quadrilatère ordonné (en pixels) ressemble à un document"""
+        if not cv2.isContourConvex(quad.reshape(-1, 1, 2)):
+            return False
+        if cv2.contourArea(quad) < self.min_area_ratio * width * height:
+            return False
+        quad_w, quad_h = quad_size(quad)
+        if min(quad_w, quad_h) == 0:
+            return False
+        aspect = max(quad_w, quad_h) / min(quad_w, quad_h)
+        return self.aspect_range[0] <= aspect <= self.aspect_range[1]
+
+    def _detect_quad(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        height, width = gray.shape[:2]
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        # Seuils de Canny adaptés à la luminosité médiane de la scène
+        median = float(np.median(blurred))
+        edges = cv2.Canny(blurred, int(max(0, 0.66 * median)), int(min(255, 1.33 * median)))
+        edges = cv2.dilate(edges, self._kernel)
+
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = self.min_area_ratio * width * height
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+            if cv2.contourArea(contour) < min_area:
+                break
+            perimeter = cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, 0.02 * perimeter, True)
+            if len(approx) != 4:
+                continue
+            quad = order_corners(approx)
+            if not self._is_plausible(quad, width, height):
+                continue
+            return quad / np.array([width, height], dtype=np.float32)
+        return None
+
+    @staticmethod
+    def to_pixels(quad: np.ndarray, frame: np.ndarray) -> np.ndarray:
+        """Convertit un quadrilatère normalisé en pixels pour la frame donnée"""
+        height, width = frame.shape[:2]
+        return quad * np.array([width, height], dtype=np.float32)
+
+    def draw_overlay(self, frame: np.ndarray, quad: Optional[np.ndarray] = None,
+                     color=(0, 200, 0), thickness: int = 2) -> np.ndarray:
+        """Dessine le contour détecté sur la frame (en place)"""
+        quad = self.quad if quad is None else quad
+        if quad is not None:
+            points = self.to_pixels(quad, frame).astype(np.int32).reshape(-1, 1, 2)
+            cv2.polylines(frame, [points], True, color, thickness, cv2.LINE_AA)
+        return frame
+
+    def warp(self, frame: np.ndarray, quad: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Redresse le document de la frame (pleine résolution) ; None si aucun document"""
+        quad = self.quad if quad is None else quad
+        if quad is None:
+            return None
+        corners = self.to_pixels(quad, frame)
+        width, height = quad_size(corners)
+        if width < 2 or height < 2:
+            return None
+        target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(frame, matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+    def stats(self) -> dict:
+        """Statistiques de détection"""
+        return {
+            "detections": self.detections,
+            "found": self.found,
+            "last_detect_ms": self.last_detect_ms,
+            "avg_detect_ms": self.avg_detect_ms,
+            "has_document": self.quad is not None,
+        }
+
+
+class DocumentTracker:
+    """
+    Suivi image à image des 4 coins du document par flux optique (Lucas-Kanade).
+
+    La détection complète de DocumentScanner ne tourne qu'à l'initialisation,
+    quand la confiance du suivi chute (coin perdu, erreur aller-retour trop
+    forte, forme invraisemblable) ou tous les `redetect_every` frames.
+
+    Avec un `pool` (WorkerPool), la détection périodique ne bloque plus la
+    frame : elle part en tâche de fond sur une copie de l'image et le suivi
+    continue ; si son résultat contredit le suivi (document absent ou coins
+    à plus de `verify_tolerance` de la position suivie), le suivi est
+    abandonné et la frame suivante refait une détection complète.
+    Expose la même interface que DocumentScanner (detect, quad, draw_overlay,
+    warp, reset, stats). Une instance par thread.
+    """
+
+    def __init__(self, scanner: Optional[DocumentScanner] = None, redetect_every: int = 15,
+                 max_fb_error: float = 1.5, win_size: Tuple[int, int] = (15, 15), pyramid_levels: int = 2,
+                 pool=None, pool_group=None, verify_tolerance: float = 0.05):
+        self.scanner = scanner or DocumentScanner()
+        self.redetect_every = redetect_every
+        self.max_fb_error = max_fb_error
+        self.pool = pool
+        self.pool_group = pool_group
+        self.verify_tolerance = verify_tolerance
+        self._verify = None
+        self._lk_params = dict(
+            winSize=win_size,
+            maxLevel=pyramid_levels,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+        )
+        self._previous: Optional[np.ndarray] = None
+        self._points: Optional[np.ndarray] = None
+        self._since_detect = 0
+
+        # Statistiques
+        self.frames = 0
+        self.detect_frames = 0
+        self.track_frames = 0
+        self.track_failures = 0
+        self.verifications = 0
+        self.verify_rejections = 0
+        self.avg_frame_ms = 0.0
+        self.avg_detect_ms = 0.0
+        self.avg_track_ms = 0.0
+
+    @property
+    def quad(self) -> Optional[np.ndarray]:
+        return self.scanner.quad
+
+    def reset(self):
+        self.scanner.reset()
+        self._previous = None
+        self._points = None
+        self._since_detect = 0
+        if self._verify is not None:
+            self._verify.cancel()
+            self._verify = None
+
+    def detect(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Met à jour le quadrilatère normalisé : suivi si possible, détection sinon"""
+        start = time.perf_counter()
+        gray = self.scanner._prepare(frame)
+        height, width = gray.shape[:2]
+
+        self._check_verification()
+        can_track = self._points is not None and self._previous is not None and self._previous.shape == gray.shape
+        if can_track and self.pool is not None and self._since_detect >= self.redetect_every:
+            self._submit_verification(gray)
+
+        tracked = None
+        if can_track and self._since_detect < self.redetect_every:
+            tracked = self._track(gray, width, height)
+            if tracked is None:
+                self.track_failures += 1
+
+        if tracked is not None:
+            self._points = tracked
+            self._since_detect += 1
+            self.track_frames += 1
+            quad = self.scanner._update_quad(tracked / np.array([width, height], dtype=np.float32))
+            self.avg_track_ms += ((time.perf_counter() - start) * 1000 - self.avg_track_ms) / min(self.track_frames, 30)
+        else:
+            found = self.scanner._detect_quad(gray)
+            self.detect_frames += 1
+            self.scanner.detections += 1
+            if found is not None:
+                self.scanner.found += 1
+                self._points = found * np.array([width, height], dtype=np.float32)
+            else:
+                self._points = None
+            self._since_detect = 0
+            quad = self.scanner._update_quad(found)
+            self.avg_detect_ms += ((time.perf_counter() - start) * 1000 - self.avg_detect_ms) / min(self.detect_frames, 30)
+
+        # Image précédente conservée pour le flux optique (le tampon du scanner est réutilisé)
+        if self._previous is None or self._previous.shape != gray.shape:
+            self._previous = gray.copy()
+        else:
+            np.copyto(self._previous, gray)
+
+        self.frames += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        self.avg_frame_ms += (elapsed - self.avg_frame_ms) / min(self.frames, 30)
+        self.scanner.last_detect_ms = elapsed
+        return quad
+
+    def _submit_verification(self, gray: np.ndarray):
+        """Détection complète en tâche de fond ; le suivi continue en attendant"""
+        if self._verify is None:
+            self._verify = self.pool.submit(
+                self.scanner._detect_quad, gray.copy(),
+                priority=PRIORITY_BACKGROUND, group=self.pool_group)
+        self._since_detect = 0
+
+    def _check_verification(self):
+        """Confronte le résultat d'une détection de fond terminée au suivi courant"""
+        future = self._verify
+        if future is None or not future.done():
+            return
+        self._verify = None
+        if future.cancelled() or future.exception() is not None:
+            return
+        found = future.result()
+        self.verifications += 1
+        current = self.scanner.quad
+        if current is None or self._points is None:
+            return
+        if found is None or np.abs(found - current).max() > self.verify_tolerance:
+            self.verify_rejections += 1
+            self._points = None
+
+    def _track(self, gray: np.ndarray, width: int, height: int) -> Optional[np.ndarray]:
+        """Suit les coins ; None si la confiance est insuffisante"""
+        p0 = self._points.reshape(-1, 1, 2).astype(np.float32)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self._previous, gray, p0, None, **self._lk_params)
+        if p1 is None or not status.all():
+            return None
+        # Contrôle aller-retour : un coin mal suivi ne revient pas à sa position d'origine
+        p0_back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._previous, p1, None, **self._lk_params)
+        if p0_back is None or not status_back.all():
+            return None
+        fb_error = np.linalg.norm((p0 - p0_back).reshape(-1, 2), axis=1)
+        if fb_error.max() > self.max_fb_error:
+            return None
+        quad = p1.reshape(4, 2)
+        if not self.scanner._is_plausible(quad, width, height):
+            return None
+        return quad
+
+    def draw_overlay(self, frame: np.ndarray, quad: Optional[np.ndarray] = None, **kwargs) -> np.ndarray:
+        return self.scanner.draw_overlay(frame, quad, **kwargs)
+
+    def warp(self, frame: np.ndarray, quad: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        return self.scanner.warp(frame, quad)
+
+    def stats(self) -> dict:
+        """Statistiques de suivi : ratio détection / suivi et coût par frame"""
+        stats = self.scanner.stats()
+        stats.update({
+            "frames": self.frames,
+            "detect_frames": self.detect_frames,
+            "track_frames": self.track_frames,
+            "track_failures": self.track_failures,
+            "verifications": self.verifications,
+            "verify_rejections": self.verify_rejections,
+            "detect_ratio": self.detect_frames / self.frames if self.frames else 0.0,
+            "avg_frame_ms": self.avg_frame_ms,
+            "avg_detect_ms": self.avg_detect_ms,
+            "avg_track_ms": self.avg_track_ms,
+            "redetect_every": self.redetect_every,
+        })
+        return stats
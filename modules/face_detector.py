@@ -0,0 +1,176 @@
+import time
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cascade de Haar livrée avec opencv-python (visage de face)
+DEFAULT_CASCADE = "haarcascade_frontalface_default.xml"
+
+
+def _cascade_path(name: str) -> str:
+    """Chemin d'une cascade livrée avec OpenCV (ou chemin explicite)"""
+    data = getattr(cv2, "data", None)
+    if data is not None and "/" not in name and "\\" not in name:
+        return data.haarcascades + name
+    return name
+
+
+class FaceDetector:
+    """
+    Détection légère du visage pour le mode selfie.
+
+    La cascade de Haar tourne sur une copie réduite en niveaux de gris
+    (`detect_width` pixels de large) et seulement une frame sur
+    `detect_every` ; entre deux détections, la dernière boîte est réutilisée.
+    La boîte est conservée en coordonnées normalisées (x, y, w, h dans 0..1)
+    pour recadrer ensuite la frame pleine résolution. Une instance par thread.
+    """
+
+    def __init__(self, detect_width: int = 240, detect_every: int = 5, min_face_ratio: float = 0.2,
+                 max_missed: int = 3, padding: float = 0.35, cascade: str = DEFAULT_CASCADE):
+        self.detect_width = detect_width
+        self.detect_every = detect_every
+        self.min_face_ratio = min_face_ratio
+        self.max_missed = max_missed
+        self.padding = padding
+        self._classifier = cv2.CascadeClassifier(_cascade_path(cascade))
+        if self._classifier.empty():
+            logger.warning(f"Cascade de visage introuvable : {cascade}")
+        self._gray: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+        self._since_detect = 0
+        self._missed = 0
+
+        # Dernière boîte en coordonnées normalisées (x, y, largeur, hauteur)
+        self.box: Optional[np.ndarray] = None
+
+        # Statistiques
+        self.frames = 0
+        self.detections = 0
+        self.found = 0
+        self.last_detect_ms = 0.0
+        self.avg_detect_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        return not self._classifier.empty()
+
+    def reset(self):
+        """Oublie le dernier visage détecté"""
+        self.box = None
+        self._since_detect = 0
+        self._missed = 0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """Copie réduite en niveaux de gris, égalisée (tampons réutilisés)"""
+        height, width = frame.shape[:2]
+        if width > self.detect_width * 1.25:
+            size = (self.detect_width, max(1, int(height * self.detect_width / width)))
+            shape = (size[1], size[0]) + frame.shape[2:]
+            if self._small is None or self._small.shape != shape:
+                self._small = np.empty(shape, dtype=frame.dtype)
+            cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+            frame = self._small
+        if self._gray is None or self._gray.shape != frame.shape[:2]:
+            self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+        if frame.ndim == 2:
+            np.copyto(self._gray, frame)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.equalizeHist(self._gray, dst=self._gray)
+        return self._gray
+
+    def detect(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Met à jour la boîte normalisée du visage ; la cascade ne tourne qu'une
+        frame sur `detect_every`, la dernière boîte est reprise entre-temps.
+        """
+        self.frames += 1
+        if self.box is not None and self._since_detect < self.detect_every - 1:
+            self._since_detect += 1
+            return self.box
+        self._since_detect = 0
+        if not self.available:
+            return None
+
+        start = time.perf_counter()
+        box = self._detect_box(self._prepare(frame))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.detections += 1
+        self.last_detect_ms = elapsed
+        self.avg_detect_ms += (elapsed - self.avg_detect_ms) / min(self.detections, 30)
+        if box is not None:
+            self.found += 1
+            self._missed = 0
+            self.box = box
+        else:
+            self._missed += 1
+            if self._missed > self.max_missed:
+                self.box = None
+        return self.box
+
+    def _detect_box(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        height, width = gray.shape[:2]
+        min_side = max(1, int(self.min_face_ratio * min(width, height)))
+        faces = self._classifier.detectMultiScale(
+            gray, scaleFactor=1.15, minNeighbors=5, minSize=(min_side, min_side))
+        if len(faces) == 0:
+            return None
+        # Le plus grand visage est celui de l'utilisateur
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return np.array([x / width, y / height, w / width, h / height], dtype=np.float32)
+
+    def to_pixels(self, frame: np.ndarray, box: Optional[np.ndarray] = None,
+                  padding: float = 0.0) -> Optional[Tuple[int, int, int, int]]:
+        """Boîte (x0, y0, x1, y1) en pixels pour la frame donnée, élargie de `padding`"""
+        box = self.box if box is None else box
+        if box is None:
+            return None
+        height, width = frame.shape[:2]
+        x, y, w, h = box
+        x0, y0 = (x - w * padding) * width, (y - h * padding) * height
+        x1, y1 = (x + w * (1 + padding)) * width, (y + h * (1 + padding)) * height
+        x0, y0 = max(0, int(x0)), max(0, int(y0))
+        x1, y1 = min(width, int(round(x1))), min(height, int(round(y1)))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def draw_overlay(self, frame: np.ndarray, box: Optional[np.ndarray] = None,
+                     color=(0, 200, 0), thickness: int = 2) -> np.ndarray:
+        """Dessine le cadrage : ellipse verte sur le visage, guide gris sinon (en place)"""
+        rect = self.to_pixels(frame, box)
+        if rect is None:
+            height, width = frame.shape[:2]
+            center, axes, color = (width // 2, height * 9 // 20), (width * 3 // 10, height * 3 // 10), (160, 160, 160)
+        else:
+            x0, y0, x1, y1 = rect
+            center, axes = ((x0 + x1) // 2, (y0 + y1) // 2), ((x1 - x0) // 2, (y1 - y0) * 3 // 5)
+        cv2.ellipse(frame, center, axes, 0, 0, 360, color, thickness, cv2.LINE_AA)
+        return frame
+
+    def crop(self, frame: np.ndarray, box: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Recadre le visage élargi de `padding` (frame pleine résolution) ; None si aucun visage"""
+        rect = self.to_pixels(frame, box, padding=self.padding)
+        if rect is None:
+            return None
+        x0, y0, x1, y1 = rect
+        return frame[y0:y1, x0:x1]
+
+    def stats(self) -> dict:
+        """Statistiques de détection"""
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "found": self.found,
+            "detect_ratio": self.detections / self.frames if self.frames else 0.0,
+            "last_detect_ms": self.last_detect_ms,
+            "avg_detect_ms": self.avg_detect_ms,
+            "has_face": self.box is not None,
+            "available": self.available,
+        }
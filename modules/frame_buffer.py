@@ -0,0 +1,211 @@
+import threading
+import base64
+import time
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSlot:
+    """Emplacement préalloué d'une frame brute et de ses encodages paresseux"""
+
+    __slots__ = ("frame", "seq", "timestamp", "jpeg", "base64", "readers", "has_frame", "score", "meta")
+
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+        self.seq = -1
+        self.timestamp = 0.0
+        self.jpeg: Optional[bytes] = None
+        self.base64: Optional[str] = None
+        self.readers = 0
+        self.has_frame = False
+        self.score: Optional[float] = None
+        # Arguments nommés propres à la frame, transmis à l'encodeur (ex. quadrilatère détecté)
+        self.meta: Optional[dict] = None
+
+
+class FrameRingBuffer:
+    """
+    Tampon circulaire de frames à taille fixe.
+
+    Le producteur (thread de capture) copie chaque frame dans un emplacement
+    réutilisé ; l'encodage JPEG puis base64 n'est fait qu'à la demande, une
+    seule fois par frame, lorsque l'UI ou la capture en a besoin. Les
+    métadonnées écrites avec une frame (`meta`) sont passées à l'encodeur en
+    arguments nommés : l'encodage d'une frame ancienne utilise les siennes.
+    """
+
+    def __init__(self, capacity: int = 3, encoder: Optional[Callable[[np.ndarray], bytes]] = None):
+        if capacity < 2:
+            raise ValueError("La capacité doit être d'au moins 2 emplacements")
+        self.capacity = capacity
+        self._encoder = encoder
+        self._slots = [FrameSlot() for _ in range(capacity)]
+        self._lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+        self._next_seq = 0
+        self._latest: Optional[FrameSlot] = None
+
+        # Compteurs
+        self.frames_written = 0
+        self.encodes = 0
+
+    def set_encoder(self, encoder: Callable[[np.ndarray], bytes]):
+        """Change la fonction d'encodage JPEG"""
+        with self._lock:
+            self._encoder = encoder
+            for slot in self._slots:
+                if slot.has_frame:
+                    slot.jpeg = None
+                    slot.base64 = None
+
+    def _acquire_slot(self) -> FrameSlot:
+        """Choisit l'emplacement libre le plus ancien (hors lecture en cours)"""
+        candidates = [s for s in self._slots if s.readers == 0 and s is not self._latest]
+        if not candidates:
+            # Tous les emplacements sont en lecture : on écrase le plus ancien non lu
+            candidates = [s for s in self._slots if s.readers == 0] or self._slots
+        return min(candidates, key=lambda s: s.seq)
+
+    def _publish(self, slot: FrameSlot, timestamp: Optional[float]) -> int:
+        slot.seq = self._next_seq
+        slot.timestamp = timestamp if timestamp is not None else time.monotonic()
+        self._next_seq += 1
+        self._latest = slot
+        self.frames_written += 1
+        return slot.seq
+
+    def write(self, frame: np.ndarray, timestamp: Optional[float] = None, score: Optional[float] = None,
+              meta: Optional[dict] = None) -> int:
+        """Copie une frame brute (score de netteté et métadonnées éventuels) dans le prochain emplacement libre"""
+        with self._lock:
+            slot = self._acquire_slot()
+            if (slot.frame is None or slot.frame.shape != frame.shape
+                    or slot.frame.dtype != frame.dtype):
+                slot.frame = np.empty_like(frame)
+            np.copyto(slot.frame, frame)
+            slot.has_frame = True
+            slot.score = score
+            slot.meta = meta
+            slot.jpeg = None
+            slot.base64 = None
+            return self._publish(slot, timestamp)
+
+    def write_jpeg(self, jpeg_data: bytes, timestamp: Optional[float] = None) -> int:
+        """Publie une frame déjà encodée en JPEG (caméra native)"""
+        with self._lock:
+            slot = self._acquire_slot()
+            slot.has_frame = False
+            slot.score = None
+            slot.meta = None
+            slot.jpeg = jpeg_data
+            slot.base64 = None
+            return self._publish(slot, timestamp)
+
+    @property
+    def latest_seq(self) -> int:
+        """Numéro de séquence de la dernière frame publiée (-1 si vide)"""
+        latest = self._latest
+        return latest.seq if latest is not None else -1
+
+    def _pin_latest(self) -> Optional[FrameSlot]:
+        with self._lock:
+            slot = self._latest
+            if slot is not None:
+                slot.readers += 1
+            return slot
+
+    def _unpin(self, slot: FrameSlot):
+        with self._lock:
+            slot.readers -= 1
+
+    def latest_frame(self) -> Optional[np.ndarray]:
+        """Retourne une copie de la dernière frame brute"""
+        slot = self._pin_latest()
+        if slot is None:
+            return None
+        try:
+            return slot.frame.copy() if slot.has_frame else None
+        finally:
+            self._unpin(slot)
+
+    def latest_jpeg(self) -> Optional[bytes]:
+        """Retourne la dernière frame encodée en JPEG (encodage à la demande)"""
+        slot = self._pin_latest()
+        if slot is None:
+            return None
+        try:
+            return self._ensure_jpeg(slot)
+        finally:
+            self._unpin(slot)
+
+    def latest_base64(self) -> Optional[str]:
+        """Retourne la dernière frame encodée en base64 (encodage à la demande)"""
+        slot = self._pin_latest()
+        if slot is None:
+            return None
+        try:
+            if slot.base64 is None:
+                jpeg_data = self._ensure_jpeg(slot)
+                if jpeg_data is None:
+                    return None
+                slot.base64 = base64.b64encode(jpeg_data).decode('utf-8')
+            return slot.base64
+        finally:
+            self._unpin(slot)
+
+    def best_jpeg(self, window: float = 1.0) -> Optional[bytes]:
+        """
+        Encode la frame la plus nette parmi celles des `window` dernières secondes.
+
+        Seule la frame retenue est encodée. Sans score, la plus récente est utilisée.
+        """
+        with self._lock:
+            latest = self._latest
+            if latest is None:
+                return None
+            oldest = latest.timestamp - window
+            candidates = [
+                s for s in self._slots
+                if s.seq >= 0 and s.timestamp >= oldest and (s.has_frame or s.jpeg is not None)
+            ]
+            best = max(
+                candidates,
+                key=lambda s: (s.score if s.score is not None else float("-inf"), s.seq),
+                default=latest,
+            )
+            best.readers += 1
+        try:
+            if best is not latest and best.score is not None:
+                logger.info(
+                    f"Capture: frame {best.seq} retenue parmi {len(candidates)} "
+                    f"(netteté {best.score:.0f} contre {latest.score or 0:.0f} pour la dernière, "
+                    f"âge {(latest.timestamp - best.timestamp) * 1000:.0f} ms)"
+                )
+            return self._ensure_jpeg(best)
+        finally:
+            self._unpin(best)
+
+    def _ensure_jpeg(self, slot: FrameSlot) -> Optional[bytes]:
+        # L'emplacement est épinglé : le producteur ne peut pas l'écraser
+        with self._encode_lock:
+            if slot.jpeg is None and slot.has_frame and self._encoder is not None:
+                slot.jpeg = self._encoder(slot.frame, **slot.meta) if slot.meta else self._encoder(slot.frame)
+                self.encodes += 1
+            return slot.jpeg
+
+    def clear(self):
+        """Vide le tampon sans libérer les emplacements préalloués"""
+        with self._lock:
+            self._latest = None
+            for slot in self._slots:
+                slot.seq = -1
+                slot.jpeg = None
+                slot.base64 = None
+                slot.has_frame = False
+                slot.score = None
+                slot.meta = None
+
@@ -0,0 +1,113 @@
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def build_contrast_lut(alpha: float, beta: float, gamma: float = 1.0) -> np.ndarray:
+    """Table de correspondance 256 entrées : gamma puis cv2.convertScaleAbs(alpha, beta)"""
+    values = np.arange(256, dtype=np.float32)
+    if gamma != 1.0:
+        values = 255.0 * (values / 255.0) ** (1.0 / gamma)
+    values = np.abs(values * alpha + beta)
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+class FrameEnhancer:
+    """
+    Amélioration d'image (contraste/luminosité + débruitage) sans allocation.
+
+    La courbe luminosité/contraste est précalculée dans une LUT de 256 entrées
+    et les résultats sont écrits dans des tampons réutilisés d'une frame à
+    l'autre. Le tableau retourné appartient au moteur : il reste valide
+    jusqu'au prochain appel, l'appelant doit le copier pour le conserver.
+
+    Pour une courbe purement linéaire (gamma = 1), `method="auto"` applique la
+    courbe avec cv2.convertScaleAbs (vectorisé, plus rapide que cv2.LUT sur
+    3 canaux) ; la LUT sert dès que la courbe n'est plus linéaire.
+
+    Une instance ne doit être utilisée que par un seul thread à la fois.
+    """
+
+    def __init__(self, alpha: float = 1.2, beta: float = 10, gamma: float = 1.0,
+                 denoise_ksize: int = 3, method: str = "auto"):
+        if method not in ("auto", "lut", "scale"):
+            raise ValueError(f"Méthode inconnue: {method}")
+        self.denoise_ksize = denoise_ksize
+        self.method = method
+        self._buffers = {}
+        self.set_curve(alpha, beta, gamma)
+
+    def set_curve(self, alpha: float, beta: float, gamma: float = 1.0):
+        """Recalcule la LUT pour une nouvelle courbe"""
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self._lut = build_contrast_lut(alpha, beta, gamma)
+        self._use_lut = self.method == "lut" or (self.method == "auto" and gamma != 1.0)
+        if self.method == "scale" and gamma != 1.0:
+            logger.warning("Courbe non linéaire : utilisation de la LUT malgré method='scale'")
+            self._use_lut = True
+
+    def _buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+    def downscale(self, src: np.ndarray, size: Optional[Tuple[int, int]]) -> np.ndarray:
+        """
+        Réduit par divisions successives par 2 (INTER_AREA rapide) puis interpolation finale.
+
+        Retourne `src` tel quel si `size` est None ou identique ; sinon un tampon du moteur.
+        """
+        if size is None or (size[0], size[1]) == (src.shape[1], src.shape[0]):
+            return src
+        level = 0
+        while src.shape[1] // 2 >= size[0] and src.shape[0] // 2 >= size[1]:
+            half = (src.shape[1] // 2, src.shape[0] // 2)
+            dst = self._buffer(f"half{level}", (half[1], half[0]) + src.shape[2:])
+            cv2.resize(src, half, dst=dst, interpolation=cv2.INTER_AREA)
+            src = dst
+            level += 1
+        if (src.shape[1], src.shape[0]) == (size[0], size[1]):
+            return src
+        dst = self._buffer("resized", (size[1], size[0]) + src.shape[2:])
+        interpolation = cv2.INTER_LINEAR if src.shape[1] < 2 * size[0] else cv2.INTER_AREA
+        cv2.resize(src, size, dst=dst, interpolation=interpolation)
+        return dst
+
+    def enhance(self, frame: np.ndarray, size: Optional[Tuple[int, int]] = None,
+                scale: Optional[float] = None,
+                roi: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """
+        Améliore une frame BGR.
+
+        - `size` (largeur, hauteur) ou `scale` : travaille sur une copie réduite.
+        - `roi` (x, y, largeur, hauteur) : ne traite que cette région de la frame source.
+        """
+        src = frame
+        if roi is not None:
+            x, y, w, h = roi
+            src = src[y:y + h, x:x + w]
+
+        if size is None and scale is not None and scale != 1.0:
+            height, width = src.shape[:2]
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        src = self.downscale(src, size)
+
+        contrast = self._buffer("contrast", src.shape)
+        if self._use_lut:
+            cv2.LUT(src, self._lut, dst=contrast)
+        else:
+            cv2.convertScaleAbs(src, contrast, alpha=self.alpha, beta=self.beta)
+        if not self.denoise_ksize:
+            return contrast
+
+        out = self._buffer("out", src.shape)
+        cv2.medianBlur(contrast, self.denoise_ksize, dst=out)
+        return out
@@ -0,0 +1,169 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SharpnessMeter:
+    """
+    Score de netteté (variance du Laplacien) sur une copie réduite en niveaux de gris.
+
+    La frame est d'abord ramenée à environ `width` pixels de large (telle
+    quelle si elle en est proche) : le score reste comparable d'une frame à
+    l'autre et coûte moins d'une milliseconde.
+    Les tampons sont réutilisés ; une instance par thread.
+    """
+
+    def __init__(self, width: int = 320):
+        self.width = width
+        self._gray: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+
+    def gray(self, frame: np.ndarray) -> np.ndarray:
+        """Retourne la copie réduite en niveaux de gris (tampon réutilisé)"""
+        height, width = frame.shape[:2]
+        # Proche de la largeur visée (copie de prévisualisation) : pas de rééchantillonnage
+        if width > self.width * 1.25:
+            size = (self.width, max(1, int(height * self.width / width)))
+            shape = (size[1], size[0]) + frame.shape[2:]
+            if self._small is None or self._small.shape != shape:
+                self._small = np.empty(shape, dtype=frame.dtype)
+            cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+            frame = self._small
+        if frame.ndim == 2:
+            return frame
+        if self._gray is None or self._gray.shape != frame.shape[:2]:
+            self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def score(self, frame: np.ndarray) -> float:
+        """Variance du Laplacien : plus elle est élevée, plus l'image est nette"""
+        return self.score_gray(self.gray(frame))
+
+    @staticmethod
+    def score_gray(gray: np.ndarray) -> float:
+        """Variance du Laplacien d'une image déjà en niveaux de gris"""
+        laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+        _, stddev = cv2.meanStdDev(laplacian)
+        return float(stddev[0, 0] ** 2)
+
+
+@dataclass
+class QualityThresholds:
+    """Seuils d'acceptation d'une frame"""
+    min_sharpness: float = 80.0
+    min_brightness: float = 60.0
+    max_brightness: float = 200.0
+    max_glare: float = 0.02          # Fraction de pixels saturés
+    max_motion: float = 4.0          # Différence moyenne entre frames consécutives (niveaux de gris)
+
+
+@dataclass
+class QualityScores:
+    """Scores d'une frame et verdict par critère"""
+    sharpness: float
+    brightness: float
+    glare: float
+    motion: float
+    sharp_ok: bool
+    exposure_ok: bool
+    glare_ok: bool
+    stable_ok: bool
+
+    @property
+    def acceptable(self) -> bool:
+        return self.sharp_ok and self.exposure_ok and self.glare_ok and self.stable_ok
+
+
+class QualityScorer:
+    """
+    Évalue netteté, exposition, reflets et stabilité sur une petite copie en
+    niveaux de gris, pour rester négligeable à 30 FPS. Une instance par thread.
+    """
+
+    GLARE_LEVEL = 245
+
+    def __init__(self, thresholds: Optional[QualityThresholds] = None, width: int = 320):
+        self.thresholds = thresholds or QualityThresholds()
+        self._meter = SharpnessMeter(width)
+        self._previous: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+
+    def reset(self):
+        """Oublie la frame précédente (nouvelle session)"""
+        self._previous = None
+
+    def score(self, frame: np.ndarray) -> QualityScores:
+        gray = self._meter.gray(frame)
+        t = self.thresholds
+
+        sharpness = self._meter.score_gray(gray)
+        brightness = float(cv2.mean(gray)[0])
+        glare = cv2.countNonZero(cv2.compare(gray, self.GLARE_LEVEL, cv2.CMP_GE)) / gray.size
+
+        if self._previous is None or self._previous.shape != gray.shape:
+            motion = float("inf")
+            self._previous = gray.copy()
+            self._diff = np.empty_like(gray)
+        else:
+            cv2.absdiff(gray, self._previous, dst=self._diff)
+            motion = float(cv2.mean(self._diff)[0])
+            np.copyto(self._previous, gray)
+
+        return QualityScores(
+            sharpness=sharpness,
+            brightness=brightness,
+            glare=glare,
+            motion=motion,
+            sharp_ok=sharpness >= t.min_sharpness,
+            exposure_ok=t.min_brightness <= brightness <= t.max_brightness,
+            glare_ok=glare <= t.max_glare,
+            stable_ok=motion <= t.max_motion,
+        )
+
+
+class AutoCaptureTrigger:
+    """
+    Déclenche une capture quand les scores restent acceptables pendant
+    `hold_seconds` sans interruption. Ne se déclenche qu'une fois par armement.
+    """
+
+    def __init__(self, hold_seconds: float = 0.8):
+        self.hold_seconds = hold_seconds
+        self._since: Optional[float] = None
+        self._armed = True
+        self.progress = 0.0
+
+    def reset(self):
+        """Réarme le déclencheur"""
+        self._since = None
+        self._armed = True
+        self.progress = 0.0
+
+    def interrupt(self):
+        """Interrompt le maintien en cours sans réarmer (condition externe non remplie)"""
+        self._since = None
+        self.progress = 0.0
+
+    def update(self, scores: QualityScores, timestamp: Optional[float] = None) -> bool:
+        """Retourne True à l'instant où la capture automatique doit avoir lieu"""
+        now = timestamp if timestamp is not None else time.monotonic()
+        if not self._armed:
+            return False
+        if not scores.acceptable:
+            self.interrupt()
+            return False
+        if self._since is None:
+            self._since = now
+        held = now - self._since
+        self.progress = min(1.0, held / self.hold_seconds) if self.hold_seconds > 0 else 1.0
+        if held >= self.hold_seconds:
+            self._armed = False
+            return True
+        return False
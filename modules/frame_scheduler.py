@@ -0,0 +1,175 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PreviewProfile:
+    """Niveau de qualité de la prévisualisation"""
+    fps: float
+    scale: float         # Facteur d'échelle appliqué à la frame avant traitement
+    jpeg_quality: int
+
+
+# Du plus confortable au plus économe
+DEFAULT_PROFILES = [
+    PreviewProfile(fps=30.0, scale=1.0, jpeg_quality=70),
+    PreviewProfile(fps=24.0, scale=0.75, jpeg_quality=65),
+    PreviewProfile(fps=15.0, scale=0.5, jpeg_quality=60),
+    PreviewProfile(fps=10.0, scale=0.5, jpeg_quality=50),
+    PreviewProfile(fps=6.0, scale=0.35, jpeg_quality=45),
+]
+
+
+class AdaptiveFrameScheduler:
+    """
+    Cadenceur de la boucle de prévisualisation.
+
+    Mesure le coût de chaque itération, attend jusqu'à l'échéance suivante
+    (au lieu d'un sleep fixe) et change de profil lorsque l'appareil ne tient
+    plus le budget : débit, résolution et qualité JPEG baissent, puis
+    remontent quand la charge le permet.
+
+    Utilisation dans la boucle :
+        scheduler.begin_frame()   # début d'itération
+        frame = lecture caméra
+        scheduler.mark_work()     # début du travail CPU (hors attente caméra)
+        ... traitement ...
+        scheduler.end_frame()     # mesure, adaptation et attente
+    """
+
+    def __init__(self, target_fps: Optional[float] = None, profiles: Optional[List[PreviewProfile]] = None,
+                 budget_ratio: float = 0.8, degrade_after: int = 10, recover_after: int = 60,
+                 smoothing: float = 0.2):
+        self.profiles = list(profiles or DEFAULT_PROFILES)
+        if target_fps is not None:
+            # Le plafond de débit est appliqué à tous les profils
+            self.profiles = [
+                PreviewProfile(min(p.fps, target_fps), p.scale, p.jpeg_quality) for p in self.profiles
+            ]
+        self.budget_ratio = budget_ratio
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.smoothing = smoothing
+
+        self.level = 0
+        self._loop_start = None
+        self._work_start = None
+        self._next_deadline = None
+        self._over_budget = 0
+        self._under_budget = 0
+
+        # Statistiques
+        self.avg_cost = 0.0
+        self.frames = 0
+        self.late_frames = 0
+        self.level_changes = 0
+
+    @property
+    def profile(self) -> PreviewProfile:
+        """Profil actif"""
+        return self.profiles[self.level]
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.profile.fps
+
+    def reset(self):
+        """Réinitialise la cadence (au démarrage d'une prévisualisation)"""
+        self._loop_start = None
+        self._work_start = None
+        self._next_deadline = None
+        self._over_budget = 0
+        self._under_budget = 0
+
+    def begin_frame(self):
+        """Marque le début d'une itération"""
+        now = time.monotonic()
+        self._loop_start = now
+        self._work_start = now
+        if self._next_deadline is None:
+            self._next_deadline = now
+
+    def mark_work(self):
+        """Marque le début du travail CPU (après l'attente de la caméra)"""
+        self._work_start = time.monotonic()
+
+    def end_frame(self, sleep: bool = True, cost: Optional[float] = None) -> float:
+        """
+        Termine l'itération : mesure le coût, adapte le profil puis attend l'échéance.
+
+        `cost` (s) remplace le coût mesuré s'il est plus élevé : avec un
+        pipeline à étages, c'est l'étage le plus lent qui fixe le débit.
+        """
+        now = time.monotonic()
+        if self._work_start is None:
+            self.begin_frame()
+        cost = max(now - self._work_start, cost or 0.0)
+        self.frames += 1
+        if self.frames == 1:
+            self.avg_cost = cost
+        else:
+            self.avg_cost += self.smoothing * (cost - self.avg_cost)
+
+        self._adapt()
+
+        # Cadence par échéances : une itération lente ne décale pas les suivantes
+        self._next_deadline += self.period
+        delay = self._next_deadline - time.monotonic()
+        if delay < -self.period:
+            # Trop en retard : on repart de maintenant plutôt que d'enchaîner
+            self.late_frames += 1
+            self._next_deadline = time.monotonic()
+            delay = 0.0
+        if sleep and delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def _adapt(self):
+        budget = self.period * self.budget_ratio
+        if self.avg_cost > budget and self.level < len(self.profiles) - 1:
+            self._over_budget += 1
+            self._under_budget = 0
+            if self._over_budget >= self.degrade_after:
+                self._set_level(self.level + 1)
+            return
+        # Frame dans le budget : la série de dépassements consécutifs est rompue
+        self._over_budget = 0
+        if self.level > 0:
+            # On ne remonte que si le profil supérieur tiendrait confortablement
+            better = self.profiles[self.level - 1]
+            scale_gain = (better.scale / self.profile.scale) ** 2
+            if self.avg_cost * scale_gain < (1.0 / better.fps) * self.budget_ratio * 0.7:
+                self._under_budget += 1
+                if self._under_budget >= self.recover_after:
+                    self._set_level(self.level - 1)
+            else:
+                self._under_budget = 0
+
+    def _set_level(self, level: int):
+        previous = self.profile
+        self.level = level
+        self._over_budget = 0
+        self._under_budget = 0
+        self.level_changes += 1
+        logger.info(
+            f"Profil prévisualisation {previous.fps:.0f} FPS -> {self.profile.fps:.0f} FPS "
+            f"(échelle {self.profile.scale}, qualité {self.profile.jpeg_quality}, "
+            f"coût moyen {self.avg_cost * 1000:.1f} ms)"
+        )
+
+    def stats(self) -> dict:
+        """Retourne les statistiques de cadence"""
+        return {
+            "level": self.level,
+            "target_fps": self.profile.fps,
+            "scale": self.profile.scale,
+            "jpeg_quality": self.profile.jpeg_quality,
+            "avg_cost_ms": self.avg_cost * 1000,
+            "frames": self.frames,
+            "late_frames": self.late_frames,
+            "level_changes": self.level_changes,
+        }
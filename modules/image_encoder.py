@@ -0,0 +1,433 @@
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class JpegBackend:
+    """Interface d'un backend d'encodage JPEG (frames BGR numpy)"""
+
+    name = "base"
+
+    def encode(self, frame: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        raise NotImplementedError
+
+    def encode_pil(self, image: Image.Image, quality: int, optimize: bool = False) -> bytes:
+        """Encode une image PIL (conversion en BGR par défaut)"""
+        rgb = np.asarray(image.convert("RGB"))
+        return self.encode(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), quality, optimize)
+
+
+class Cv2JpegBackend(JpegBackend):
+    """Encodage direct des frames BGR par cv2.imencode (pas de conversion de couleur)"""
+
+    name = "cv2"
+
+    def encode(self, frame: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality), cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize)]
+        ok, encoded = cv2.imencode(".jpg", frame, params)
+        if not ok:
+            raise RuntimeError("Échec de l'encodage JPEG (cv2)")
+        return encoded.tobytes()
+
+
+class PilJpegBackend(JpegBackend):
+    """Encodage par Pillow, avec tampons RGB et BytesIO réutilisés"""
+
+    name = "pil"
+
+    def __init__(self):
+        self._rgb = None
+        self._buffer = BytesIO()
+
+    def encode(self, frame: np.ndarray, quality: int, optimize: bool = False) -> bytes:
+        if frame.ndim == 2:
+            image = Image.fromarray(frame)
+        else:
+            if self._rgb is None or self._rgb.shape != frame.shape:
+                self._rgb = np.empty_like(frame)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            image = Image.frombuffer("RGB", (frame.shape[1], frame.shape[0]), self._rgb, "raw", "RGB", 0, 1)
+        return self._save(image, quality, optimize)
+
+    def encode_pil(self, image: Image.Image, quality: int, optimize: bool = False) -> bytes:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return self._save(image, quality, optimize)
+
+    def _save(self, image: Image.Image, quality: int, optimize: bool) -> bytes:
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        image.save(self._buffer, format="JPEG", quality=int(quality), optimize=optimize)
+        return self._buffer.getvalue()
+
+
+BACKENDS = {
+    Cv2JpegBackend.name: Cv2JpegBackend,
+    PilJpegBackend.name: PilJpegBackend,
+}
+
+_fastest_backend: Optional[str] = None
+_selection_lock = threading.Lock()
+
+
+def benchmark_backends(size=(640, 480), quality: int = 70, rounds: int = 5) -> Dict[str, float]:
+    """Mesure le temps moyen d'encodage (ms) de chaque backend sur une frame synthétique"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    frame[::4] = rng.integers(0, 255, frame[::4].shape, dtype=np.uint8)
+
+    results = {}
+    for name, backend_cls in BACKENDS.items():
+        try:
+            backend = backend_cls()
+            backend.encode(frame, quality)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                backend.encode(frame, quality)
+            results[name] = (time.perf_counter() - start) / rounds * 1000
+        except Exception as e:
+            logger.warning(f"Backend JPEG {name} indisponible: {e}")
+    return results
+
+
+def select_fastest_backend() -> str:
+    """Choisit (une seule fois par processus) le backend le plus rapide"""
+    global _fastest_backend
+    with _selection_lock:
+        if _fastest_backend is None:
+            timings = benchmark_backends()
+            if not timings:
+                raise RuntimeError("Aucun backend JPEG disponible")
+            _fastest_backend = min(timings, key=timings.get)
+            details = ", ".join(f"{name}={ms:.2f} ms" for name, ms in timings.items())
+            logger.info(f"Backend JPEG sélectionné: {_fastest_backend} ({details})")
+        return _fastest_backend
+
+
+class JpegEncoder:
+    """
+    Encodeur JPEG partagé par la prévisualisation, la capture et l'import.
+
+    Délègue à un backend interchangeable et mesure chaque encodage. Les appels
+    sont sérialisés : les tampons du backend sont réutilisés d'un appel à l'autre.
+    """
+
+    def __init__(self, backend: Optional[str] = None, history: int = 120):
+        name = backend or select_fastest_backend()
+        if name not in BACKENDS:
+            raise ValueError(f"Backend JPEG inconnu: {name}")
+        self.backend = BACKENDS[name]()
+        self._lock = threading.Lock()
+        self._timings = deque(maxlen=history)
+        self.count = 0
+        self.total_bytes = 0
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name
+
+    def encode(self, frame: np.ndarray, quality: int = 85, optimize: bool = False) -> bytes:
+        """Encode une frame BGR numpy"""
+        with self._lock:
+            start = time.perf_counter()
+            data = self.backend.encode(frame, quality, optimize)
+            self._record(start, data)
+            return data
+
+    def encode_pil(self, image: Image.Image, quality: int = 85, optimize: bool = False) -> bytes:
+        """Encode une image PIL"""
+        with self._lock:
+            start = time.perf_counter()
+            data = self.backend.encode_pil(image, quality, optimize)
+            self._record(start, data)
+            return data
+
+    def _record(self, start: float, data: bytes):
+        self._timings.append(time.perf_counter() - start)
+        self.count += 1
+        self.total_bytes += len(data)
+
+    def stats(self) -> dict:
+        """Retourne les temps d'encodage (moyenne, p95, dernier) en millisecondes"""
+        with self._lock:
+            timings = sorted(self._timings)
+            last = self._timings[-1] if self._timings else 0.0
+        if not timings:
+            return {"backend": self.backend_name, "count": self.count}
+        return {
+            "backend": self.backend_name,
+            "count": self.count,
+            "mean_ms": sum(timings) / len(timings) * 1000,
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+            "last_ms": last * 1000,
+            "avg_bytes": self.total_bytes / self.count,
+        }
+
+
+_shared_encoder: Optional[JpegEncoder] = None
+_shared_encoder_lock = threading.Lock()
+
+
+def shared_encoder() -> JpegEncoder:
+    """Encodeur du processus courant (créé au premier appel, y compris dans un worker)"""
+    global _shared_encoder
+    with _shared_encoder_lock:
+        if _shared_encoder is None:
+            _shared_encoder = JpegEncoder()
+        return _shared_encoder
+
+
+class ByteBudgetEncoder:
+    """
+    Encodage JPEG visant un budget d'octets (par type de scan) plutôt
+    qu'une qualité fixe.
+
+    Recherche par dichotomie sur la qualité (`min_quality`..`max_quality`)
+    ; si la qualité minimale dépasse encore le budget, l'image est réduite
+    (la taille du JPEG suit à peu près le nombre de pixels) jusqu'à
+    `min_scale`. La recherche part des derniers paramètres retenus pour la
+    même clé : une ou deux compressions suffisent d'habitude. Le résultat
+    est accepté dès qu'il tient dans le budget à `tolerance` près par en
+    dessous. Paramètres et tailles obtenus sont gardés pour la télémétrie.
+    """
+
+    def __init__(self, encoder: Optional[JpegEncoder] = None, min_quality: int = 60, max_quality: int = 90,
+                 min_scale: float = 0.5, tolerance: float = 0.15, max_attempts: int = 6, history: int = 50):
+        self.encoder = encoder or shared_encoder()
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.min_scale = min_scale
+        self.tolerance = tolerance
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Derniers paramètres retenus par clé : (qualité, échelle)
+        self._last: Dict[str, Tuple[int, float]] = {}
+        self._history = deque(maxlen=history)
+
+    def last_params(self, key: str) -> Tuple[int, float]:
+        with self._lock:
+            return self._last.get(key, (self.max_quality, 1.0))
+
+    @staticmethod
+    def _scaled(frame: np.ndarray, scale: float) -> np.ndarray:
+        if scale >= 1.0:
+            return frame
+        height, width = frame.shape[:2]
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame: np.ndarray, budget: int, key: str = "default") -> bytes:
+        """Encode une frame BGR au plus près de `budget` octets (sans le dépasser si possible)"""
+        start = time.perf_counter()
+        quality, scale = self.last_params(key)
+        low, high = self.min_quality, self.max_quality
+        scaled = self._scaled(frame, scale)
+        best = None      # (données, qualité, échelle) : le plus gros résultat dans le budget
+        smallest = None  # repli si rien ne tient dans le budget
+        probed_min = False
+        attempts = 0
+        while attempts < self.max_attempts:
+            attempts += 1
+            data = self.encoder.encode(scaled, quality=quality, optimize=True)
+            if smallest is None or len(data) < len(smallest[0]):
+                smallest = (data, quality, scale)
+            if len(data) <= budget:
+                if best is None or len(data) > len(best[0]):
+                    best = (data, quality, scale)
+                if len(data) >= budget * (1 - self.tolerance):
+                    break
+                # Marge : qualité plus haute, ou échelle plus grande si la qualité est au maximum
+                low = quality + 1
+                if low > high:
+                    if scale >= 1.0:
+                        break
+                    scale = min(1.0, scale * (budget / len(data)) ** 0.5)
+                    scaled = self._scaled(frame, scale)
+                    low, high = self.min_quality, quality
+                    continue
+            else:
+                high = quality - 1
+                if high < low:
+                    if best is not None or scale <= self.min_scale:
+                        break
+                    # Qualité épuisée : réduction proportionnelle à l'excès (nombre de pixels)
+                    scale = max(self.min_scale, scale * (budget / len(data)) ** 0.5 * 0.95)
+                    scaled = self._scaled(frame, scale)
+                    low, high = self.min_quality, self.max_quality
+                    quality = self.min_quality
+                    continue
+                if not probed_min:
+                    # Premier dépassement : la qualité minimale dit tout de suite s'il faut réduire l'image
+                    probed_min = True
+                    quality = low
+                    continue
+            quality = (low + high + 1) // 2
+
+        data, quality, scale = best or smallest
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._last[key] = (quality, scale)
+            self._history.append({
+                "key": key, "budget": budget, "quality": quality, "scale": scale, "bytes": len(data),
+                "within_budget": len(data) <= budget, "attempts": attempts, "ms": elapsed,
+            })
+        logger.debug(f"Budget {key}: {len(data)}/{budget} octets (qualité {quality}, échelle {scale:.2f}, "
+                     f"{attempts} compression(s))")
+        return data
+
+    def stats(self) -> dict:
+        """Derniers paramètres par clé, compressions par image et respect du budget"""
+        with self._lock:
+            history = list(self._history)
+            last = dict(self._last)
+        stats = {"last_params": {key: {"quality": q, "scale": s} for key, (q, s) in last.items()},
+                 "count": len(history)}
+        if history:
+            stats.update({
+                "avg_attempts": sum(e["attempts"] for e in history) / len(history),
+                "avg_bytes": sum(e["bytes"] for e in history) / len(history),
+                "within_budget_ratio": sum(e["within_budget"] for e in history) / len(history),
+                "avg_ms": sum(e["ms"] for e in history) / len(history),
+                "last": history[-1],
+            })
+        return stats
+
+
+_shared_budget_encoder: Optional[ByteBudgetEncoder] = None
+
+
+def shared_budget_encoder() -> ByteBudgetEncoder:
+    """Encodeur à budget du processus courant (derniers paramètres partagés par les imports)"""
+    global _shared_budget_encoder
+    encoder = shared_encoder()
+    with _shared_encoder_lock:
+        if _shared_budget_encoder is None:
+            _shared_budget_encoder = ByteBudgetEncoder(encoder)
+        return _shared_budget_encoder
+
+
+def fit_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Taille dans `max_size` en gardant les proportions (jamais agrandie)"""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height)
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+# Tag EXIF d'orientation ; 5 à 8 : image stockée tournée d'un quart de tour
+EXIF_ORIENTATION = 0x0112
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+# Transformation qui ramène l'image stockée dans le sens d'affichage (table de ImageOps.exif_transpose)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+@dataclass
+class ImageInfo:
+    """Caractéristiques lues dans l'en-tête seul (aucun décodage des pixels)"""
+    format: Optional[str]
+    width: int
+    height: int
+    mode: str
+    orientation: int
+    byte_size: int
+
+    @property
+    def transposed(self) -> bool:
+        return self.orientation in _TRANSPOSED_ORIENTATIONS
+
+
+def inspect_image(image_data: bytes) -> ImageInfo:
+    """Format, dimensions stockées, mode, orientation EXIF et taille en octets"""
+    image = Image.open(BytesIO(image_data))
+    try:
+        orientation = int(image.getexif().get(EXIF_ORIENTATION, 1))
+    except Exception:
+        orientation = 1
+    return ImageInfo(
+        format=image.format, width=image.size[0], height=image.size[1], mode=image.mode,
+        orientation=orientation, byte_size=len(image_data),
+    )
+
+
+def meets_upload_spec(info: ImageInfo, max_size: Tuple[int, int], max_bytes: Optional[int] = None) -> bool:
+    """True si l'image peut être envoyée telle quelle (le prétraitement n'y changerait rien d'utile)"""
+    return (
+        info.format == "JPEG"
+        and info.mode in ("RGB", "L")
+        and info.orientation == 1
+        and info.width <= max_size[0] and info.height <= max_size[1]
+        and (max_bytes is None or info.byte_size <= max_bytes)
+    )
+
+
+def decode_reduced(image_data: bytes, max_size: Tuple[int, int]) -> Image.Image:
+    """
+    Décode une image réduite à `max_size`, orientation EXIF appliquée.
+
+    Pour un JPEG, le décodeur réduit d'abord l'image par mise à l'échelle de
+    la DCT (1/2, 1/4 ou 1/8, sans descendre sous la taille visée) : une photo
+    de 48 Mpx n'est jamais décodée en pleine taille. Le redimensionnement
+    final (LANCZOS) part de cette image intermédiaire.
+    """
+    image = Image.open(BytesIO(image_data))
+    try:
+        orientation = int(image.getexif().get(EXIF_ORIENTATION, 1))
+    except Exception:
+        orientation = 1
+    # Image stockée tournée : la boîte est appliquée avant la rotation, donc transposée
+    box = (max_size[1], max_size[0]) if orientation in _TRANSPOSED_ORIENTATIONS else max_size
+    target = fit_size(image.size, box)
+    if target != image.size:
+        # Sans effet pour les formats autres que JPEG
+        image.draft(None, target)
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+    if orientation in _ORIENTATION_TRANSPOSE:
+        image = image.transpose(_ORIENTATION_TRANSPOSE[orientation])
+    return image
+
+
+def preprocess_upload(image_data: bytes, max_size: Tuple[int, int], quality: int = 85,
+                      encoder: Optional[JpegEncoder] = None, max_bytes: Optional[int] = None,
+                      byte_budget: Optional[int] = None, budget_key: str = "default",
+                      budget_encoder: Optional[ByteBudgetEncoder] = None) -> bytes:
+    """
+    Réduit une image importée à `max_size` et la réencode en JPEG, à
+    qualité fixe ou, avec `byte_budget`, au plus près de ce nombre
+    d'octets (paramètres mémorisés par `budget_key`).
+
+    L'en-tête est inspecté d'abord : un JPEG déjà dans les limites (taille,
+    orientation, `max_bytes` et budget) est retourné tel quel, sans perte
+    de génération ni décodage. Fonction de module (picklable) : exécutable
+    dans un pool de processus.
+    """
+    if byte_budget is not None:
+        max_bytes = byte_budget if max_bytes is None else min(max_bytes, byte_budget)
+    if meets_upload_spec(inspect_image(image_data), max_size, max_bytes):
+        return image_data
+    image = decode_reduced(image_data, max_size)
+    if byte_budget is not None:
+        frame = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+        return (budget_encoder or shared_budget_encoder()).encode(frame, byte_budget, budget_key)
+    return (encoder or shared_encoder()).encode_pil(image, quality=quality, optimize=True)
@@ -0,0 +1,152 @@
+import time
+import logging
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Formats YUV 4:2:0 : plan Y puis chrominance, lus comme une seule image de hauteur 3/2
+_YUV_CODES = {
+    "nv21": cv2.COLOR_YUV2BGR_NV21,
+    "nv12": cv2.COLOR_YUV2BGR_NV12,
+    "yuv420": cv2.COLOR_YUV2BGR_I420,
+    "i420": cv2.COLOR_YUV2BGR_I420,
+    "yv12": cv2.COLOR_YUV2BGR_YV12,
+}
+# Formats planaires : plans U et V séparés, chacun au pas de la moitié de celui du plan Y
+_PLANAR_YUV = ("yuv420", "i420", "yv12")
+# Formats entrelacés : octets par pixel et conversion vers BGR (None : déjà BGR)
+_PACKED = {
+    "rgba": (4, cv2.COLOR_RGBA2BGR),
+    "bgra": (4, cv2.COLOR_BGRA2BGR),
+    "rgb": (3, cv2.COLOR_RGB2BGR),
+    "bgr": (3, None),
+}
+NATIVE_FORMATS = ("jpeg",) + tuple(_YUV_CODES) + tuple(_PACKED)
+
+
+class NativeFrameConverter:
+    """
+    Conversion des frames de la caméra native (NV21/YUV420, RGBA, JPEG...) en BGR.
+
+    Le tampon reçu est lu en place (`np.frombuffer` et vue à pas de ligne
+    `stride`), puis converti en une seule copie dans l'un des `buffers`
+    tableaux de sortie préalloués, utilisés à tour de rôle : la frame
+    précédente reste valide pendant que la suivante est convertie.
+    Une instance par thread.
+    """
+
+    def __init__(self, buffers: int = 2):
+        if buffers < 2:
+            raise ValueError("Au moins 2 tampons de sortie sont nécessaires")
+        self._outputs = [None] * buffers
+        self._index = 0
+        # Copie jointive des plans I420/YV12 dont les lignes sont complétées (stride > largeur)
+        self._packed: Optional[np.ndarray] = None
+
+        # Statistiques
+        self.conversions = 0
+        self.last_convert_ms = 0.0
+        self.avg_convert_ms = 0.0
+
+    def _output(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Prochain tableau de sortie (réalloué seulement si la taille change)"""
+        self._index = (self._index + 1) % len(self._outputs)
+        out = self._outputs[self._index]
+        if out is None or out.shape != shape:
+            out = np.empty(shape, dtype=np.uint8)
+            self._outputs[self._index] = out
+        return out
+
+    @staticmethod
+    def _view(src: np.ndarray, rows: int, row_bytes: int, stride: int, channels: int = 1) -> np.ndarray:
+        """Vue sans copie de `rows` lignes espacées de `stride` octets"""
+        required = stride * (rows - 1) + row_bytes
+        if src.size < required:
+            raise ValueError(f"Tampon trop court : {src.size} octets pour {required} attendus")
+        if channels == 1:
+            shape, strides = (rows, row_bytes), (stride, 1)
+        else:
+            shape, strides = (rows, row_bytes // channels, channels), (stride, channels, 1)
+        return np.lib.stride_tricks.as_strided(src, shape=shape, strides=strides, writeable=False)
+
+    def _pack_planar(self, src: np.ndarray, width: int, height: int, stride: int) -> np.ndarray:
+        """
+        Recopie les plans Y, U et V d'un tampon I420/YV12 à lignes complétées
+        dans une image jointive de hauteur 3/2 (disposition attendue par OpenCV).
+        """
+        if stride % 2:
+            raise ValueError(f"Pas de ligne YUV planaire impair : {stride}")
+        chroma_w, chroma_h, chroma_stride = width // 2, height // 2, stride // 2
+        u_offset = stride * height
+        v_offset = u_offset + chroma_stride * chroma_h
+        y_plane = self._view(src, height, width, stride)
+        u_plane = self._view(src[u_offset:], chroma_h, chroma_w, chroma_stride)
+        v_plane = self._view(src[v_offset:], chroma_h, chroma_w, chroma_stride)
+
+        shape = (height * 3 // 2, width)
+        if self._packed is None or self._packed.shape != shape:
+            self._packed = np.empty(shape, dtype=np.uint8)
+        packed = self._packed
+        flat = packed.reshape(-1)
+        chroma_size = chroma_w * chroma_h
+        packed[:height] = y_plane
+        flat[width * height:width * height + chroma_size].reshape(chroma_h, chroma_w)[:] = u_plane
+        flat[width * height + chroma_size:].reshape(chroma_h, chroma_w)[:] = v_plane
+        return packed
+
+    def convert(self, data: Buffer, fmt: str = "jpeg", width: int = 0, height: int = 0,
+                stride: int = 0) -> Optional[np.ndarray]:
+        """
+        Convertit une frame native en image BGR.
+
+        `stride` est le pas d'une ligne en octets (0 : lignes jointives) ; pour
+        les formats YUV, c'est le pas du plan Y. NV12/NV21 : le plan UV suit
+        le plan Y avec le même pas (disposition des tampons Android).
+        I420/YV12 : les plans U puis V suivent avec un pas de `stride / 2`
+        et sont recopiés dans une image jointive avant la conversion.
+        """
+        start = time.perf_counter()
+        fmt = fmt.lower()
+        src = np.frombuffer(data, dtype=np.uint8)
+
+        if fmt in ("jpeg", "jpg"):
+            frame = cv2.imdecode(src, cv2.IMREAD_COLOR)
+        elif fmt in _YUV_CODES:
+            if width <= 0 or height <= 0 or height % 2 or width % 2:
+                raise ValueError(f"Dimensions YUV invalides : {width}x{height}")
+            if fmt in _PLANAR_YUV and stride and stride != width:
+                view = self._pack_planar(src, width, height, stride)
+            else:
+                view = self._view(src, height * 3 // 2, width, stride or width)
+            frame = cv2.cvtColor(view, _YUV_CODES[fmt], dst=self._output((height, width, 3)))
+        elif fmt in _PACKED:
+            if width <= 0 or height <= 0:
+                raise ValueError(f"Dimensions invalides : {width}x{height}")
+            channels, code = _PACKED[fmt]
+            view = self._view(src, height, width * channels, stride or width * channels, channels)
+            if code is not None:
+                frame = cv2.cvtColor(view, code, dst=self._output((height, width, 3)))
+            else:
+                frame = self._output((height, width, 3))
+                np.copyto(frame, view)
+        else:
+            raise ValueError(f"Format natif non pris en charge : {fmt} (attendu : {', '.join(NATIVE_FORMATS)})")
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.conversions += 1
+        self.last_convert_ms = elapsed
+        self.avg_convert_ms += (elapsed - self.avg_convert_ms) / min(self.conversions, 30)
+        return frame
+
+    def stats(self) -> dict:
+        """Statistiques de conversion"""
+        return {
+            "conversions": self.conversions,
+            "last_convert_ms": self.last_convert_ms,
+            "avg_convert_ms": self.avg_convert_ms,
+        }
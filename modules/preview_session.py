@@ -0,0 +1,181 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from modules.camera_module import CameraSessionManager
+from modules.frame_scheduler import AdaptiveFrameScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewSession:
+    """
+    Session de prévisualisation : possède le thread de capture et la source.
+
+    `stop` arrête la boucle, joint le thread dans un délai borné et libère la
+    source. Les sessions encore vivantes sont comptées au niveau de la classe :
+    une session dont le thread ne s'arrête pas à temps est signalée comme fuite.
+    """
+
+    _registry_lock = threading.Lock()
+    _live = set()
+
+    def __init__(self, source_spec: Union[int, str], process_frame: Callable[[np.ndarray], None],
+                 camera_sessions: Optional[CameraSessionManager] = None,
+                 scheduler: Optional[AdaptiveFrameScheduler] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 max_consecutive_errors: int = 30, name: str = "preview", history: int = 300,
+                 cost_probe: Optional[Callable[[], Optional[float]]] = None):
+        self.source_spec = source_spec
+        self._process_frame = process_frame
+        self.camera_sessions = camera_sessions or CameraSessionManager()
+        self.scheduler = scheduler or AdaptiveFrameScheduler()
+        self._on_error = on_error
+        # Coût par frame du traitement asynchrone (graphe à étages) pour le cadenceur
+        self._cost_probe = cost_probe
+        self.max_consecutive_errors = max_consecutive_errors
+        self.name = name
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._loop_times = deque(maxlen=history)
+        self._started_at: Optional[float] = None
+        self._stopped_at: Optional[float] = None
+
+        # Statistiques
+        self.frames = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    # --- Registre des sessions vivantes ---
+
+    @classmethod
+    def live_sessions(cls) -> int:
+        """Nombre de sessions dont le thread de capture tourne encore"""
+        with cls._registry_lock:
+            return sum(1 for session in cls._live if session.is_alive)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def running(self) -> bool:
+        return self.is_alive and not self._stop_event.is_set()
+
+    # --- Cycle de vie ---
+
+    def start(self):
+        """Démarre le thread de capture"""
+        if self._thread is not None:
+            raise RuntimeError("Session déjà démarrée")
+        others = PreviewSession.live_sessions()
+        if others:
+            logger.warning(f"{others} session(s) de prévisualisation encore active(s) au démarrage de {self.name}")
+        self._started_at = time.monotonic()
+        self.scheduler.reset()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-capture", daemon=True)
+        with PreviewSession._registry_lock:
+            PreviewSession._live.add(self)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> bool:
+        """Arrête la session ; retourne False si le thread n'a pas terminé dans le délai"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return True
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Fuite de session {self.name}: thread de capture actif après {timeout}s")
+            return False
+        return True
+
+    def request_switch(self, spec: Union[int, str]):
+        """Demande un changement de source, appliqué par la boucle de capture"""
+        self.source_spec = spec
+        self.camera_sessions.request_switch(spec)
+
+    # --- Boucle de capture ---
+
+    def _run(self):
+        sessions = self.camera_sessions
+        scheduler = self.scheduler
+        source = None
+        consecutive_errors = 0
+        try:
+            source = sessions.open(self.source_spec)
+            last_seq = -1
+            while not self._stop_event.is_set():
+                switched = sessions.apply_pending_switch()
+                if switched is not None:
+                    source, last_seq = switched, -1
+
+                scheduler.begin_frame()
+                last_seq, frame = source.read(timeout=1.0, after=last_seq)
+                if frame is None:
+                    continue
+                sessions.note_frame()
+                scheduler.mark_work()
+                loop_start = time.perf_counter()
+
+                try:
+                    self._process_frame(frame)
+                    consecutive_errors = 0
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                    consecutive_errors += 1
+                    logger.error(f"Erreur traitement frame ({self.name}): {e}")
+                    if consecutive_errors >= self.max_consecutive_errors:
+                        raise RuntimeError(f"{consecutive_errors} erreurs consécutives") from e
+
+                self.frames += 1
+                self._loop_times.append(time.perf_counter() - loop_start)
+                cost = self._cost_probe() if self._cost_probe is not None else None
+                scheduler.end_frame(sleep=not self._stop_event.is_set(), cost=cost)
+
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.error(f"Erreur prévisualisation: {e}")
+            if self._on_error is not None:
+                try:
+                    self._on_error(e)
+                except Exception:
+                    logger.exception("Erreur dans le rappel on_error")
+        finally:
+            if source is not None and sessions.current is source:
+                sessions.close()
+            elif source is not None:
+                source.close()
+            self._stopped_at = time.monotonic()
+            with PreviewSession._registry_lock:
+                PreviewSession._live.discard(self)
+
+    # --- Statistiques ---
+
+    def stats(self) -> dict:
+        """Statistiques de la session : frames, temps de boucle moyen / p95, erreurs"""
+        loop_times = sorted(self._loop_times)
+        end = self._stopped_at or time.monotonic()
+        stats = {
+            "name": self.name,
+            "alive": self.is_alive,
+            "frames": self.frames,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "uptime_s": (end - self._started_at) if self._started_at else 0.0,
+            "live_sessions": PreviewSession.live_sessions(),
+        }
+        if loop_times:
+            stats["avg_loop_ms"] = sum(loop_times) / len(loop_times) * 1000
+            stats["p95_loop_ms"] = loop_times[min(len(loop_times) - 1, int(len(loop_times) * 0.95))] * 1000
+        current = self.camera_sessions.current
+        if current is not None:
+            stats["source"] = current.stats()
+        return stats
@@ -0,0 +1,335 @@
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from modules.camera_module import is_encoded_frame
+from modules.frame_buffer import FrameRingBuffer
+from modules.frame_scheduler import AdaptiveFrameScheduler
+from modules.frame_enhancer import FrameEnhancer
+from modules.frame_quality import AutoCaptureTrigger, QualityScorer, QualityScores, QualityThresholds
+from modules.document_scanner import DocumentScanner, DocumentTracker
+from modules.face_detector import FaceDetector
+from modules.image_encoder import ByteBudgetEncoder, JpegEncoder
+from modules.stage_graph import Stage, StageGraph
+from modules.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineOptions:
+    """Réglages du pipeline de scan (sérialisables : envoyés tels quels au processus de capture)"""
+    scan_type: str = "document"
+    preview_size: Tuple[int, int] = (340, 440)
+    upload_max_size: Tuple[int, int] = (1200, 1600)
+    upload_jpeg_quality: int = 85
+    # Budget en octets de l'image envoyée (None : qualité fixe upload_jpeg_quality)
+    upload_byte_budget: Optional[int] = None
+    burst_frames: int = 8
+    burst_window_s: float = 1.0
+    quality_thresholds: QualityThresholds = field(default_factory=QualityThresholds)
+    auto_capture_hold_s: float = 0.8
+    document_redetect_every: int = 15
+    face_detect_every: int = 5
+    target_fps: Optional[float] = 30
+    # Sans amélioration, les JPEG d'une caméra MJPG en pass-through servent directement d'aperçu
+    enhance_enabled: bool = True
+    auto_capture_enabled: bool = True
+    document_crop_enabled: bool = True
+    face_crop_enabled: bool = True
+
+
+class FrameJob:
+    """Frame en cours de traitement dans le graphe, avec ses propres tampons (recyclés)"""
+
+    __slots__ = ("enhancer", "raw", "small", "preview", "scores", "seq", "triggered", "passthrough")
+
+    def __init__(self, enhancer: FrameEnhancer):
+        # Un moteur par travail : les étages peuvent tenir plusieurs frames à la fois
+        self.enhancer = enhancer
+        self.clear()
+
+    def clear(self):
+        self.raw: Optional[np.ndarray] = None
+        self.small: Optional[np.ndarray] = None
+        self.preview: Optional[np.ndarray] = None
+        self.scores: Optional[QualityScores] = None
+        self.seq = -1
+        self.triggered = False
+        self.passthrough = False
+
+
+class ScanPipeline:
+    """
+    Traitement des frames de la prévisualisation, indépendant de l'interface.
+
+    Pour chaque frame brute : réduction à la taille d'affichage, scores de
+    qualité, détection du document ou du visage, amélioration, puis
+    publication dans le tampon de prévisualisation ; la frame pleine
+    résolution est conservée pour la capture « meilleure de N ». Tourne dans
+    le thread de capture de ScanScreen ou dans le processus de capture.
+
+    Le travail est découpé en étages (prepare, analyze, encode) que
+    `build_stage_graph` relie par des files bornées ; `process` les enchaîne
+    en série dans le thread appelant.
+    """
+
+    def __init__(self, options: Optional[PipelineOptions] = None,
+                 scheduler: Optional[AdaptiveFrameScheduler] = None,
+                 on_auto_capture: Optional[Callable[[], None]] = None,
+                 worker_pool: Optional[WorkerPool] = None, pool_group: Any = None):
+        self.options = options or PipelineOptions()
+        self.on_auto_capture = on_auto_capture
+        opts = self.options
+        self.scheduler = scheduler or AdaptiveFrameScheduler(target_fps=opts.target_fps)
+        self.frame_buffer = FrameRingBuffer(capacity=3, encoder=self.encode_preview)
+        self.capture_buffer = FrameRingBuffer(capacity=opts.burst_frames, encoder=self.encode_capture)
+        self.quality_scorer = QualityScorer(opts.quality_thresholds)
+        self.auto_capture = AutoCaptureTrigger(opts.auto_capture_hold_s)
+        self.last_quality: Optional[QualityScores] = None
+        # Avec un pool, la détection périodique du document passe en tâche de fond
+        self.document_scanner = DocumentTracker(
+            DocumentScanner(), redetect_every=opts.document_redetect_every,
+            pool=worker_pool, pool_group=pool_group,
+        )
+        self.face_detector = FaceDetector(detect_every=opts.face_detect_every)
+        # Un moteur par thread : prévisualisation et capture ne partagent pas leurs tampons
+        self.preview_enhancer = FrameEnhancer(alpha=1.2, beta=10)
+        self.capture_enhancer = FrameEnhancer(alpha=1.2, beta=10)
+        # Backend JPEG le plus rapide choisi au démarrage (auto-benchmark)
+        self.preview_encoder = JpegEncoder()
+        self.upload_encoder = JpegEncoder()
+        # Recherche qualité / échelle pour tenir le budget, repartant des derniers paramètres du type de scan
+        self.budget_encoder = ByteBudgetEncoder(self.upload_encoder)
+        self._passthrough = False
+        self.passthrough_frames = 0
+        # Réservoir de travaux pour le graphe à étages
+        self._jobs = []
+        self._jobs_lock = threading.Lock()
+
+    def reset(self, options: Optional[PipelineOptions] = None):
+        """Nouvelle session : vide les tampons et réapplique les réglages"""
+        if options is not None:
+            self.options = options
+        opts = self.options
+        self.frame_buffer.clear()
+        self.capture_buffer.clear()
+        self.quality_scorer.thresholds = opts.quality_thresholds
+        self.quality_scorer.reset()
+        self.auto_capture.hold_seconds = opts.auto_capture_hold_s
+        self.auto_capture.reset()
+        self.last_quality = None
+        self._passthrough = False
+        self.document_scanner.reset()
+        self.face_detector.reset()
+
+    @property
+    def detect_document(self) -> bool:
+        return self.options.scan_type == "document" and self.options.document_crop_enabled
+
+    @property
+    def detect_face(self) -> bool:
+        return self.options.scan_type == "selfie" and self.options.face_crop_enabled
+
+    def process(self, frame: np.ndarray) -> Tuple[int, Optional[QualityScores], bool]:
+        """
+        Traite une frame brute en série (étages prepare puis analyze dans le
+        thread appelant) ; retourne le numéro de la frame de prévisualisation
+        publiée, ses scores et True si la capture automatique doit avoir lieu.
+        """
+        job = FrameJob(self.preview_enhancer)
+        job.raw = frame
+        self.analyze(self.prepare(job))
+        return job.seq, job.scores, job.triggered
+
+    # --- Étages (voir build_stage_graph) ---
+
+    def acquire_job(self, frame: Optional[np.ndarray] = None) -> "FrameJob":
+        """Travail recyclé (avec ses tampons) pour une nouvelle frame"""
+        with self._jobs_lock:
+            job = self._jobs.pop() if self._jobs else FrameJob(FrameEnhancer(alpha=1.2, beta=10))
+        job.raw = frame
+        return job
+
+    def release_job(self, job: "FrameJob"):
+        """Rend un travail au réservoir une fois sorti du graphe"""
+        job.clear()
+        with self._jobs_lock:
+            self._jobs.append(job)
+
+    def prepare(self, job: "FrameJob") -> "FrameJob":
+        """Réduction à la taille d'affichage et amélioration, dans les tampons du travail"""
+        frame = job.raw
+        if is_encoded_frame(frame):
+            job.seq = self.process_jpeg(frame.tobytes())
+            job.passthrough = True
+            return job
+
+        # Réduction à la taille d'affichage (et selon la charge)
+        preview_size = self.preview_size(frame, self.scheduler.profile.scale)
+        job.small = job.enhancer.downscale(frame, preview_size)
+        job.preview = self.enhance(job.small, job.enhancer)
+        return job
+
+    def analyze(self, job: "FrameJob") -> "FrameJob":
+        """Scores de qualité, détection, tampons de capture et d'aperçu, capture automatique"""
+        if job.passthrough:
+            return job
+        self._passthrough = False
+
+        # Scores de qualité (netteté, exposition, reflets, stabilité) sur la copie réduite,
+        # avant amélioration : le contraste ajouté fausserait exposition et reflets
+        scores = self.quality_scorer.score(job.small)
+        self.last_quality = job.scores = scores
+
+        # Contour du document ou visage cherché sur la même copie réduite
+        detect_document, detect_face = self.detect_document, self.detect_face
+        if detect_document:
+            self.document_scanner.detect(job.small)
+        elif detect_face:
+            self.face_detector.detect(job.small)
+
+        # Frame brute pleine résolution conservée pour la capture, avec sa netteté et son
+        # propre quadrilatère ou sa boîte de visage : la frame retenue peut être plus
+        # ancienne que la dernière détection
+        # (avant le tracé du contour, qui peut se faire en place sans amélioration)
+        meta = None
+        if detect_document:
+            meta = {"quad": self.document_scanner.quad}
+        elif detect_face:
+            meta = {"box": self.face_detector.box}
+        self.capture_buffer.write(job.raw, score=scores.sharpness, meta=meta)
+        job.raw = None
+
+        if detect_document:
+            self.document_scanner.draw_overlay(job.preview)
+        elif detect_face:
+            self.face_detector.draw_overlay(job.preview)
+
+        # Copie dans le tampon circulaire (encodage JPEG à la demande)
+        job.seq = self.frame_buffer.write(job.preview)
+
+        # Capture automatique dès que la qualité tient pendant la durée de maintien
+        # (en mode selfie, seulement avec un visage dans le cadre : évite les rejets « aucun visage » de l'API)
+        if detect_face and self.face_detector.available and self.face_detector.box is None:
+            self.auto_capture.interrupt()
+        elif self.options.auto_capture_enabled and self.auto_capture.update(scores):
+            job.triggered = True
+            if self.on_auto_capture is not None:
+                self.on_auto_capture()
+        return job
+
+    def encode(self, job: "FrameJob") -> "FrameJob":
+        """JPEG puis base64 de la dernière frame d'aperçu (une seule fois par frame)"""
+        self.frame_buffer.latest_base64()
+        return job
+
+    def encode_jpeg(self, job: "FrameJob") -> "FrameJob":
+        """JPEG seul de la dernière frame d'aperçu (base64 fait par le destinataire)"""
+        self.frame_buffer.latest_jpeg()
+        return job
+
+    def build_stage_graph(self, deliver: Callable[["FrameJob"], Any], threaded: bool = True,
+                          name: str = "preview", base64: bool = True) -> StageGraph:
+        """
+        Graphe prepare → analyze → encode → deliver. La capture (lecture de la
+        source) reste dans la boucle de la session, qui soumet chaque frame.
+        Avec `threaded`, chaque étage a son thread et une file d'un élément
+        (la frame la plus récente gagne) ; sinon tout s'exécute en ligne.
+        L'étage analyze garde un seul thread : scores et suivi dépendent de
+        l'ordre des frames.
+        """
+        workers = 1 if threaded else 0
+        stages = [
+            Stage("prepare", self.prepare, workers=workers),
+            Stage("analyze", self.analyze, workers=workers),
+            Stage("encode", self.encode if base64 else self.encode_jpeg, workers=workers),
+            Stage("deliver", deliver, workers=workers),
+        ]
+        return StageGraph(stages, name=name, on_done=self.release_job, on_drop=self.release_job)
+
+    def process_jpeg(self, jpeg: bytes) -> int:
+        """
+        Pass-through : le JPEG de la caméra sert d'aperçu et de frame de capture
+        sans décodage ni réencodage (pas de scores ni de détection).
+        """
+        self._passthrough = True
+        self.passthrough_frames += 1
+        self.capture_buffer.write_jpeg(jpeg)
+        return self.frame_buffer.write_jpeg(jpeg)
+
+    def capture_jpeg(self) -> Optional[bytes]:
+        """Frame pleine résolution la plus nette de la fenêtre de capture, encodée pour l'envoi"""
+        jpeg = self.capture_buffer.best_jpeg(window=self.options.burst_window_s)
+        if jpeg is not None and self._passthrough:
+            # JPEG brut de la caméra : décodé une seule fois, à la capture, pour le format d'envoi
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            return self.encode_capture(frame) if frame is not None else jpeg
+        return jpeg
+
+    def enhance(self, frame: np.ndarray, enhancer: Optional[FrameEnhancer] = None, size=None) -> np.ndarray:
+        """Améliore la qualité de l'image (contraste, luminosité, bruit)"""
+        enhancer = enhancer or self.capture_enhancer
+        if not self.options.enhance_enabled:
+            return enhancer.downscale(frame, size)
+        try:
+            return enhancer.enhance(frame, size=size)
+        except Exception as e:
+            logger.error(f"Erreur amélioration image: {e}")
+            return frame
+
+    def preview_size(self, frame: np.ndarray, scale: float = 1.0):
+        """Calcule la taille de la frame réduite à l'affichage de la prévisualisation"""
+        height, width = frame.shape[:2]
+        max_w, max_h = self.options.preview_size
+        factor = min(max_w / width, max_h / height, 1.0) * scale
+        if factor >= 1.0:
+            return None
+        return (max(1, int(width * factor)), max(1, int(height * factor)))
+
+    def encode_capture(self, frame: np.ndarray, quad: Optional[np.ndarray] = None,
+                       box: Optional[np.ndarray] = None) -> bytes:
+        """
+        Encode une frame brute pleine résolution à la qualité d'envoi ; `quad` /
+        `box` : quadrilatère du document ou boîte du visage (normalisés) détectés
+        sur cette frame, conservés avec elle par le tampon de capture.
+        """
+        # Document détecté : recadrage redressé depuis la frame pleine résolution
+        if self.detect_document and quad is not None:
+            cropped = self.document_scanner.warp(frame, quad)
+            if cropped is not None:
+                frame = cropped
+        # Visage détecté : recadrage élargi autour du visage, en pleine résolution
+        if self.detect_face and box is not None:
+            cropped = self.face_detector.crop(frame, box)
+            if cropped is not None:
+                frame = cropped
+
+        height, width = frame.shape[:2]
+        max_w, max_h = self.options.upload_max_size
+        factor = min(max_w / width, max_h / height, 1.0)
+        size = (max(1, int(width * factor)), max(1, int(height * factor))) if factor < 1.0 else None
+        frame = self.enhance(frame, self.capture_enhancer, size=size)
+        if self.options.upload_byte_budget:
+            return self.budget_encoder.encode(frame, self.options.upload_byte_budget, self.options.scan_type)
+        return self.upload_encoder.encode(frame, quality=self.options.upload_jpeg_quality, optimize=True)
+
+    def encode_preview(self, frame: np.ndarray) -> bytes:
+        """Encode une frame BGR en JPEG pour la prévisualisation"""
+        return self.preview_encoder.encode(frame, quality=self.scheduler.profile.jpeg_quality)
+
+    def stats(self) -> dict:
+        """Statistiques des étapes du pipeline"""
+        return {
+            "scheduler": self.scheduler.stats(),
+            "preview_encoder": self.preview_encoder.stats(),
+            "upload_encoder": self.upload_encoder.stats(),
+            "upload_budget": self.budget_encoder.stats(),
+            "document_scanner": self.document_scanner.stats(),
+            "face_detector": self.face_detector.stats(),
+            "passthrough_frames": self.passthrough_frames,
+        }
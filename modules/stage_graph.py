@@ -0,0 +1,318 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Bornes des classes des histogrammes de latence (ms) ; la dernière classe est ouverte
+DEFAULT_BOUNDS_MS = (0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 33.0, 66.0, 133.0, 266.0)
+
+
+class LatencyHistogram:
+    """Histogramme de latences à classes fixes (pas de stockage des mesures)"""
+
+    def __init__(self, bounds_ms: Sequence[float] = DEFAULT_BOUNDS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds_ms) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def record(self, ms: float):
+        index = len(self.bounds_ms)
+        for i, bound in enumerate(self.bounds_ms):
+            if ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """Borne supérieure de la classe contenant le p-ième centile"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = self.count * p / 100.0
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return self.bounds_ms[i] if i < len(self.bounds_ms) else self.max_ms
+            return self.max_ms
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound:g}" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]:g}"]
+        with self._lock:
+            counts = list(self.counts)
+            count, total, peak = self.count, self.total_ms, self.max_ms
+        return {
+            "count": count,
+            "avg_ms": total / count if count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": peak,
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+class Stage:
+    """
+    Étage du graphe : une fonction `func(item)` qui retourne l'élément à passer
+    à l'étage suivant (None : l'élément s'arrête là).
+
+    `workers` threads consomment une file bornée à `queue_size` éléments ;
+    avec `workers=0`, l'étage s'exécute dans le thread de l'étage précédent.
+    File pleine : le plus ancien élément en attente est abandonné
+    (`drop_oldest`, la frame la plus récente gagne) ou le producteur attend.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 queue_size: int = 1, drop_oldest: bool = True):
+        if queue_size < 1:
+            raise ValueError("queue_size doit être >= 1")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drop_oldest = drop_oldest
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self.latency = LatencyHistogram()
+        self.wait = LatencyHistogram()
+
+        # Statistiques
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.busy = 0
+        self.avg_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def record(self, elapsed_ms: float):
+        self.latency.record(elapsed_ms)
+        self.processed += 1
+        self.avg_ms += (elapsed_ms - self.avg_ms) / min(self.processed, 30)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "queue_size": self.queue_size,
+            "busy": self.busy,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_ms": self.avg_ms,
+            "latency": self.latency.snapshot(),
+            "queue_wait": self.wait.snapshot(),
+        }
+
+
+class StageGraph:
+    """
+    Chaîne d'étages reliés par des files bornées.
+
+    Chaque étage à `workers > 0` a ses propres threads : l'étage le plus lent
+    ne bloque plus les autres, il limite seulement le débit. Pour chaque étage
+    sont mesurés un histogramme de latence de traitement, l'attente en file et
+    la profondeur de file ; le graphe mesure aussi la latence de bout en bout.
+    `on_done` reçoit chaque élément sorti du graphe et `on_drop` chaque
+    élément abandonné (pour recycler les tampons).
+    """
+
+    def __init__(self, stages: List[Stage], name: str = "pipeline",
+                 on_done: Optional[Callable[[Any], None]] = None,
+                 on_drop: Optional[Callable[[Any], None]] = None):
+        if not stages:
+            raise ValueError("Le graphe doit avoir au moins un étage")
+        self.stages = list(stages)
+        self.name = name
+        self._on_done = on_done
+        self._on_drop = on_drop
+        self._index = {stage.name: i for i, stage in enumerate(self.stages)}
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self.end_to_end = LatencyHistogram()
+
+        # Statistiques
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Démarre les threads des étages"""
+        if self._running:
+            return
+        self._running = True
+        self._threads = []
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop, args=(index,),
+                    name=f"{self.name}-{stage.name}-{worker}", daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Arrête les threads ; les éléments en attente sont abandonnés"""
+        if not self._running:
+            return
+        self._running = False
+        for stage in self.stages:
+            with stage._cond:
+                stage._cond.notify_all()
+        current = threading.current_thread()
+        threads, self._threads = self._threads, []
+        for thread in threads:
+            if thread is not current:
+                thread.join(timeout)
+        for stage in self.stages:
+            with stage._cond:
+                pending = list(stage._queue)
+                stage._queue.clear()
+            for _, (_, item) in pending:
+                self._drop(stage, item)
+
+    def submit(self, item, stage: Optional[str] = None) -> bool:
+        """Entre un élément dans le graphe (au premier étage, ou à l'étage nommé)"""
+        if not self._running:
+            self._drop(None, item)
+            return False
+        self.submitted += 1
+        self._forward(self._index[stage] if stage else 0, item, time.perf_counter())
+        return True
+
+    def _drop(self, stage: Optional[Stage], item):
+        if stage is not None:
+            stage.dropped += 1
+        self.dropped += 1
+        if self._on_drop is not None:
+            try:
+                self._on_drop(item)
+            except Exception:
+                logger.exception("Erreur dans le rappel on_drop")
+
+    def _forward(self, index: int, item, started: float):
+        """Exécute les étages en ligne à partir de `index` jusqu'au prochain étage à threads"""
+        while index < len(self.stages):
+            stage = self.stages[index]
+            if stage.workers > 0:
+                self._enqueue(stage, item, started)
+                return
+            item = self._run_stage(stage, item)
+            if item is None:
+                return
+            index += 1
+        self._finish(item, started)
+
+    def _enqueue(self, stage: Stage, item, started: float):
+        with stage._cond:
+            while len(stage._queue) >= stage.queue_size:
+                if stage.drop_oldest:
+                    _, old_item = stage._queue.popleft()[1]
+                    self._drop(stage, old_item)
+                    break
+                if not self._running:
+                    self._drop(stage, item)
+                    return
+                stage._cond.wait(0.1)
+            stage._queue.append((time.perf_counter(), (started, item)))
+            stage.max_depth = max(stage.max_depth, len(stage._queue))
+            stage._cond.notify_all()
+
+    def _run_stage(self, stage: Stage, item):
+        start = time.perf_counter()
+        try:
+            result = stage.func(item)
+        except Exception as e:
+            stage.errors += 1
+            logger.error(f"Erreur étage {stage.name} ({self.name}): {e}")
+            self._drop(stage, item)
+            return None
+        stage.record((time.perf_counter() - start) * 1000)
+        if result is None:
+            # Élément consommé par l'étage : il sort du graphe ici
+            self._finish(item, None)
+        return result
+
+    def _finish(self, item, started: Optional[float]):
+        if started is not None:
+            self.end_to_end.record((time.perf_counter() - started) * 1000)
+            self.completed += 1
+        if self._on_done is not None:
+            try:
+                self._on_done(item)
+            except Exception:
+                logger.exception("Erreur dans le rappel on_done")
+
+    def _worker_loop(self, index: int):
+        stage = self.stages[index]
+        while True:
+            with stage._cond:
+                while self._running and not stage._queue:
+                    stage._cond.wait()
+                if not self._running:
+                    return
+                queued_at, (started, item) = stage._queue.popleft()
+                stage.busy += 1
+                stage._cond.notify_all()
+            stage.wait.record((time.perf_counter() - queued_at) * 1000)
+            try:
+                result = self._run_stage(stage, item)
+                if result is not None:
+                    self._forward(index + 1, result, started)
+            finally:
+                with stage._cond:
+                    stage.busy -= 1
+
+    def bottleneck_seconds(self) -> Optional[float]:
+        """Coût moyen de l'étage le plus lent (s) : il fixe le débit du graphe"""
+        costs = [stage.avg_ms for stage in self.stages if stage.processed]
+        return max(costs) / 1000 if costs else None
+
+    def reset_stats(self):
+        """Remet à zéro histogrammes et compteurs (les files ne sont pas touchées)"""
+        self.end_to_end.reset()
+        self.submitted = self.completed = self.dropped = 0
+        for stage in self.stages:
+            stage.latency.reset()
+            stage.wait.reset()
+            stage.processed = stage.dropped = stage.errors = stage.max_depth = 0
+            stage.avg_ms = 0.0
+
+    def stats(self) -> dict:
+        """Histogrammes par étage, profondeurs de file et latence de bout en bout"""
+        bottleneck = max(
+            (stage for stage in self.stages if stage.processed),
+            key=lambda stage: stage.avg_ms, default=None,
+        )
+        return {
+            "name": self.name,
+            "running": self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "bottleneck": bottleneck.name if bottleneck is not None else None,
+            "end_to_end": self.end_to_end.snapshot(),
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+        }
@@ -0,0 +1,370 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows : un fichier ouvert ne peut pas être supprimé, ce qui suffit
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Niveau disque du magasin partagé : répertoire temporaire propre à chaque exécution,
+# supprimé à la fermeture ; ceux d'une exécution interrompue sont purgés après ce délai.
+# L'exécution garde un verrou sur STORE_LOCK_NAME : un répertoire verrouillé n'est jamais purgé
+STORE_DIRECTORY_PREFIX = "anip-images-"
+STORE_LOCK_NAME = ".lock"
+STALE_STORE_AGE_S = 24 * 3600
+
+
+class ImageStore:
+    """
+    Magasin d'images adressé par contenu, partagé par le scan, la
+    vérification et l'historique.
+
+    Chaque image est rangée une seule fois sous la clé SHA-256 (hex) de ses
+    octets : les écrans s'échangent des clés au lieu de copier des octets et
+    des chaînes base64. Deux niveaux : un LRU en mémoire borné à
+    `max_memory_bytes` (octets et base64 calculé à la demande) et un niveau
+    disque écrit à l'ajout (`directory`, borné à `max_disk_bytes`, les
+    fichiers les moins récemment lus partent en premier). Une image sortie
+    du LRU est relue du disque au besoin. Sans `directory`, le magasin reste
+    en mémoire. Les images (pièces d'identité, selfies) ne sont pas
+    chiffrées : `close` efface le niveau disque.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 max_memory_bytes: int = 32 << 20, max_disk_bytes: int = 512 << 20):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        # clé -> [octets, base64 ou None]
+        self._memory: "OrderedDict[str, list]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Statistiques
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.duplicates = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    # --- Écriture ---
+
+    def put(self, data: bytes) -> str:
+        """Range l'image (une seule fois pour un même contenu) et retourne sa clé"""
+        key = self.key_for(data)
+        with self._lock:
+            self.puts += 1
+            entry = self._memory.get(key)
+            if entry is not None:
+                self.duplicates += 1
+                self._memory.move_to_end(key)
+                return key
+            self._remember(key, [data, None])
+        self._write(key, data)
+        return key
+
+    def _write(self, key: str, data: bytes):
+        if not self.directory:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            # Remplacement atomique : un lecteur ne voit jamais de fichier partiel
+            os.replace(tmp, path)
+        except OSError as e:
+            self.disk_errors += 1
+            logger.warning(f"Écriture de l'image {key[:12]} impossible: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+        self._trim_disk()
+
+    # --- Lecture ---
+
+    def get(self, key: Optional[str]) -> Optional[bytes]:
+        """Octets de l'image, ou None si la clé est inconnue"""
+        entry = self._entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_base64(self, key: Optional[str]) -> Optional[str]:
+        """Image en base64 (calculée une fois, gardée avec l'entrée en mémoire)"""
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        if entry[1] is None:
+            encoded = base64.b64encode(entry[0]).decode("ascii")
+            with self._lock:
+                if entry[1] is None:
+                    entry[1] = encoded
+                    if key in self._memory:
+                        self._memory_bytes += len(encoded)
+                        self._evict_memory()
+        return entry[1]
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            if key in self._memory:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key))
+
+    def _entry(self, key: Optional[str]) -> Optional[list]:
+        if not key:
+            return None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._memory.move_to_end(key)
+                return entry
+        data = self._read(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = [data, None]
+                self._remember(key, entry)
+            return entry
+
+    def _read(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Date d'accès pour l'éviction du niveau disque
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.disk_errors += 1
+            logger.warning(f"Lecture de l'image {key[:12]} impossible: {e}")
+            return None
+        if self.key_for(data) != key:
+            logger.warning(f"Image {key[:12]} corrompue sur le disque, ignorée")
+            self.disk_errors += 1
+            return None
+        return data
+
+    # --- Éviction ---
+
+    def _remember(self, key: str, entry: list):
+        """Ajoute une entrée au LRU (verrou tenu)"""
+        self._memory[key] = entry
+        self._memory_bytes += self._entry_size(entry)
+        self._evict_memory()
+
+    @staticmethod
+    def _entry_size(entry: list) -> int:
+        return len(entry[0]) + (len(entry[1]) if entry[1] is not None else 0)
+
+    def _evict_memory(self):
+        # L'entrée la plus récente reste, même plus grosse que la limite
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            key, entry = self._memory.popitem(last=False)
+            self._memory_bytes -= self._entry_size(entry)
+            self.evictions += 1
+            if not self.directory:
+                logger.debug(f"Image {key[:12]} sortie du magasin (pas de niveau disque)")
+
+    def _scan_disk(self) -> list:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp") or name == STORE_LOCK_NAME:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _trim_disk(self):
+        with self._lock:
+            known = self._disk_bytes
+        if known is not None and known <= self.max_disk_bytes:
+            return
+        files = self._scan_disk()
+        total = sum(size for _, size, _ in files)
+        if total > self.max_disk_bytes:
+            for _, size, path in sorted(files):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.disk_evictions += 1
+                if total <= self.max_disk_bytes:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+    def discard(self, key: Optional[str]):
+        """Retire l'image des deux niveaux"""
+        if not key:
+            return
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= self._entry_size(entry)
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+                with self._lock:
+                    self._disk_bytes = None
+            except OSError:
+                pass
+
+    def close(self, remove_directory: bool = False):
+        """Vide le magasin ; avec `remove_directory`, supprime aussi le répertoire du niveau disque"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._disk_bytes = None
+        if remove_directory and self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> dict:
+        """Succès / échecs par niveau et occupation mémoire"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "puts": self.puts,
+                "duplicates": self.duplicates,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "evictions": self.evictions,
+                "disk_bytes": self._disk_bytes,
+                "disk_evictions": self.disk_evictions,
+                "disk_errors": self.disk_errors,
+            }
+
+
+_shared_store: Optional[ImageStore] = None
+_shared_store_lock = threading.Lock()
+# Fichier de verrou du répertoire du magasin partagé, ouvert pendant toute l'exécution
+_shared_store_owner: Optional[IO] = None
+
+
+def _lock_store_directory(directory: str) -> IO:
+    """Marque le répertoire comme utilisé par cette exécution (verrou libéré à sa fin, même brutale)"""
+    handle = open(os.path.join(directory, STORE_LOCK_NAME), "w")
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return handle
+
+
+def _store_in_use(directory: str) -> bool:
+    """Vrai si une exécution vivante tient le verrou du répertoire"""
+    lock_path = os.path.join(directory, STORE_LOCK_NAME)
+    if fcntl is not None:
+        try:
+            with open(lock_path, "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+    return False
+
+
+def _purge_stale_stores(root: str, max_age_s: float = STALE_STORE_AGE_S):
+    """Supprime les répertoires d'images laissés par une exécution interrompue"""
+    now = time.time()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(STORE_DIRECTORY_PREFIX):
+            continue
+        path = os.path.join(root, name)
+        try:
+            if now - os.stat(path).st_mtime < max_age_s:
+                continue
+        except OSError:
+            continue
+        if _store_in_use(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Répertoire d'images périmé supprimé: {path}")
+
+
+def get_image_store() -> ImageStore:
+    """
+    Magasin d'images partagé par toute l'application, avec un niveau disque
+    dans un répertoire temporaire privé (0700) propre à cette exécution.
+    """
+    global _shared_store, _shared_store_owner
+    with _shared_store_lock:
+        if _shared_store is None:
+            try:
+                _purge_stale_stores(tempfile.gettempdir())
+                directory = tempfile.mkdtemp(prefix=STORE_DIRECTORY_PREFIX)
+                _shared_store_owner = _lock_store_directory(directory)
+                _shared_store = ImageStore(directory)
+            except OSError as e:
+                # Répertoire inaccessible : magasin en mémoire seulement
+                logger.warning(f"Niveau disque du magasin d'images indisponible: {e}")
+                _shared_store = ImageStore(directory=None)
+        return _shared_store
+
+
+def close_image_store():
+    """Efface le magasin partagé et son répertoire (fin de l'exécution)"""
+    global _shared_store, _shared_store_owner
+    with _shared_store_lock:
+        if _shared_store_owner is not None:
+            _shared_store_owner.close()
+            _shared_store_owner = None
+        if _shared_store is not None:
+            _shared_store.close(remove_directory=True)
+            _shared_store = None
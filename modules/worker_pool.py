@@ -0,0 +1,293 @@
+import heapq
+import itertools
+import threading
+import time
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from modules.stage_graph import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Classes de priorité : la plus petite valeur passe en premier
+PRIORITY_INTERACTIVE = 0  # action de l'utilisateur en attente (capture, import)
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2   # analyse dont le résultat peut arriver plus tard ou se perdre
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_BACKGROUND: "background",
+}
+POOL_KINDS = ("thread", "process")
+
+
+class PoolFullError(RuntimeError):
+    """File d'attente pleine : la tâche n'a pas été acceptée"""
+
+
+@dataclass(frozen=True)
+class WorkerPoolConfig:
+    """Réglages du pool de traitement d'images"""
+    # "thread" : threads du processus de l'interface ; "process" : processus séparés (spawn)
+    kind: str = "thread"
+    workers: int = 2
+    # Tâches en attente au plus (au-delà : éviction de la moins prioritaire ou refus)
+    max_pending: int = 16
+
+
+DEFAULT_POOL_CONFIG = WorkerPoolConfig()
+
+
+class _Task:
+    __slots__ = ("priority", "order", "func", "args", "kwargs", "future", "group", "local", "queued_at")
+
+    def __init__(self, priority, order, func, args, kwargs, future, group, local):
+        self.priority = priority
+        self.order = order
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.group = group
+        self.local = local
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Task") -> bool:
+        return (self.priority, self.order) < (other.priority, other.order)
+
+
+class WorkerPool:
+    """
+    Pool borné partagé pour le traitement d'images lourd (OpenCV, Pillow).
+
+    Les tâches attendent dans une file à priorités (`PRIORITY_INTERACTIVE`
+    avant `PRIORITY_BACKGROUND`, ordre d'arrivée ensuite) consommée par
+    `workers` threads. Variante "process" : ces threads transmettent les
+    tâches à un ProcessPoolExecutor (fonction et arguments picklables) ;
+    une tâche soumise avec `local=True` (méthode liée à un état du
+    processus de l'interface) s'exécute dans le thread lui-même.
+
+    File pleine : la tâche en attente la moins prioritaire (la plus ancienne
+    à priorité égale) est annulée pour faire place, sauf si elle est plus
+    prioritaire que la nouvelle ou interactive : la nouvelle est alors
+    refusée (PoolFullError dans son Future). Les tâches portent un `group`
+    (l'écran qui les soumet) : `cancel_group` annule celles qui n'ont pas
+    encore démarré.
+    """
+
+    def __init__(self, config: Optional[WorkerPoolConfig] = None, name: str = "vision"):
+        self.config = config or DEFAULT_POOL_CONFIG
+        if self.config.kind not in POOL_KINDS:
+            raise ValueError(f"Type de pool inconnu : {self.config.kind} (attendu : {', '.join(POOL_KINDS)})")
+        if self.config.workers < 1 or self.config.max_pending < 1:
+            raise ValueError("workers et max_pending doivent être >= 1")
+        self.name = name
+        self._heap: List[_Task] = []
+        self._cond = threading.Condition()
+        self._order = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running = False
+        self.wait = {priority: LatencyHistogram() for priority in PRIORITY_NAMES}
+        self.run = {priority: LatencyHistogram() for priority in PRIORITY_NAMES}
+
+        # Statistiques
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.evicted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.busy = 0
+
+    @property
+    def kind(self) -> str:
+        return self.config.kind
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def start(self):
+        """Démarre les threads (et les processus) du pool"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            if self.config.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.config.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._threads = []
+            for index in range(self.config.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-pool-{index}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def shutdown(self, timeout: float = 2.0):
+        """Annule les tâches en attente et arrête le pool (les tâches en cours se terminent)"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            pending, self._heap = self._heap, []
+            self._cond.notify_all()
+        for task in pending:
+            self._cancel(task)
+        current = threading.current_thread()
+        threads, self._threads = self._threads, []
+        for thread in threads:
+            if thread is not current:
+                thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, func: Callable, *args, priority: int = PRIORITY_NORMAL, group: Any = None,
+               local: bool = False, **kwargs) -> Future:
+        """
+        Met une tâche en file ; retourne son Future. Démarre le pool au
+        premier appel. `local` : toujours exécutée dans un thread du
+        processus courant, même pour un pool "process".
+        """
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Priorité inconnue : {priority}")
+        if not self._running:
+            self.start()
+        future = Future()
+        task = _Task(priority, next(self._order), func, args, kwargs, future, group, local)
+        evicted = None
+        with self._cond:
+            self.submitted += 1
+            if len(self._heap) >= self.config.max_pending:
+                worst = max(self._heap)
+                if worst.priority < priority or worst.priority == PRIORITY_INTERACTIVE:
+                    self.rejected += 1
+                    future.set_exception(PoolFullError(
+                        f"Pool {self.name} saturé ({len(self._heap)} tâches en attente)"))
+                    return future
+                # Plus ancienne des tâches de la classe la moins prioritaire
+                evicted = min(t for t in self._heap if t.priority == worst.priority)
+                self._heap.remove(evicted)
+                heapq.heapify(self._heap)
+                self.evicted += 1
+            heapq.heappush(self._heap, task)
+            self.max_depth = max(self.max_depth, len(self._heap))
+            self._cond.notify()
+        if evicted is not None:
+            self._cancel(evicted)
+        return future
+
+    def cancel_group(self, group: Any) -> int:
+        """Annule les tâches en attente du groupe ; retourne leur nombre"""
+        with self._cond:
+            cancelled = [task for task in self._heap if task.group is group]
+            if cancelled:
+                self._heap = [task for task in self._heap if task.group is not group]
+                heapq.heapify(self._heap)
+        for task in cancelled:
+            self._cancel(task)
+        return len(cancelled)
+
+    def _cancel(self, task: _Task):
+        if task.future.cancel():
+            with self._cond:
+                self.cancelled += 1
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                task = heapq.heappop(self._heap)
+                self.busy += 1
+            try:
+                self._run(task)
+            finally:
+                with self._cond:
+                    self.busy -= 1
+
+    def _run(self, task: _Task):
+        if not task.future.set_running_or_notify_cancel():
+            return
+        started = time.perf_counter()
+        self.wait[task.priority].record((started - task.queued_at) * 1000)
+        try:
+            if self._executor is not None and not task.local:
+                result = self._executor.submit(task.func, *task.args, **task.kwargs).result()
+            else:
+                result = task.func(*task.args, **task.kwargs)
+        except BaseException as e:
+            with self._cond:
+                self.errors += 1
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+        finally:
+            self.run[task.priority].record((time.perf_counter() - started) * 1000)
+            with self._cond:
+                self.completed += 1
+
+    def stats(self) -> dict:
+        """Profondeur de file par priorité, compteurs et histogrammes d'attente / d'exécution"""
+        with self._cond:
+            depth_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+            for task in self._heap:
+                depth_by_priority[PRIORITY_NAMES[task.priority]] += 1
+            stats = {
+                "name": self.name,
+                "kind": self.config.kind,
+                "workers": self.config.workers,
+                "running": self._running,
+                "depth": len(self._heap),
+                "max_depth": self.max_depth,
+                "max_pending": self.config.max_pending,
+                "depth_by_priority": depth_by_priority,
+                "busy": self.busy,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "evicted": self.evicted,
+                "rejected": self.rejected,
+                "errors": self.errors,
+            }
+        stats["queue_wait"] = {PRIORITY_NAMES[p]: h.snapshot() for p, h in self.wait.items()}
+        stats["run"] = {PRIORITY_NAMES[p]: h.snapshot() for p, h in self.run.items()}
+        return stats
+
+
+_shared_pool: Optional[WorkerPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_worker_pool(config: Optional[WorkerPoolConfig] = None) -> WorkerPool:
+    """
+    Pool partagé par les écrans. Créé au premier appel avec `config` ; un
+    appel suivant avec une configuration différente remplace le pool (les
+    tâches en attente de l'ancien sont annulées).
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None or (config is not None and config != _shared_pool.config):
+            if _shared_pool is not None:
+                _shared_pool.shutdown()
+            _shared_pool = WorkerPool(config)
+        return _shared_pool
+
+
+def shutdown_worker_pool():
+    """Arrête le pool partagé (fermeture de l'application)"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is not None:
+            _shared_pool.shutdown()
+            _shared_pool = None
@@ -464,6 +464,7 @@ class HistoryScreen:
         """Construit le contenu détaillé d'une vérification"""
         return ft.Column(
             controls=[
+                self._build_entry_images(item),
                 ft.DataTable(
                     columns=[
                         ft.DataColumn(ft.Text("Champ", weight=ft.FontWeight.BOLD)),
@@ -499,10 +500,25 @@ class HistoryScreen:
             scroll=ft.ScrollMode.ADAPTIVE
         )
 
+    def _build_entry_images(self, item):
+        """Miniatures du document et du selfie de l'entrée, tant qu'ils sont dans le magasin"""
+        document_b64, selfie_b64 = self.get_entry_images(item)
+        thumbnails = [
+            ft.Image(src_base64=image_b64, width=120, height=90, fit=ft.ImageFit.CONTAIN, border_radius=8)
+            for image_b64 in (document_b64, selfie_b64) if image_b64
+        ]
+        if not thumbnails:
+            return ft.Text("Images non disponibles", size=12, color=ft.Colors.GREY_500)
+        return ft.Row(thumbnails, spacing=10)
+
     def _replay_verification(self, item):
-        """Relance une vérification à partir de l'historique"""
+        """Relance une vérification à partir de l'historique (avec ses images si elles sont encore disponibles)"""
+        if self.replay_entry(item):
+            message = "🔍 Images rechargées : lancez la re-vérification"
+        else:
+            message = "🔍 Images non disponibles : refaites le scan du document et du selfie"
         show_snack_bar = ft.SnackBar(
-                ft.Text("🔍 Préparation de la re-vérification..."),
+                ft.Text(message),
                 open=True
             )
         self.app.page.open(show_snack_bar)
@@ -515,6 +531,7 @@ class HistoryScreen:
         def confirm_delete(e):
             self.history_data.remove(item)
             self._filtered_data.remove(item)
+            self._release_images([item])
             self._save_history_data()
             self.dialog.open = False
             self.app.page.update()
@@ -537,7 +554,9 @@ class HistoryScreen:
     def _show_clear_confirmation(self, e):
         """Affiche la confirmation pour effacer tout l'historique"""
         def confirm_clear(e):
+            removed = list(self.history_data)
             self.history_data.clear()
+            self._release_images(removed)
             self._filtered_data.clear()
             self._save_history_data()
             self.dialog.open = False
@@ -618,20 +637,45 @@ class HistoryScreen:
             }
         ]
 
+    def get_entry_images(self, item):
+        """Document et selfie d'une entrée en base64 (None si absents du magasin)"""
+        return self.app.images.get_base64(item.get('document_image')), self.app.images.get_base64(item.get('selfie_image'))
+
+    def _release_images(self, removed):
+        """Retire du magasin les images des entrées supprimées que plus rien ne référence"""
+        in_use = {self.app.scanned_document_key, self.app.scanned_selfie_key}
+        for entry in self.history_data:
+            in_use.update((entry.get('document_image'), entry.get('selfie_image')))
+        for entry in removed:
+            for key in (entry.get('document_image'), entry.get('selfie_image')):
+                if key and key not in in_use:
+                    self.app.images.discard(key)
+
+    def replay_entry(self, item):
+        """Recharge les images d'une entrée comme scans en cours ; False si elles ne sont plus disponibles"""
+        document_key, selfie_key = item.get('document_image'), item.get('selfie_image')
+        if document_key not in self.app.images or selfie_key not in self.app.images:
+            return False
+        self.app.scanned_document_key = document_key
+        self.app.scanned_selfie_key = selfie_key
+        return True
+
     def _save_history_data(self):
         """Sauvegarde les données d'historique"""
         # En production, sauvegarder dans une base de données
         pass
 
-    def add_verification_result(self, result_data):
-        """Ajoute un nouveau résultat à l'historique"""
+    def add_verification_result(self, result_data, document_key=None, selfie_key=None):
+        """Ajoute un nouveau résultat à l'historique (avec les clés de ses images)"""
         new_entry = {
             'success': result_data.get('data', {}).get('verdict') == 'IDENTITY_CONFIRMED',
             'score': result_data.get('data', {}).get('confidence_score', 0),
             'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'timestamp': datetime.now().timestamp(),
             'document_type': result_data.get('data', {}).get('ocr_extraction', {}).get('document_type', 'Inconnu'),
-            'duration': 'N/A'  # À calculer lors de la vérification
+            'duration': 'N/A',  # À calculer lors de la vérification
+            'document_image': document_key,
+            'selfie_image': selfie_key,
         }
         
         self.history_data.insert(0, new_entry)  # Ajouter au début
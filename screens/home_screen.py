@@ -125,8 +125,7 @@ class HomeScreen:
 
     def _build_scan_status(self):
         """Affiche l'état actuel des scans"""
-        document_ready = hasattr(self.app, 'scanned_document_data') and self.app.scanned_document_data
-        selfie_ready = hasattr(self.app, 'scanned_selfie_data') and self.app.scanned_selfie_data
+        document_ready, selfie_ready = self.app.has_scanned_data()
         
         return ft.Container(
             content=ft.Card(
@@ -294,8 +293,7 @@ class HomeScreen:
 
     def _build_action_card(self, title, description, action, color, icon, is_primary=False):
         """Construit une carte d'action moderne"""
-        document_ready = hasattr(self.app, 'scanned_document_data') and self.app.scanned_document_data
-        selfie_ready = hasattr(self.app, 'scanned_selfie_data') and self.app.scanned_selfie_data
+        document_ready, selfie_ready = self.app.has_scanned_data()
         
         # Vérifier si l'action est disponible
         if action == "verify_identity" and not (document_ready and selfie_ready):
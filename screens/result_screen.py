@@ -586,8 +586,7 @@ class ResultScreen:
     # Gestion des événements
     def _return_to_home(self, e=None):
         """Retour à l'accueil"""
-        self.app.scanned_document_data = None
-        self.app.scanned_selfie_data = None
+        self.app.clear_scanned_data()
         self.app.verification_result = None
         self.app.navigate_to("home")
 
@@ -597,7 +596,10 @@ class ResultScreen:
             'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'success': self._verdict == 'IDENTITY_CONFIRMED',
             'score': self._confidence_score,
-            'document_type': self._result_data.get('ocr_extraction', {}).get('document_type', 'Inconnu')
+            'document_type': self._result_data.get('ocr_extraction', {}).get('document_type', 'Inconnu'),
+            # Clés du magasin d'images : l'entrée peut être rejouée
+            'document_image': self.app.scanned_document_key,
+            'selfie_image': self.app.scanned_selfie_key,
         }
         
         # Ajouter à l'historique
@@ -606,8 +608,7 @@ class ResultScreen:
         self.app.history_screen.history_data.append(result_entry)
         
         # Nettoyer les données temporaires
-        self.app.scanned_document_data = None
-        self.app.scanned_selfie_data = None
+        self.app.clear_scanned_data()
         
         # Notification
         show_snack_bar = ft.SnackBar(
@@ -1,34 +1,96 @@
 import flet as ft
-import base64
-from io import BytesIO
-from PIL import Image
-import cv2
-import numpy as np
+import os
 import threading
 import logging
-import time
 
 from modules.api_client import APIClient
+from modules.camera_module import CameraMode, CameraSessionManager, NativeCameraSource, DEFAULT_CAMERA_LABELS
+from modules.frame_quality import QualityThresholds
+from modules.preview_session import PreviewSession
+from modules.scan_pipeline import PipelineOptions, ScanPipeline
+from modules.capture_process import CaptureProcess, scores_from_meta
+from modules.image_encoder import preprocess_upload
+from modules.bulk_import import BulkImporter, VerificationQueue, preprocess_file
+from modules.worker_pool import PRIORITY_INTERACTIVE, PoolFullError, WorkerPool, WorkerPoolConfig, get_worker_pool
 
 class ScanScreen:
+    # Taille d'affichage de la prévisualisation et limites de l'image envoyée à l'API
+    PREVIEW_SIZE = (340, 440)
+    UPLOAD_MAX_SIZE = (1200, 1600)
+    UPLOAD_JPEG_QUALITY = 85
+    # JPEG déjà dans les limites et sous ce poids : envoyé tel quel, sans réencodage
+    UPLOAD_MAX_BYTES = 1 << 20
+    # Poids visé de l'image envoyée par type de scan (liaisons 3G : selfie plus léger)
+    UPLOAD_BYTE_BUDGETS = {"document": 350_000, "selfie": 120_000}
+    # Mode demandé aux caméras OpenCV (négocié une fois par périphérique)
+    CAMERA_MODE = CameraMode(width=1280, height=720, fps=30, fourcc="MJPG")
+    # Capture « meilleure de N » : frames brutes conservées et fenêtre de sélection
+    BURST_FRAMES = 8
+    BURST_WINDOW_S = 1.0
+    # Capture automatique : seuils de qualité par type de scan et durée de maintien
+    QUALITY_THRESHOLDS = {
+        "document": QualityThresholds(),
+        "selfie": QualityThresholds(min_sharpness=40.0, max_glare=0.05, max_motion=6.0),
+    }
+    AUTO_CAPTURE_HOLD_S = 0.8
+    # Détection complète du document toutes les N frames, suivi des coins entre les deux
+    DOCUMENT_REDETECT_EVERY = 15
+    # Détection du visage (mode selfie) une frame sur N, dernière boîte reprise entre les deux
+    FACE_DETECT_EVERY = 5
+    # Pool partagé pour le travail d'image lourd (import, capture, détection de fond)
+    WORKER_POOL = WorkerPoolConfig(kind="thread", workers=2, max_pending=16)
+    # Import groupé (back-office) : un processus par cœur, fichiers appariés par nom
+    BULK_IMPORT_POOL = WorkerPoolConfig(kind="process", workers=os.cpu_count() or 2, max_pending=64)
+
     def __init__(self, app):
         self.app = app
         self.scan_type = "document"  # "document" or "selfie"
-        self.captured_image = None
+        # Clé de l'image capturée dans le magasin partagé (octets et base64 y sont gardés)
+        self.captured_key = None
         self.api_client = APIClient()
         
         # Gestion de la prévisualisation
         self._preview_running = False
-        self._preview_thread = None
-        self._preview_frame_bytes = None
-        self._preview_image_base64 = None
-        self._preview_lock = threading.Lock()
+        self._preview_session = None
+        self.auto_capture_enabled = True
+        # Recadrage redressé du document (mode document) ou autour du visage (mode selfie)
+        self.document_crop_enabled = True
+        self.face_crop_enabled = True
+        # Amélioration désactivée : JPEG de la caméra en pass-through, sans décodage ni réencodage
+        self.enhancement_enabled = True
+        # Tâches lourdes hors du thread de l'interface ; groupe = cet écran (annulées en le quittant)
+        self._worker_pool = get_worker_pool(self.WORKER_POOL)
+        self._pool_generation = 0
+        # Traitement des frames (qualité, document / visage, amélioration, encodage)
+        self._pipeline = ScanPipeline(
+            self._pipeline_options(), on_auto_capture=self._on_auto_capture,
+            worker_pool=self._worker_pool, pool_group=self,
+        )
+        self._frame_buffer = self._pipeline.frame_buffer
+        self._last_quality = None
+        self._auto_progress = 0.0
+        self._capture_lock = threading.Lock()
+        # Étages prepare → analyze → encode → deliver, chacun sur son thread (False : en série)
+        self.pipelined_preview = True
+        self._preview_graph = None
         self._preview_opened_by_user = False
+        # Capture dans un processus séparé (mémoire partagée) : libère le GIL de l'interface
+        self.capture_in_process = False
+        self._capture_process = None
         
         # Configuration caméra
         self.use_native_camera = False
         self.camera_index = 0  # 0 = arrière par défaut, 1 = avant
-        self.available_cameras = {0: "📷 Caméra arrière", 1: "🤳 Caméra avant"}
+        # Source alternative (fichier, dossier d'images, "synthetic") pour les tests sans caméra
+        self.camera_source_spec = None
+        self.available_cameras = dict(DEFAULT_CAMERA_LABELS)
+        self._camera_sessions = CameraSessionManager(mode=self.CAMERA_MODE)
+        # Sondage des périphériques dans le pool (ouvrir une caméra absente peut prendre des secondes) ;
+        # la prévisualisation demandée pendant le sondage s'ouvre à sa fin (un seul VideoCapture par caméra)
+        self._camera_probe = None
+        self._open_preview_after_probe = False
+        # Frames de la caméra native, traitées par la même boucle que les sources OpenCV
+        self._native_source = NativeCameraSource()
         self.image_widget = None
         
         # Contrôles UI
@@ -43,15 +105,25 @@ class ScanScreen:
         self._take_photo_button = None
         self._use_button = None
         self._camera_selector = None
+        self._camera_selector_container = None
+        self._status_icon = None
+        self._status_text = None
+        self._bulk_progress = ft.ProgressBar(value=0, visible=False)
+        self._bulk_status = ft.Text("", size=12, color=ft.Colors.GREY_600, visible=False)
+        self._bulk_cancel_button = ft.TextButton(
+            "Annuler", icon=ft.Icons.CANCEL, on_click=self._cancel_bulk_import, visible=False)
+
+        # Import groupé : pool dédié (créé au premier import) et file de vérification des paires,
+        # arrêtés par close() à la fermeture de l'application
+        self._bulk_pool = None
+        self._bulk_importer = None
+        self._verification_queue = None
         
-        # Données d'image
-        self._last_captured_bytes = None
 
     def set_scan_type(self, scan_type: str):
         """Définit le type de scan (document ou selfie)"""
         self.scan_type = scan_type
-        self.captured_image = None
-        self._last_captured_bytes = None
+        self.captured_key = None
         self._reset_preview_state()
 
     def build(self):
@@ -110,8 +182,75 @@ class ScanScreen:
             expand=True
         )
 
+    def _refresh_available_cameras(self):
+        """
+        Lance le sondage des caméras dans le pool (une seule fois, résultat
+        mis en cache) ; le sélecteur est mis à jour à la fin du sondage.
+        """
+        if self.use_native_camera or self.camera_source_spec is not None:
+            return
+        if self._camera_probe is not None:
+            return
+        # local : les périphériques sont ouverts dans le processus de l'interface
+        self._camera_probe = self._worker_pool.submit(
+            self._camera_sessions.available_cameras, group=self._camera_sessions, local=True)
+        self._camera_probe.add_done_callback(self._on_cameras_probed)
+
+    def _camera_probe_pending(self) -> bool:
+        return self._camera_probe is not None and not self._camera_probe.done()
+
+    def _on_cameras_probed(self, future):
+        """Fin du sondage des caméras (thread du pool) : suite sur le thread de l'interface"""
+        self._run_on_ui(self._apply_camera_probe, future)
+
+    def _apply_camera_probe(self, future):
+        detected = None
+        if future.cancelled():
+            self._camera_probe = None
+        elif future.exception() is not None:
+            # PoolFullError compris : nouvel essai au prochain affichage de l'écran
+            logging.error(f"Erreur détection caméras: {future.exception()}")
+            self._camera_probe = None
+        elif not self.use_native_camera and self.camera_source_spec is None:
+            detected = future.result()
+        if detected:
+            self.available_cameras = detected
+            if self.camera_index not in detected:
+                self.camera_index = next(iter(detected))
+            self._update_camera_selector()
+        if self._open_preview_after_probe:
+            self._open_preview_after_probe = False
+            self._open_preview()
+
+    def _run_on_ui(self, func, *args):
+        """Exécute `func` sur la boucle de l'interface (call_from_async installé par main), sinon directement"""
+        call_from_async = getattr(self.app.page, "call_from_async", None)
+        if call_from_async is None:
+            func(*args)
+        else:
+            call_from_async(func, *args)
+
+    def _update_camera_selector(self):
+        if self._camera_selector is None:
+            return
+        self._camera_selector.options = [
+            ft.dropdown.Option(str(idx), text=label)
+            for idx, label in self.available_cameras.items()
+        ]
+        self._camera_selector.value = str(self.camera_index)
+        visible = len(self.available_cameras) > 1
+        self._camera_selector.visible = visible
+        if self._camera_selector_container is not None:
+            self._camera_selector_container.visible = visible
+        try:
+            self.app.page.update()
+        except Exception:
+            pass
+
     def _initialize_controls(self):
         """Initialise les contrôles interactifs"""
+        self._refresh_available_cameras()
+
         # Bouton de capture photo
         self._take_photo_button = ft.ElevatedButton(
             "📷 Ouvrir caméra",
@@ -186,11 +325,12 @@ class ScanScreen:
 
     def _build_camera_selector(self):
         """Construit le sélecteur de caméra"""
-        return ft.Container(
+        self._camera_selector_container = ft.Container(
             content=self._camera_selector,
             padding=ft.padding.symmetric(horizontal=20),
             visible=len(self.available_cameras) > 1
         )
+        return self._camera_selector_container
 
     def _build_controls_section(self):
         """Construit la section des contrôles"""
@@ -223,7 +363,19 @@ class ScanScreen:
                         on_click=self._show_capture_tips,
                         expand=True
                     )
-                ], spacing=15)
+                ], spacing=15),
+
+                ft.Row([
+                    ft.ElevatedButton(
+                        "📚 Import groupé",
+                        icon=ft.Icons.DRIVE_FOLDER_UPLOAD,
+                        on_click=self._pick_files_bulk,
+                        expand=True
+                    ),
+                    self._bulk_cancel_button
+                ], spacing=15),
+                self._bulk_progress,
+                self._bulk_status
             ], spacing=10),
             padding=10
         )
@@ -245,22 +397,50 @@ class ScanScreen:
 
     def _build_status_indicator(self):
         """Construit l'indicateur de statut"""
+        self._status_icon = ft.Icon(
+            ft.Icons.CIRCLE,
+            color=ft.Colors.RED if not self.captured_key else ft.Colors.GREEN,
+            size=12
+        )
+        self._status_text = ft.Text(
+            "Prêt à capturer" if not self.captured_key else "Image capturée",
+            size=12,
+            color=ft.Colors.GREY_600
+        )
         return ft.Container(
             content=ft.Row([
-                ft.Icon(
-                    ft.Icons.CIRCLE,
-                    color=ft.Colors.RED if not self.captured_image else ft.Colors.GREEN,
-                    size=12
-                ),
-                ft.Text(
-                    "Prêt à capturer" if not self.captured_image else "Image capturée",
-                    size=12,
-                    color=ft.Colors.GREY_600
-                )
+                self._status_icon,
+                self._status_text
             ], alignment=ft.MainAxisAlignment.CENTER),
             padding=5
         )
 
+    def _set_status(self, ok: bool, message: str, warning: bool = False):
+        """Met à jour l'indicateur de statut (sans rafraîchir la page)"""
+        if self._status_icon is None or self._status_text is None:
+            return
+        self._status_icon.color = ft.Colors.GREEN if ok else (ft.Colors.ORANGE if warning else ft.Colors.RED)
+        self._status_text.value = message
+
+    def _update_quality_status(self):
+        """Affiche les scores de qualité de la dernière frame dans l'indicateur de statut"""
+        scores = self._last_quality
+        if scores is None:
+            return
+        def mark(ok):
+            return "✓" if ok else "✗"
+
+        motion = "—" if scores.motion == float("inf") else f"{scores.motion:.1f}"
+        message = (
+            f"Netteté {scores.sharpness:.0f} {mark(scores.sharp_ok)} · "
+            f"Exposition {scores.brightness:.0f} {mark(scores.exposure_ok)} · "
+            f"Reflets {scores.glare * 100:.1f}% {mark(scores.glare_ok)} · "
+            f"Stabilité {motion} {mark(scores.stable_ok)}"
+        )
+        if self.auto_capture_enabled and scores.acceptable:
+            message += f" · Capture auto {self._auto_progress * 100:.0f}%"
+        self._set_status(scores.acceptable, message, warning=not scores.acceptable)
+
     def _set_preview_placeholder(self):
         """Affiche le placeholder dans le conteneur de prévisualisation"""
         icon = ft.Icons.DOCUMENT_SCANNER if self.scan_type == "document" else ft.Icons.FACE
@@ -284,8 +464,8 @@ class ScanScreen:
             if self.image_widget is None:
                 self.image_widget = ft.Image(
                     src_base64=base64_str,
-                    width=340,
-                    height=440,
+                    width=self.PREVIEW_SIZE[0],
+                    height=self.PREVIEW_SIZE[1],
                     fit=ft.ImageFit.CONTAIN,
                     border_radius=10
                 )
@@ -319,18 +499,26 @@ class ScanScreen:
                 self.camera_index = new_index
                 logging.info(f"Caméra changée: {self.available_cameras.get(new_index, new_index)}")
 
-                # Redémarrer la prévisualisation si active
-                if self._preview_running:
-                    self.stop_camera_preview()
-                    time.sleep(0.5)  # Pause courte
-                    self.start_camera_preview()
-                    
+                # Bascule appliquée par la boucle de capture en cours, sans la redémarrer
+                if self.use_native_camera:
+                    if self._preview_running:
+                        self._stop_native_camera()
+                        self._start_native_camera()
+                elif self._preview_session is not None:
+                    self._preview_session.request_switch(new_index)
+                elif self._capture_process is not None:
+                    self._capture_process.request_switch(new_index)
+
         except Exception as ex:
             logging.error(f"Erreur changement caméra: {ex}")
             self._show_snackbar("❌ Erreur changement caméra")
 
     def _on_back(self, e):
         """Gère le retour à l'écran précédent"""
+        # Tâches en attente annulées ; les résultats des tâches déjà en cours seront ignorés
+        self._pool_generation += 1
+        self._open_preview_after_probe = False
+        self._worker_pool.cancel_group(self)
         try:
             self.stop_camera_preview()
         except Exception:
@@ -341,125 +529,238 @@ class ScanScreen:
         """Gère la capture de photo"""
         self._show_snackbar("📷 Préparation de la capture...")
         
-        # Premier clic : ouvrir la prévisualisation
+        # Premier clic : ouvrir la prévisualisation (à la fin du sondage des caméras s'il tourne encore)
         if not self._preview_running:
-            try:
-                self.start_camera_preview()
-                self._preview_opened_by_user = True
-                self._take_photo_button.text = "📸 Capturer maintenant"
-                self.app.page.update()
-                return
-            except Exception as ex:
-                logging.error(f"Erreur démarrage caméra: {ex}")
-                self._show_snackbar("❌ Impossible d'ouvrir la caméra")
+            if self._camera_probe_pending() and not self.use_native_camera and self.camera_source_spec is None:
+                self._open_preview_after_probe = True
+                self._show_snackbar("🔍 Recherche des caméras...")
                 return
+            self._open_preview()
+            return
 
         # Deuxième clic : capturer l'image
+        self._submit_capture()
+
+    def _open_preview(self):
         try:
-            with self._preview_lock:
-                frame_bytes = self._preview_frame_bytes
+            self.start_camera_preview()
+            self._preview_opened_by_user = True
+            self._take_photo_button.text = "📸 Capturer maintenant"
+            self.app.page.update()
+        except Exception as ex:
+            logging.error(f"Erreur démarrage caméra: {ex}")
+            self._show_snackbar("❌ Impossible d'ouvrir la caméra")
 
-            if frame_bytes:
-                processed_image = self._preprocess_image(frame_bytes)
-                self.captured_image = base64.b64encode(processed_image).decode('utf-8')
-                self._last_captured_bytes = processed_image
-                
-                # Mettre à jour l'interface
-                self._update_preview_with_image(self.captured_image)
-                self._use_button.disabled = False
-                
-                # Arrêter la prévisualisation si ouverte par l'utilisateur
-                if self._preview_opened_by_user:
-                    self.stop_camera_preview()
-                    self._preview_opened_by_user = False
-                    self._take_photo_button.text = "📷 Ouvrir caméra"
-                
-                self._show_snackbar("✅ Photo capturée avec succès!")
-                
-                # Envoyer à l'API en arrière-plan
-                # self._send_to_api_background(processed_image)
-                
+    def _submit_capture(self, auto: bool = False):
+        """Capture dans le pool, en priorité interactive (devant l'analyse de fond)"""
+        future = self._worker_pool.submit(
+            self._capture_current_frame, auto=auto,
+            priority=PRIORITY_INTERACTIVE, group=self, local=True,
+        )
+        future.add_done_callback(self._on_capture_done)
+
+    def _on_capture_done(self, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        logging.error(f"Erreur capture photo: {future.exception()}")
+        self._show_snackbar("❌ Erreur lors de la capture")
+
+    def _capture_current_frame(self, auto: bool = False):
+        """Capture la meilleure frame récente (clic utilisateur ou capture automatique)"""
+        if not self._capture_lock.acquire(blocking=False):
+            return
+        try:
+            # Frame pleine résolution la plus nette de la dernière seconde (encodée dans le
+            # processus de capture s'il est actif), sinon la frame de prévisualisation (caméra native)
+            if self._capture_process is not None:
+                processed_image = self._capture_process.capture()
             else:
-                self._show_snackbar("❌ Aucune image disponible")
-                
+                processed_image = self._pipeline.capture_jpeg()
+            if processed_image is None:
+                frame_bytes = self._frame_buffer.latest_jpeg()
+                processed_image = self._preprocess_image(frame_bytes) if frame_bytes else None
+            self._apply_captured_image(processed_image, auto)
         except Exception as ex:
             logging.error(f"Erreur capture photo: {ex}")
             self._show_snackbar("❌ Erreur lors de la capture")
+        finally:
+            self._capture_lock.release()
+
+    def _apply_captured_image(self, processed_image, auto: bool = False):
+        """Affiche et retient l'image capturée"""
+        if not processed_image:
+            self._show_snackbar("❌ Aucune image disponible")
+            return
+
+        self.captured_key = self.app.images.put(processed_image)
+
+        # Mettre à jour l'interface
+        self._update_preview_with_image(self.app.images.get_base64(self.captured_key))
+        self._use_button.disabled = False
+
+        # Arrêter la prévisualisation si ouverte par l'utilisateur
+        if self._preview_opened_by_user:
+            self.stop_camera_preview()
+            self._preview_opened_by_user = False
+            self._take_photo_button.text = "📷 Ouvrir caméra"
+
+        self._set_status(True, "Image capturée automatiquement" if auto else "Image capturée")
+        self._show_snackbar("✅ Capture automatique réussie!" if auto else "✅ Photo capturée avec succès!")
+
+        # Envoyer à l'API en arrière-plan
+        # self._send_to_api_background(processed_image)
+
+    def _pipeline_options(self) -> PipelineOptions:
+        """Réglages du pipeline pour le type de scan courant"""
+        return PipelineOptions(
+            scan_type=self.scan_type,
+            preview_size=self.PREVIEW_SIZE,
+            upload_max_size=self.UPLOAD_MAX_SIZE,
+            upload_jpeg_quality=self.UPLOAD_JPEG_QUALITY,
+            upload_byte_budget=self.UPLOAD_BYTE_BUDGETS.get(self.scan_type),
+            burst_frames=self.BURST_FRAMES,
+            burst_window_s=self.BURST_WINDOW_S,
+            quality_thresholds=self.QUALITY_THRESHOLDS.get(self.scan_type, QualityThresholds()),
+            auto_capture_hold_s=self.AUTO_CAPTURE_HOLD_S,
+            document_redetect_every=self.DOCUMENT_REDETECT_EVERY,
+            face_detect_every=self.FACE_DETECT_EVERY,
+            auto_capture_enabled=self.auto_capture_enabled,
+            document_crop_enabled=self.document_crop_enabled,
+            face_crop_enabled=self.face_crop_enabled,
+            enhance_enabled=self.enhancement_enabled,
+        )
 
     def start_camera_preview(self):
         """Démarre la prévisualisation caméra"""
         if self._preview_running:
             return
             
+        self._preview_running = True
+        self._pipeline.reset(self._pipeline_options())
+        self._last_quality = None
+        self._auto_progress = 0.0
+        self._preview_graph = self._pipeline.build_stage_graph(
+            self._deliver_preview_job, threaded=self.pipelined_preview)
+        self._preview_graph.start()
+        self._camera_sessions.passthrough = not self.enhancement_enabled
+
         if self.use_native_camera:
-            return self._start_native_camera()
+            # Les frames poussées par push_native_frame alimentent la session comme une caméra OpenCV
+            source_spec = self._native_source
+            self._start_native_camera()
+        else:
+            source_spec = self.camera_source_spec if self.camera_source_spec is not None else self.camera_index
+            if self.capture_in_process:
+                return self._start_capture_process(source_spec)
 
-        self._preview_running = True
+        self._preview_session = PreviewSession(
+            source_spec,
+            self._process_preview_frame,
+            camera_sessions=self._camera_sessions,
+            scheduler=self._pipeline.scheduler,
+            on_error=self._on_preview_error,
+            cost_probe=self._preview_graph.bottleneck_seconds,
+        )
+        self._preview_session.start()
 
-        def preview_loop():
-            cap = None
-            try:
-                cap = cv2.VideoCapture(self.camera_index)
-                if not cap.isOpened():
-                    raise RuntimeError("Caméra non disponible")
-
-                while self._preview_running:
-                    ret, frame = cap.read()
-                    if not ret:
-                        continue
-
-                    # Traitement de l'image
-                    frame = self._enhance_frame(frame)
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Conversion en JPEG
-                    pil_image = Image.fromarray(frame_rgb)
-                    buffer = BytesIO()
-                    pil_image.save(buffer, format="JPEG", quality=70)
-                    jpeg_data = buffer.getvalue()
-
-                    # Mise à jour des données de prévisualisation
-                    with self._preview_lock:
-                        self._preview_frame_bytes = jpeg_data
-                        self._preview_image_base64 = base64.b64encode(jpeg_data).decode('utf-8')
-
-                    # Mise à jour de l'interface
-                    self._update_ui_preview()
-                    
-                    time.sleep(0.033)  # ~30 FPS
+    def _process_preview_frame(self, frame):
+        """Soumet une frame de la boucle de capture au graphe (thread de la session)"""
+        # File pleine : la frame en attente la plus ancienne est abandonnée
+        self._preview_graph.submit(self._pipeline.acquire_job(frame))
 
-            except Exception as e:
-                logging.error(f"Erreur prévisualisation: {e}")
-                self._preview_running = False
-            finally:
-                if cap:
-                    cap.release()
+    def _on_auto_capture(self):
+        """Appelé par l'étage d'analyse quand la qualité a tenu la durée de maintien"""
+        logging.info("Capture automatique déclenchée")
+        self._submit_capture(auto=True)
+
+    def _start_capture_process(self, source_spec):
+        """Démarre la capture dans un processus séparé"""
+        self._capture_process = CaptureProcess(
+            source_spec,
+            self._pipeline_options(),
+            camera_mode=self.CAMERA_MODE,
+            passthrough=not self.enhancement_enabled,
+            on_frame=self._on_process_frame,
+            on_capture=self._on_process_capture,
+            on_error=self._on_preview_error,
+        )
+        if not self._capture_process.start():
+            logging.warning("Processus de capture lent à démarrer")
 
-        self._preview_thread = threading.Thread(target=preview_loop, daemon=True)
-        self._preview_thread.start()
+    def _on_process_frame(self, frame):
+        """Frame de prévisualisation encodée reçue du processus de capture"""
+        self._last_quality, self._auto_progress = scores_from_meta(frame.meta)
+        job = self._pipeline.acquire_job()
+        job.seq = self._frame_buffer.write_jpeg(frame.data, timestamp=frame.timestamp)
+        # Déjà encodée : seuls les étages encode (base64) et deliver restent à faire
+        self._preview_graph.submit(job, stage="encode")
 
-    def _enhance_frame(self, frame):
-        """Améliore la qualité de l'image"""
+    def _on_process_capture(self, jpeg, auto: bool):
+        """Capture automatique encodée par le processus de capture"""
+        logging.info("Capture automatique déclenchée")
+        if not self._capture_lock.acquire(blocking=False):
+            return
         try:
-            # Ajustement de la luminosité et contraste
-            alpha = 1.2  # Contraste
-            beta = 10    # Luminosité
-            frame = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
-            
-            # Réduction du bruit
-            frame = cv2.medianBlur(frame, 3)
-            
-            return frame
-        except:
-            return frame
+            self._apply_captured_image(jpeg, auto)
+        except Exception as ex:
+            logging.error(f"Erreur capture photo: {ex}")
+            self._show_snackbar("❌ Erreur lors de la capture")
+        finally:
+            self._capture_lock.release()
+
+    def _on_preview_error(self, error):
+        """Appelé par la session quand la capture s'arrête sur une erreur"""
+        self._preview_running = False
+        if self._preview_graph is not None:
+            self._preview_graph.stop()
+
+    def _deliver_preview_job(self, job):
+        """Étage deliver : scores et dernière frame vers l'interface"""
+        if job.scores is not None:
+            self._last_quality = job.scores
+            self._auto_progress = self._pipeline.auto_capture.progress
+        self._deliver_preview_frame(job.seq)
+        return job
+
+    def _deliver_preview_frame(self, seq: int):
+        """Livre la frame la plus récente à l'interface (thread de livraison)"""
+        if self._preview_running:
+            self._update_quality_status()
+            self._update_ui_preview()
+
+    def get_preview_stats(self) -> dict:
+        """Retourne les compteurs de frames produites / livrées / abandonnées"""
+        stats = {}
+        graph = self._preview_graph
+        if graph is not None:
+            # Histogrammes de latence et profondeurs de file par étage
+            stats.update(produced=graph.submitted, delivered=graph.completed, dropped=graph.dropped)
+            stats["pipeline"] = graph.stats()
+        stats.update(self._pipeline.stats())
+        if self._preview_session is not None:
+            stats["session"] = self._preview_session.stats()
+        if self._capture_process is not None:
+            # Statistiques du pipeline remontées par le processus de capture (sous "child", sans
+            # écraser celles du graphe et de la session de ce processus)
+            stats["capture_process"] = self._capture_process.stats()
+        stats["worker_pool"] = self._worker_pool.stats()
+        stats["image_store"] = self.app.images.stats()
+        if self._bulk_importer is not None:
+            stats["bulk_import"] = self._bulk_importer.stats()
+            stats["bulk_pool"] = self._bulk_pool.stats()
+        if self._verification_queue is not None:
+            stats["verification_queue"] = self._verification_queue.stats()
+        stats["live_sessions"] = PreviewSession.live_sessions()
+        return stats
 
     def _update_ui_preview(self):
         """Met à jour la prévisualisation dans l'interface"""
         try:
-            if self._preview_image_base64:
-                self._update_preview_with_image(self._preview_image_base64)
+            preview_base64 = self._frame_buffer.latest_base64()
+            if preview_base64:
+                self._update_preview_with_image(preview_base64)
                 # self.app.page.run_task(
-                #     lambda: self._update_preview_with_image(self._preview_image_base64)
+                #     lambda: self._update_preview_with_image(preview_base64)
                 # )
         except Exception as e:
             logging.error(f"Erreur mise à jour UI: {e}")
@@ -467,6 +768,15 @@ class ScanScreen:
     def stop_camera_preview(self):
         """Arrête la prévisualisation caméra"""
         self._preview_running = False
+        session, self._preview_session = self._preview_session, None
+        if session is not None:
+            # Arrêt borné : thread joint et caméra libérée avant de rendre la main
+            session.stop(timeout=2.0)
+        process, self._capture_process = self._capture_process, None
+        if process is not None:
+            process.stop(timeout=2.0)
+        if self._preview_graph is not None:
+            self._preview_graph.stop()
         self.image_widget = None
         if self.use_native_camera:
             self._stop_native_camera()
@@ -495,13 +805,9 @@ class ScanScreen:
         def on_file_picked(e: ft.FilePickerResultEvent):
             if e.files:
                 try:
-                    file_path = e.files[0].path
-                    with open(file_path, "rb") as f:
-                        image_data = f.read()
-                    
                     self.stop_camera_preview()
-                    self._process_image_data(image_data)
-                    self._show_snackbar("✅ Fichier importé avec succès")
+                    # Lecture et prétraitement dans le pool
+                    self._import_file(e.files[0].path)
                     
                 except Exception as ex:
                     logging.error(f"Erreur import fichier: {ex}")
@@ -514,61 +820,192 @@ class ScanScreen:
             allowed_extensions=["jpg", "jpeg", "png", "bmp", "webp"]
         )
 
+    def _import_file(self, file_path: str):
+        """Lit et prétraite un fichier dans le pool (rien ne bloque le thread de l'interface)"""
+        self._submit_import(preprocess_file, file_path, fallback=None)
+
     def _process_image_data(self, image_data: bytes):
-        """Traite les données d'image"""
+        """Prétraite l'image importée dans le pool ; l'interface est mise à jour à la fin"""
+        self._submit_import(preprocess_upload, image_data, fallback=image_data)
+
+    def _submit_import(self, func, source, fallback):
+        # Un pool de processus ne peut pas recevoir les encodeurs (verrous) : il utilise les siens
+        local = self._worker_pool.kind == "thread"
+        generation = self._pool_generation
+        future = self._worker_pool.submit(
+            func, source, self.UPLOAD_MAX_SIZE, quality=self.UPLOAD_JPEG_QUALITY,
+            encoder=self._pipeline.upload_encoder if local else None,
+            max_bytes=self.UPLOAD_MAX_BYTES,
+            byte_budget=self.UPLOAD_BYTE_BUDGETS.get(self.scan_type), budget_key=self.scan_type,
+            budget_encoder=self._pipeline.budget_encoder if local else None,
+            priority=PRIORITY_INTERACTIVE, group=self,
+        )
+        future.add_done_callback(lambda f: self._on_import_done(f, fallback, generation))
+
+    def _on_import_done(self, future, fallback, generation: int):
+        """Fin du prétraitement d'un import (thread du pool) ; `fallback` : image brute à garder en cas d'erreur"""
+        if future.cancelled() or generation != self._pool_generation:
+            return
+        error = future.exception()
+        if isinstance(error, PoolFullError):
+            self._show_snackbar("❌ Traitement en cours, réessayez")
+            return
+        if error is not None:
+            logging.error(f"Erreur prétraitement: {error}")
+            if fallback is None:
+                self._show_snackbar("❌ Erreur lors de l'import")
+                return
+        processed_image = fallback if error is not None else future.result()
         try:
-            processed_image = self._preprocess_image(image_data)
-            self._last_captured_bytes = processed_image
-            self.captured_image = base64.b64encode(processed_image).decode('utf-8')
+            self.captured_key = self.app.images.put(processed_image)
             
-            self._update_preview_with_image(self.captured_image)
+            self._update_preview_with_image(self.app.images.get_base64(self.captured_key))
             self._use_button.disabled = False
             
             # Envoyer à l'API
             # self._send_to_api_background(processed_image)
             
             self.app.page.update()
+            self._show_snackbar("✅ Fichier importé avec succès")
         except Exception as e:
             logging.error(f"Erreur traitement image: {e}")
 
+    def _pick_files_bulk(self, e):
+        """Sélection de plusieurs fichiers pour l'import groupé"""
+        def on_files_picked(e: ft.FilePickerResultEvent):
+            if e.files:
+                try:
+                    self._start_bulk_import([f.path for f in e.files])
+                except Exception as ex:
+                    logging.error(f"Erreur import groupé: {ex}")
+                    self._show_snackbar("❌ Erreur lors de l'import groupé")
+
+        file_picker = ft.FilePicker(on_result=on_files_picked)
+        self.app.page.overlay.append(file_picker)
+        file_picker.pick_files(
+            allow_multiple=True,
+            allowed_extensions=["jpg", "jpeg", "png", "bmp", "webp"]
+        )
+
+    def _start_bulk_import(self, paths):
+        """
+        Apparie documents et selfies par nom de fichier, les prétraite en
+        parallèle et envoie chaque paire complète à la file de vérification.
+        L'import continue si l'on quitte l'écran.
+        """
+        if self._bulk_importer is not None and self._bulk_importer.running:
+            self._show_snackbar("⏳ Un import groupé est déjà en cours")
+            return
+        if self._bulk_pool is None:
+            self._bulk_pool = WorkerPool(self.BULK_IMPORT_POOL, name="bulk")
+        if self._verification_queue is None:
+            self._verification_queue = VerificationQueue(
+                self.api_client, self.app.images, on_result=self._on_bulk_verified)
+        self._bulk_importer = BulkImporter(
+            self.app.images, self._bulk_pool, self.UPLOAD_MAX_SIZE, self.UPLOAD_JPEG_QUALITY,
+            self.UPLOAD_MAX_BYTES, byte_budgets=self.UPLOAD_BYTE_BUDGETS,
+            on_progress=self._on_bulk_progress,
+            on_pair=self._verification_queue.submit,
+            on_done=self._on_bulk_done,
+        )
+        self._bulk_cancel_button.visible = True
+        importer = self._bulk_importer
+        pairs, unmatched = importer.start(paths)
+        self._show_snackbar(f"📚 {len(pairs)} paire(s) à importer, {len(unmatched)} fichier(s) non apparié(s)")
+        if importer.running:
+            self._on_bulk_progress(importer)
+
+    def _cancel_bulk_import(self, e=None):
+        """Annule l'import groupé : fichiers restants et paires pas encore envoyées à l'API"""
+        if self._bulk_importer is None or not self._bulk_importer.running:
+            return
+        self._bulk_importer.cancel()
+        dropped = self._verification_queue.clear() if self._verification_queue is not None else 0
+        logging.info(f"Import groupé annulé ({dropped} paire(s) retirée(s) de la file de vérification)")
+
+    def _on_bulk_progress(self, importer: BulkImporter):
+        """Avancement de l'import groupé (thread du pool)"""
+        stats = importer.stats()
+        self._bulk_progress.value = importer.progress
+        self._bulk_progress.visible = True
+        self._bulk_status.value = (
+            f"{stats['completed']}/{stats['total']} fichiers · {stats['pairs_ready']} paire(s) prête(s) · "
+            f"{stats['files_per_second']:.1f} fichiers/s"
+        )
+        self._bulk_status.visible = True
+        try:
+            self.app.page.update()
+        except Exception:
+            pass
+
+    def _on_bulk_done(self, importer: BulkImporter):
+        """Fin de l'import groupé (ou de son annulation)"""
+        self._bulk_cancel_button.visible = False
+        self._on_bulk_progress(importer)
+        stats = importer.stats()
+        if importer.cancelled:
+            self._show_snackbar(f"⏹ Import groupé annulé après {stats['completed']} fichier(s)")
+            return
+        failed = f", {stats['failed']} échec(s)" if stats["failed"] else ""
+        self._show_snackbar(f"✅ Import groupé terminé : {stats['pairs_ready']} paire(s) en vérification{failed}")
+
+    def close(self):
+        """
+        Fermeture de la page : caméra, tâches de cette session dans le pool
+        partagé (les autres sessions le gardent), import groupé, file de
+        vérification et pool dédié.
+        """
+        self._pool_generation += 1
+        self._open_preview_after_probe = False
+        self._worker_pool.cancel_group(self)
+        self._worker_pool.cancel_group(self._camera_sessions)
+        self.stop_camera_preview()
+        if self._bulk_importer is not None and self._bulk_importer.running:
+            self._bulk_importer.cancel()
+        if self._verification_queue is not None:
+            self._verification_queue.stop(discard_pending=True)
+            self._verification_queue = None
+        if self._bulk_pool is not None:
+            self._bulk_pool.shutdown()
+            self._bulk_pool = None
+
+    def _on_bulk_verified(self, pair, result):
+        """Résultat de vérification d'une paire importée : ajouté à l'historique avec ses images"""
+        if result:
+            document_key, selfie_key = pair.keys
+            self.app.history_screen.add_verification_result(result, document_key, selfie_key)
+        else:
+            logging.warning(f"Vérification échouée pour {pair.subject}")
+
     def _preprocess_image(self, image_data: bytes) -> bytes:
         """Prétraite l'image pour améliorer la qualité"""
         try:
-            image = Image.open(BytesIO(image_data))
-            
-            # Redimensionnement intelligent
-            max_size = (1200, 1600)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Conversion en JPEG
-            buffer = BytesIO()
-            image.save(buffer, format="JPEG", quality=85, optimize=True)
-            
-            return buffer.getvalue()
-            
+            # Redimensionnement intelligent puis conversion en JPEG (sauf si l'image convient déjà)
+            return preprocess_upload(
+                image_data, self.UPLOAD_MAX_SIZE, self.UPLOAD_JPEG_QUALITY,
+                self._pipeline.upload_encoder, self.UPLOAD_MAX_BYTES,
+                self.UPLOAD_BYTE_BUDGETS.get(self.scan_type), self.scan_type, self._pipeline.budget_encoder)
         except Exception as e:
             logging.error(f"Erreur prétraitement: {e}")
             return image_data
 
     def _use_image(self, e):
         """Utilise l'image capturée"""
-        if not self.captured_image or not self._last_captured_bytes:
+        if self.captured_key not in self.app.images:
             self._show_snackbar("❌ Aucune image à utiliser")
             return
 
         try:
             # Stocker l'image dans l'application
             if self.scan_type == "document":
-                self.app.scanned_document_data = self._last_captured_bytes
+                self.app.scanned_document_key = self.captured_key
                 self._show_snackbar("✅ Document enregistré")
             else:
-                self.app.scanned_selfie_data = self._last_captured_bytes
+                self.app.scanned_selfie_key = self.captured_key
                 self._show_snackbar("✅ Selfie enregistré")
 
             # Vérifier si on peut lancer la vérification
-            if (hasattr(self.app, 'scanned_document_data') and 
-                hasattr(self.app, 'scanned_selfie_data') and
-                self.app.scanned_document_data and self.app.scanned_selfie_data):
+            if all(self.app.has_scanned_data()):
                 
                 self._launch_verification()
             else:
@@ -586,8 +1023,7 @@ class ScanScreen:
         
         def verify_thread():
             try:
-                document_data = self.app.scanned_document_data
-                selfie_data = self.app.scanned_selfie_data
+                document_data, selfie_data = self.app.get_scanned_data()
                 
                 if not document_data or not selfie_data:
                     self._show_snackbar("❌ Données manquantes")
@@ -610,15 +1046,14 @@ class ScanScreen:
 
     def _verify_immediately(self, e):
         """Lance la vérification immédiate"""
-        if self.captured_image and self._last_captured_bytes:
+        if self.captured_key:
             self._use_image(e)
         else:
             self._show_snackbar("❌ Aucune image capturée")
 
     def _reset_capture(self, e=None):
         """Réinitialise la capture"""
-        self.captured_image = None
-        self._last_captured_bytes = None
+        self.captured_key = None
         self._reset_preview_state()
         self._show_snackbar("🔄 Capture réinitialisée")
 
@@ -629,6 +1064,7 @@ class ScanScreen:
             self._use_button.disabled = True
         if self._take_photo_button:
             self._take_photo_button.text = "📷 Ouvrir caméra"
+        self._set_status(False, "Prêt à capturer")
         self.app.page.update()
 
     def _send_to_api_background(self, image_bytes: bytes):
@@ -669,16 +1105,19 @@ class ScanScreen:
         }
         self._show_snackbar(f"💡 Conseils: {tips[self.scan_type]}")
 
-    def push_native_frame(self, frame_bytes: bytes):
-        """Reçoit les frames de la caméra native (Android)"""
+    def push_native_frame(self, frame, fmt: str = "jpeg", width: int = 0, height: int = 0, stride: int = 0):
+        """
+        Reçoit les frames de la caméra native (Android).
+
+        `frame` est un objet tampon (bytes, memoryview...) au format `fmt` :
+        "jpeg", "nv21", "nv12", "yuv420", "rgba"... ; `width`, `height` et
+        `stride` (pas d'une ligne en octets) décrivent les formats bruts.
+        La frame passe ensuite par le même pipeline que les sources OpenCV.
+        """
         if not self._preview_running:
             return
             
         try:
-            with self._preview_lock:
-                self._preview_frame_bytes = frame_bytes
-                self._preview_image_base64 = base64.b64encode(frame_bytes).decode('utf-8')
-            
-            self._update_ui_preview()
+            self._native_source.push(frame, fmt, width, height, stride)
         except Exception as e:
-            logging.error(f"Erreur frame native: {e}")
\ No newline at end of file
+            logging.error(f"Erreur frame native: {e}")